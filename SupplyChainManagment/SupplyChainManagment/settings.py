@@ -103,6 +103,31 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# The dashboard section versions, single-flight locks, unit conversions and
+# notification feeds live in the cache, and writes invalidate them by bumping
+# a version there. Every server process must therefore see the same cache:
+# set REDIS_URL (e.g. redis://127.0.0.1:6379/0) for any deployment that runs
+# more than one process. The in-memory fallback is private to each process
+# and only fits a single-process development server.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -153,3 +178,59 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = '/users/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/users/login/'
+
+# Header notification feed: how long a user's feed is shared between requests
+# (seconds), and path prefixes whose responses never render the feed.
+NOTIFICATIONS_CACHE_TIMEOUT = 15
+NOTIFICATIONS_EXCLUDED_PATHS = [
+    '/invoices/download/',
+    '/notifications/read/',
+    '/notifications/stream/',
+    '/notifications/poll/',
+]
+
+# Live notifications (server-sent events): seconds between feed polls and how
+# long a single stream stays open before the browser reconnects.
+NOTIFICATIONS_STREAM_POLL_INTERVAL = 2
+NOTIFICATIONS_STREAM_TIMEOUT = 300
+# Seconds between requests of browsers polling /notifications/poll/, which is
+# what they fall back to when the site is served through WSGI.
+NOTIFICATIONS_POLL_INTERVAL = 15
+
+# Dashboard sections are invalidated by writes (theme.dashboard_cache); the
+# timeout only bounds how long an unused entry stays around.
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Single-flight recomputation (theme.singleflight): how long one caller may
+# hold the recompute lock, and how long the last value stays available to
+# serve while it is being recomputed.
+SINGLEFLIGHT_LOCK_TIMEOUT = 30
+SINGLEFLIGHT_STALE_TIMEOUT = 3600
+
+# Customer order list: orders per page (keyset pagination, see theme.keyset).
+ORDERS_PAGE_SIZE = 50
+
+# Bulk order ingest API (orders/api/bulk/): most orders accepted per request.
+ORDER_INGEST_MAX_BATCH = 1000
+
+# Bulk status changes (orders/status/bulk/): most orders changed per request.
+ORDER_STATUS_MAX_BATCH = 1000
+
+# Idempotency keys (theme.idempotency): how long a submitted key is replayed
+# (seconds). Run the purge_idempotency_keys command periodically to drop old rows.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Streaming exports (orders.exports): rows fetched from the database per chunk.
+EXPORT_CHUNK_SIZE = 2000
+
+# Inventory list: rows per page (keyset pagination, see theme.keyset), and the
+# quantity below which a row counts as low stock (list filter and notifications).
+INVENTORY_PAGE_SIZE = 50
+INVENTORY_LOW_STOCK_THRESHOLD = 5
+
+# Bulk imports (theme.imports): rows validated and upserted per chunk/transaction.
+IMPORT_CHUNK_SIZE = 2000
+
+# Inventory valuation (inventory.valuation): cost of stock going out, 'fifo'
+# (oldest cost layers first) or 'average' (moving average cost).
+INVENTORY_VALUATION_METHOD = 'fifo'
@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import UnitConversion
 
 # Register your models here.
+
+@admin.register(UnitConversion)
+class UnitConversionAdmin(admin.ModelAdmin):
+    list_display = ('unit', 'product', 'factor')
+    list_filter = ('unit',)
+    search_fields = ('product__name', 'product__sku')
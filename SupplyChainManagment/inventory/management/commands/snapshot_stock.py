@@ -0,0 +1,34 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from inventory import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Store the quantity of every inventory item at a moment (default: the last midnight) as stock snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--at', help='Moment to snapshot (YYYY-MM-DD for its midnight, or an ISO date and time)')
+        parser.add_argument('--chunk-size', type=int, default=snapshots.BATCH_SIZE,
+                            help='Number of inventory items snapshotted per query')
+
+    def handle(self, *args, **options):
+        if options['at']:
+            at = parse_datetime(options['at'])
+            if at is None:
+                day = parse_date(options['at'])
+                if day is None:
+                    raise CommandError('--at must be a date or an ISO date and time.')
+                at = datetime.datetime.combine(day, datetime.time.min)
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+        else:
+            at = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min))
+        if at > timezone.now():
+            raise CommandError('Snapshots can only be taken for past moments.')
+
+        written = snapshots.take(at, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} stock snapshot(s) at {at.isoformat()}.'))
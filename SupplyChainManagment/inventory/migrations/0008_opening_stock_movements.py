@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+
+
+def record_opening_balances(apps, schema_editor):
+    # Start the journal from the current quantities so it always sums to them
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    opened_at = timezone.now()
+    rows = InventoryItem.objects.filter(quantity__gt=0).order_by('pk').values_list('pk', 'quantity')
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(inventory_item_id=pk, kind='adjustment', quantity=quantity,
+                          reference='Opening balance', created_at=opened_at)
+            for pk, quantity in rows.iterator(chunk_size=CHUNK_SIZE)
+        ),
+        batch_size=CHUNK_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_journal'),
+    ]
+
+    operations = [
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
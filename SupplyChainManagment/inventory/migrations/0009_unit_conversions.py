@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_opening_stock_movements'),
+        ('products', '0009_remove_product_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitConversion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit', models.CharField(choices=[('piece', 'Piece'), ('box', 'Box'), ('case', 'Case'), ('pallet', 'Pallet'), ('kg', 'Kilogram'), ('gram', 'Gram'), ('liter', 'Liter'), ('ml', 'Milliliter'), ('meter', 'Meter'), ('cm', 'Centimeter'), ('pack', 'Pack'), ('set', 'Set'), ('unit', 'Unit'), ('dozen', 'Dozen')], max_length=20)),
+                ('factor', models.DecimalField(decimal_places=6, help_text='Base units in one of this unit', max_digits=12)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='base_quantity',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='unit_factor',
+            field=models.DecimalField(decimal_places=6, default=1, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['product', 'base_quantity'], name='inventory_product_base_qty_idx'),
+        ),
+        migrations.AddField(
+            model_name='unitconversion',
+            name='product',
+            field=models.ForeignKey(blank=True, help_text='Leave empty for the default of every product', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='unit_conversions', to='products.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='unitconversion',
+            constraint=models.UniqueConstraint(fields=('product', 'unit'), name='unit_conversion_unique_product_unit'),
+        ),
+        migrations.AddConstraint(
+            model_name='unitconversion',
+            constraint=models.UniqueConstraint(condition=models.Q(('product__isnull', True)), fields=('unit',), name='unit_conversion_unique_default_unit'),
+        ),
+    ]
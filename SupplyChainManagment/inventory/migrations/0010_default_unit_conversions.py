@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+
+# The multipliers purchases.views.get_product_price used to hard-code
+DEFAULT_FACTORS = {
+    'piece': '1',
+    'box': '10',
+    'case': '50',
+    'pallet': '1000',
+    'dozen': '12',
+    'pack': '5',
+    'set': '3',
+    'kg': '1',
+    'gram': '0.001',
+    'liter': '1',
+    'ml': '0.001',
+    'meter': '1',
+    'cm': '0.01',
+    'unit': '1',
+}
+
+
+def seed_conversions(apps, schema_editor):
+    UnitConversion = apps.get_model('inventory', 'UnitConversion')
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    UnitConversion.objects.bulk_create(
+        [UnitConversion(product=None, unit=unit, factor=Decimal(factor)) for unit, factor in DEFAULT_FACTORS.items()],
+        ignore_conflicts=True,
+    )
+    # One UPDATE per unit fills in the base-unit quantities of the existing rows
+    for unit, factor in DEFAULT_FACTORS.items():
+        factor = Decimal(factor)
+        InventoryItem.objects.filter(unit=unit).update(
+            unit_factor=factor,
+            base_quantity=ExpressionWrapper(
+                F('quantity') * Value(factor), output_field=DecimalField(max_digits=18, decimal_places=6),
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_unit_conversions'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_conversions, migrations.RunPython.noop),
+    ]
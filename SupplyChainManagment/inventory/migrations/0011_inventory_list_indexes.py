@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_default_unit_conversions'),
+        ('products', '0009_remove_product_price'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['added_on', 'id'], name='inventory_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['unit', 'added_on', 'id'], name='inventory_unit_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['location', 'added_on', 'id'], name='inventory_location_added_idx'),
+        ),
+    ]
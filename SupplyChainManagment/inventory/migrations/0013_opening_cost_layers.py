@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 2000
+COST = Decimal('0.0001')
+MONEY = DecimalField(max_digits=16, decimal_places=4)
+
+
+def open_cost_layers(apps, schema_editor):
+    # Value the current stock at the cost the rows carry today (InventoryItem.cost_price)
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    CostLayer = apps.get_model('inventory', 'CostLayer')
+    last_pk = 0
+    while True:
+        rows = list(
+            InventoryItem.objects.filter(pk__gt=last_pk, quantity__gt=0).order_by('pk')
+            .values_list('pk', 'quantity', 'unit_cost_price', 'product__cost_price', 'unit_factor', 'added_on')
+            [:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        layers = []
+        for pk, quantity, unit_cost_price, product_cost_price, unit_factor, added_on in rows:
+            unit_cost = (unit_cost_price or product_cost_price * unit_factor).quantize(COST)
+            layers.append(CostLayer(inventory_item_id=pk, received_at=added_on, quantity=quantity,
+                                    remaining=quantity, unit_cost=unit_cost, reference='Opening balance'))
+        CostLayer.objects.bulk_create(layers)
+
+    layers = CostLayer.objects.filter(inventory_item=OuterRef('pk')).order_by().values('inventory_item')
+    value = layers.annotate(total=Sum(F('remaining') * F('unit_cost'), output_field=MONEY)).values('total')
+    InventoryItem.objects.update(stock_value=Coalesce(Subquery(value), Value(Decimal('0')), output_field=MONEY))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_cost_layers'),
+    ]
+
+    operations = [
+        migrations.RunPython(open_cost_layers, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from products.models import Product
 
 # Create your models here.
@@ -29,20 +30,151 @@ class InventoryItem(models.Model):
     unit_cost_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     unit_selling_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     added_on = models.DateTimeField(auto_now_add=True)
+    # Base units (inventory.units) per unit of this row, and the stock in base units;
+    # moved together with quantity by inventory.stock
+    unit_factor = models.DecimalField(max_digits=12, decimal_places=6, default=1)
+    base_quantity = models.DecimalField(max_digits=18, decimal_places=6, default=0)
+    # Book value of the stock on hand, moved by inventory.valuation with every stock change
+    stock_value = models.DecimalField(max_digits=16, decimal_places=4, default=0)
 
     class Meta:
         unique_together = ('product', 'unit')  # Prevent duplicate product-unit combinations
+        # Total stock of a product is a SUM(base_quantity) read from this index;
+        # the inventory list pages newest first, optionally filtered by unit or location
+        indexes = [
+            models.Index(fields=['product', 'base_quantity'], name='inventory_product_base_qty_idx'),
+            models.Index(fields=['added_on', 'id'], name='inventory_added_idx'),
+            models.Index(fields=['unit', 'added_on', 'id'], name='inventory_unit_added_idx'),
+            models.Index(fields=['location', 'added_on', 'id'], name='inventory_location_added_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} ({self.quantity} {self.get_unit_display()})"
 
+    def save(self, *args, **kwargs):
+        from . import units
+        self.unit_factor = units.factor(self.product_id, self.unit)
+        self.base_quantity = self.quantity * self.unit_factor
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'product', 'unit', 'quantity'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'unit_factor', 'base_quantity'}
+        super().save(*args, **kwargs)
+
     @property
     def cost_price(self):
-        """Return unit-specific cost price or fallback to product's cost price"""
-        return self.unit_cost_price or self.product.cost_price
+        """Return unit-specific cost price or fallback to product's cost price converted to this unit"""
+        return self.unit_cost_price or self.product.cost_price * self.unit_factor
 
     @property
     def selling_price(self):
-        """Return unit-specific selling price or fallback to product's selling price"""
-        return self.unit_selling_price or self.product.selling_price
+        """Return unit-specific selling price or fallback to product's selling price converted to this unit"""
+        return self.unit_selling_price or self.product.selling_price * self.unit_factor
+
+
+class UnitConversion(models.Model):
+    """
+    How many base units one ``unit`` holds, for one product or (without a
+    product) for every product that has no conversion of its own.
+    """
+    product = models.ForeignKey(Product, related_name='unit_conversions', on_delete=models.CASCADE,
+                                null=True, blank=True, help_text="Leave empty for the default of every product")
+    unit = models.CharField(max_length=20, choices=UNIT_CHOICES)
+    factor = models.DecimalField(max_digits=12, decimal_places=6, help_text="Base units in one of this unit")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'unit'], name='unit_conversion_unique_product_unit'),
+            models.UniqueConstraint(fields=['unit'], condition=models.Q(product__isnull=True),
+                                    name='unit_conversion_unique_default_unit'),
+        ]
+
+    def __str__(self):
+        scope = self.product.name if self.product_id else 'Default'
+        return f"{scope}: 1 {self.get_unit_display()} = {self.factor.normalize()} base unit(s)"
+
+    def save(self, *args, **kwargs):
+        from . import units
+        previous = None
+        if self.pk:
+            previous = UnitConversion.objects.filter(pk=self.pk).values_list('product_id', 'unit').first()
+        super().save(*args, **kwargs)
+        if previous and previous != (self.product_id, self.unit):
+            units.conversion_changed(*previous)
+        units.conversion_changed(self.product_id, self.unit)
+
+    def delete(self, *args, **kwargs):
+        from . import units
+        result = super().delete(*args, **kwargs)
+        units.conversion_changed(self.product_id, self.unit)
+        return result
+
+
+
+class StockMovement(models.Model):
+    """
+    Append-only journal of stock changes, written by inventory.stock in the
+    same transaction as the quantity change it records.
+    """
+    RECEIPT = 'receipt'
+    SALE = 'sale'
+    ADJUSTMENT = 'adjustment'
+    RETURN = 'return'
+    KIND_CHOICES = [
+        (RECEIPT, 'Receipt'),
+        (SALE, 'Sale'),
+        (ADJUSTMENT, 'Adjustment'),
+        (RETURN, 'Return'),
+    ]
+
+    inventory_item = models.ForeignKey(InventoryItem, related_name='movements', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField(help_text="Change in stock, negative when stock goes out")
+    reference = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # Point-in-time queries scan one item's movements after its last snapshot
+        indexes = [
+            models.Index(fields=['inventory_item', 'created_at'], name='stock_movement_item_time_idx'),
+        ]
 
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} ({self.inventory_item_id})"
+
+
+class CostLayer(models.Model):
+    """
+    Stock that came in at one unit cost (a receipt, a return, a positive
+    adjustment); ``remaining`` is consumed oldest first by inventory.valuation.
+    """
+    inventory_item = models.ForeignKey(InventoryItem, related_name='cost_layers', on_delete=models.CASCADE)
+    received_at = models.DateTimeField(default=timezone.now)
+    quantity = models.PositiveIntegerField()
+    remaining = models.PositiveIntegerField()
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4)
+    reference = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        # Consumption reads the open layers of a row, oldest first
+        indexes = [
+            models.Index(fields=['inventory_item', 'received_at', 'id'], condition=models.Q(remaining__gt=0),
+                         name='cost_layer_open_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.remaining}/{self.quantity} @ {self.unit_cost} ({self.inventory_item_id})"
+
+
+class StockSnapshot(models.Model):
+    """Quantity of an inventory item at ``taken_at``, see inventory.snapshots."""
+    inventory_item = models.ForeignKey(InventoryItem, related_name='snapshots', on_delete=models.CASCADE)
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['inventory_item', 'taken_at'], name='stock_snapshot_unique_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_item_id} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.quantity}"
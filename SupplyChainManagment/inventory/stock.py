@@ -0,0 +1,170 @@
+"""
+Stock mutations for InventoryItem.
+
+Quantities are never read, changed in Python and saved back: every change is
+a single UPDATE evaluated by the database (``quantity = quantity - n WHERE
+quantity >= n``) and the number of affected rows tells whether it applied.
+Concurrent orders therefore cannot lose each other's updates or take a row
+below zero, whatever the isolation level of the database.
+
+Every change also moves the row's base-unit quantity (inventory.units) in
+the same UPDATE, and is journaled as StockMovement rows inserted in bulk in
+the same transaction (see inventory.snapshots for point-in-time reads).
+Decrements that take a row below INVENTORY_LOW_STOCK_THRESHOLD record a
+low-stock entry in the notification feed.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from theme.notification_utils import record_low_inventory
+from . import units, valuation
+from .models import InventoryItem, StockMovement
+
+
+class InsufficientStock(ValidationError):
+    """Raised when a stock row does not hold the requested quantity (or is gone)."""
+
+
+def _per_row(quantities):
+    whens = [When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()]
+    return Case(*whens, default=Value(0), output_field=IntegerField())
+
+
+def _shortage(quantities):
+    items = InventoryItem.objects.select_related('product').in_bulk(list(quantities))
+    errors = []
+    for pk, quantity in quantities.items():
+        item = items.get(pk)
+        if item is None:
+            errors.append('Inventory item not found for the selected product.')
+        elif item.quantity < quantity:
+            errors.append(
+                f'Not enough inventory for {item.product.name} ({item.get_unit_display()}). '
+                f'Available: {item.quantity}'
+            )
+    return InsufficientStock(errors or ['Not enough inventory.'])
+
+
+def record(changes, kind, reference=''):
+    """Journal ``changes`` ({inventory item id: signed quantity}) with one INSERT."""
+    record_movements([
+        StockMovement(inventory_item_id=pk, kind=kind, quantity=quantity, reference=reference)
+        for pk, quantity in changes.items() if quantity
+    ])
+
+
+def record_movements(movements):
+    if movements:
+        StockMovement.objects.bulk_create(movements)
+
+
+def record_low_stock(changes):
+    """
+    Notify about the rows ``changes`` ({inventory item id: signed quantity},
+    already applied) took from at or above INVENTORY_LOW_STOCK_THRESHOLD to
+    below it, found with one query.
+    """
+    taken = {pk: -quantity for pk, quantity in changes.items() if quantity < 0}
+    if not taken:
+        return
+    threshold = settings.INVENTORY_LOW_STOCK_THRESHOLD
+    record_low_inventory(
+        InventoryItem.objects.select_related('product')
+        .filter(pk__in=list(taken), quantity__lt=threshold, quantity__gte=threshold - _per_row(taken))
+        .order_by('pk')
+    )
+
+
+def take_many(quantities, kind=StockMovement.SALE, reference='', movements=None):
+    """
+    Remove ``quantities`` ({inventory item id: quantity}) from stock with one
+    conditional UPDATE. Either every row is decremented or none is, in which
+    case InsufficientStock lists the short rows.
+
+    The change is journaled as one ``kind`` movement per row, or as
+    ``movements`` (unsaved StockMovement rows adding up to the same change)
+    when the caller wants finer references.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+    if any(quantity < 0 for quantity in quantities.values()):
+        raise ValueError('Use put_many() to add stock')
+    requested = _per_row(quantities)
+    try:
+        with transaction.atomic():
+            updated = (
+                InventoryItem.objects.filter(pk__in=quantities, quantity__gte=requested)
+                .update(
+                    quantity=F('quantity') - requested,
+                    base_quantity=units.base_quantity(F('quantity') - requested),
+                )
+            )
+            if updated != len(quantities):
+                raise InsufficientStock('Not enough inventory.')
+            if movements is None:
+                record({pk: -quantity for pk, quantity in quantities.items()}, kind, reference)
+            else:
+                record_movements(movements)
+            record_low_stock({pk: -quantity for pk, quantity in quantities.items()})
+    except InsufficientStock:
+        # The savepoint is rolled back, report against the current stock
+        raise _shortage(quantities) from None
+
+
+def take(item_id, quantity, kind=StockMovement.SALE, reference=''):
+    take_many({item_id: quantity}, kind, reference)
+
+
+def put_many(quantities, kind=StockMovement.RETURN, reference=''):
+    """Add ``quantities`` ({inventory item id: quantity}) back to stock in one UPDATE."""
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+    added = _per_row(quantities)
+    InventoryItem.objects.filter(pk__in=quantities).update(
+        quantity=F('quantity') + added, base_quantity=units.base_quantity(F('quantity') + added),
+    )
+    record(quantities, kind, reference)
+
+
+def put(item_id, quantity, kind=StockMovement.RETURN, reference=''):
+    put_many({item_id: quantity}, kind, reference)
+
+
+def receive(product, unit, quantity, unit_cost_price=None, unit_selling_price=None, description='',
+            reference=''):
+    """
+    Book received goods into the product's stock row for ``unit``, creating the
+    row on first receipt. Prices given here replace the row's unit prices.
+    Returns the inventory item id.
+    """
+    changes = {'quantity': F('quantity') + quantity, 'base_quantity': units.base_quantity(F('quantity') + quantity)}
+    if unit_cost_price:
+        changes['unit_cost_price'] = unit_cost_price
+    if unit_selling_price:
+        changes['unit_selling_price'] = unit_selling_price
+    rows = InventoryItem.objects.filter(product=product, unit=unit)
+
+    item_id = None
+    if not rows.update(**changes):
+        try:
+            with transaction.atomic():
+                item_id = InventoryItem.objects.create(
+                    product=product,
+                    unit=unit,
+                    quantity=quantity,
+                    unit_cost_price=unit_cost_price,
+                    unit_selling_price=unit_selling_price,
+                    description=description,
+                ).pk
+        except IntegrityError:
+            # Another receipt created the row first (unique product/unit)
+            rows.update(**changes)
+    if item_id is None:
+        item_id = rows.values_list('pk', flat=True).get()
+    record({item_id: quantity}, StockMovement.RECEIPT, reference)
+    valuation.add({item_id: quantity}, {item_id: unit_cost_price}, reference)
+    return item_id
@@ -1,3 +1,244 @@
-from django.test import TestCase
+import datetime
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from products.models import Category, Product
+from orders.services import place_order
+from . import snapshots, stock, units, valuation
+from .models import InventoryItem, StockMovement, StockSnapshot, UnitConversion
+
+User = get_user_model()
+
+
+def make_item(quantity, sku='W-001'):
+    user = User.objects.create_user(username=f'owner-{sku}', password='testpass123', role='staff')
+    product = Product.objects.create(
+        name=f'Widget {sku}',
+        category=Category.objects.create(name=f'Category {sku}'),
+        sku=sku,
+        cost_price=Decimal('4.00'),
+        selling_price=Decimal('10.00'),
+        created_by=user,
+    )
+    return InventoryItem.objects.create(product=product, quantity=quantity)
+
+
+class StockApiTestCase(TestCase):
+    def test_take_many_is_all_or_nothing(self):
+        first, second = make_item(5, 'A'), make_item(2, 'B')
+        with self.assertRaises(stock.InsufficientStock) as ctx:
+            stock.take_many({first.pk: 3, second.pk: 4})
+        self.assertEqual(ctx.exception.messages, ['Not enough inventory for Widget B (Piece). Available: 2'])
+        first.refresh_from_db()
+        self.assertEqual(first.quantity, 5)
+
+        stock.take_many({first.pk: 3, second.pk: 2})
+        stock.put(second.pk, 1)
+        self.assertEqual(
+            dict(InventoryItem.objects.values_list('pk', 'quantity')),
+            {first.pk: 2, second.pk: 1},
+        )
+
+    def test_receive_creates_then_increments(self):
+        item = make_item(0, 'C')
+        pk = stock.receive(item.product, 'box', 10, unit_cost_price=Decimal('3.00'))
+        self.assertNotEqual(pk, item.pk)
+        self.assertEqual(stock.receive(item.product, 'box', 5), pk)
+        received = InventoryItem.objects.get(pk=pk)
+        self.assertEqual(received.quantity, 15)
+        self.assertEqual(received.unit_cost_price, Decimal('3.00'))
+
+
+class UnitConversionTestCase(TestCase):
+    def setUp(self):
+        self.piece = make_item(24, 'U')
+        self.product = self.piece.product
+        self.box = InventoryItem.objects.create(product=self.product, unit='box', quantity=3)
+
+    def test_base_quantity_follows_stock_changes(self):
+        self.assertEqual(units.total_stock([self.product.pk]), {self.product.pk: Decimal('54')})
+        stock.take_many({self.box.pk: 1, self.piece.pk: 4})
+        stock.put(self.box.pk, 2)
+        stock.receive(self.product, 'dozen', 1)
+        with self.assertNumQueries(1):
+            totals = units.total_stock([self.product.pk])
+        self.assertEqual(totals, {self.product.pk: Decimal('72')})
+        self.assertEqual(units.convert(self.product.pk, 3, 'box', 'dozen'), Decimal('2.5'))
+
+    def test_product_conversion_overrides_the_default(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            conversion = UnitConversion.objects.create(product=self.product, unit='box', factor=Decimal('6'))
+        self.box.refresh_from_db()
+        self.assertEqual((self.box.unit_factor, self.box.base_quantity), (Decimal('6'), Decimal('18')))
+        self.assertEqual(units.factor(self.product.pk, 'box'), Decimal('6'))
+        self.assertEqual(self.box.cost_price, Decimal('24.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            conversion.delete()
+        self.box.refresh_from_db()
+        self.assertEqual((units.factor(self.product.pk, 'box'), self.box.base_quantity), (Decimal('10'), Decimal('30')))
+
+    def test_table_is_cached_in_memory(self):
+        units.factor(self.product.pk, 'box')
+        with self.assertNumQueries(0):
+            self.assertEqual(units.factor(self.product.pk, 'case'), Decimal('50'))
+
+
+class StockJournalTestCase(TestCase):
+    def setUp(self):
+        self.item = make_item(0, 'J')
+        self.start = timezone.now() - datetime.timedelta(days=10)
+
+    def move(self, days, quantity):
+        # Movements dated in the past, as if written then
+        StockMovement.objects.create(
+            inventory_item=self.item, kind=StockMovement.ADJUSTMENT, quantity=quantity,
+            created_at=self.start + datetime.timedelta(days=days),
+        )
+
+    def test_changes_are_journaled(self):
+        stock.receive(self.item.product, 'piece', 10, reference='GR-1')
+        stock.take_many({self.item.pk: 4}, reference='Order #1')
+        stock.put(self.item.pk, 1, reference='Order #1')
+        with self.assertRaises(stock.InsufficientStock):
+            stock.take(self.item.pk, 50)
+        self.assertEqual(
+            list(self.item.movements.order_by('pk').values_list('kind', 'quantity', 'reference')),
+            [('receipt', 10, 'GR-1'), ('sale', -4, 'Order #1'), ('return', 1, 'Order #1')],
+        )
+
+    def test_on_hand_reads_snapshot_and_later_movements(self):
+        InventoryItem.objects.filter(pk=self.item.pk).update(added_on=self.start)
+        self.move(1, 20)
+        self.move(3, -5)
+        self.move(6, -3)
+        at = lambda days: self.start + datetime.timedelta(days=days)
+
+        self.assertEqual(snapshots.on_hand(at(4))[self.item.pk], 15)
+        self.assertEqual(snapshots.take(at(5)), 1)
+        # Movements before the snapshot are no longer read
+        StockMovement.objects.filter(created_at__lt=at(5)).update(quantity=0)
+        with self.assertNumQueries(1):
+            quantities = snapshots.on_hand(at(7), [self.item.pk])
+        self.assertEqual(quantities, {self.item.pk: 12})
+        self.assertEqual(snapshots.on_hand(at(5))[self.item.pk], 15)
+
+        out = StringIO()
+        call_command('snapshot_stock', '--at', at(6.5).isoformat(), stdout=out)
+        self.assertEqual(StockSnapshot.objects.get(taken_at=at(6.5)).quantity, 12)
+
+
+@override_settings(INVENTORY_PAGE_SIZE=3)
+class InventoryListTestCase(TestCase):
+    def setUp(self):
+        self.items = [make_item(quantity, f'L-{quantity}') for quantity in range(1, 8)]
+        InventoryItem.objects.filter(pk=self.items[0].pk).update(unit='box', location='Aisle 1')
+        self.client.force_login(User.objects.get(username='owner-L-1'))
+
+    def test_pages_newest_first(self):
+        response = self.client.get('/inventory/')
+        self.assertEqual([item.quantity for item in response.context['items']], [7, 6, 5])
+
+        seen = []
+        url = '/inventory/rows/'
+        while url:
+            # One query per page, the product comes from the same join
+            with self.assertNumQueries(1):
+                payload = self.client.get(url).json()
+            seen.append(payload['html'].count('<tr'))
+            url = payload['next_url'] and '/inventory/rows/' + payload['next_url']
+        self.assertEqual(seen, [3, 3, 1])
+
+    def test_filters(self):
+        response = self.client.get('/inventory/', {'unit': 'box', 'location': 'Aisle'})
+        self.assertEqual(list(response.context['items']), [self.items[0]])
+        response = self.client.get('/inventory/', {'low_stock': '1'})
+        self.assertEqual([item.quantity for item in response.context['items']], [4, 3, 2])
+        self.assertEqual(response.context['next_url'], f"?low_stock=1&cursor={response.context['page'].next_cursor}")
+        response = self.client.get('/inventory/', {'product': 'L-6'})
+        self.assertEqual([item.quantity for item in response.context['items']], [6])
+        response = self.client.get('/inventory/rows/', {'product': 'Nothing'})
+        self.assertIn('No inventory items match these filters.', response.json()['html'])
+
+
+class ValuationTestCase(TestCase):
+    def setUp(self):
+        self.item = make_item(0, 'V')
+
+    def receive(self, quantity, cost):
+        stock.receive(self.item.product, 'piece', quantity, unit_cost_price=Decimal(cost), reference='GR')
+
+    def test_fifo_takes_the_oldest_layers(self):
+        self.receive(10, '2.00')
+        self.receive(10, '3.00')
+        self.assertEqual(valuation.issue({self.item.pk: 15}), {self.item.pk: Decimal('35.0000')})
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock_value, Decimal('15.0000'))
+        self.assertEqual(list(self.item.cost_layers.order_by('pk').values_list('remaining', flat=True)), [0, 5])
+
+    @override_settings(INVENTORY_VALUATION_METHOD='average')
+    def test_moving_average(self):
+        self.receive(10, '2.00')
+        self.receive(10, '3.00')
+        self.assertEqual(valuation.issue({self.item.pk: 15}), {self.item.pk: Decimal('37.5000')})
+        self.receive(5, '4.00')
+        self.assertEqual(valuation.issue({self.item.pk: 10}), {self.item.pk: Decimal('32.5000')})
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock_value, Decimal('0'))
+
+    def test_order_lines_cost_what_their_stock_cost(self):
+        self.receive(5, '2.00')
+        self.receive(5, '4.00')  # Also the row's latest unit cost price
+        order = place_order({self.item.pk: (self.item.product_id, 6)}, ordered_by=self.item.product.created_by,
+                            order_date=timezone.now().date())
+        line = order.items.get()
+        self.assertEqual((line.unit_cost_price, line.total_profit), (Decimal('2.33'), Decimal('46.02')))
+        with self.assertNumQueries(1):
+            values = valuation.stock_values([self.item.product_id])
+        self.assertEqual(values, {self.item.product_id: Decimal('16.0000')})
+
+
+class ConcurrentStockTestCase(TransactionTestCase):
+    def test_concurrent_takes_never_oversell(self):
+        """Many threads racing for the last units never lose an update or go negative"""
+        item = make_item(30)
+        sold = []
+        rejected = []
+
+        def cashier():
+            try:
+                for _ in range(6):
+                    while True:
+                        try:
+                            stock.take(item.pk, 1)
+                            sold.append(1)
+                        except stock.InsufficientStock:
+                            rejected.append(1)
+                        except OperationalError:
+                            # SQLite serialises writers: back off and retry
+                            time.sleep(0.001)
+                            continue
+                        break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cashier) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        item.refresh_from_db()
+        self.assertEqual(len(sold), 30)
+        self.assertEqual(len(rejected), 30)
+        self.assertEqual(item.quantity, 0)
+        self.assertEqual(item.movements.aggregate(total=Sum('quantity'))['total'], -30)
@@ -0,0 +1,101 @@
+"""
+Unit-of-measure conversions.
+
+Each InventoryItem row holds the stock of a product in one unit. A
+UnitConversion says how many base units (pieces, kilograms, liters, meters)
+one of a unit holds, for a single product or as the default for all of
+them. The table is small and read on every stock row write, so each process
+keeps it in memory and reloads it when its version number in the cache
+changes (bumped on commit of any change to the table).
+
+Every InventoryItem keeps the factor of its unit (``unit_factor``) and its
+stock in base units (``base_quantity``). inventory.stock moves both in the
+same UPDATE as the quantity, and a conversion change rewrites the rows it
+applies to, so the total stock of a product is a single SUM (``total_stock``).
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+
+VERSION_KEY = 'units:version'
+ONE = Decimal('1')
+
+_loaded = {'version': None, 'table': {}}
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def table():
+    """{(product id or None, unit): factor}, reloaded when the conversions changed."""
+    from .models import UnitConversion
+
+    version = _version()
+    if _loaded['version'] != version:
+        rows = UnitConversion.objects.values_list('product_id', 'unit', 'factor')
+        _loaded.update(table={(product_id, unit): factor for product_id, unit, factor in rows}, version=version)
+    return _loaded['table']
+
+
+def factor(product_id, unit):
+    """Base units in one ``unit`` of product ``product_id``."""
+    conversions = table()
+    return conversions.get((product_id, unit)) or conversions.get((None, unit)) or ONE
+
+
+def to_base(product_id, unit, quantity):
+    return quantity * factor(product_id, unit)
+
+
+def convert(product_id, quantity, from_unit, to_unit):
+    """``quantity`` of ``from_unit`` expressed in ``to_unit`` (may be fractional)."""
+    return to_base(product_id, from_unit, quantity) / factor(product_id, to_unit)
+
+
+def base_quantity(quantity_expression):
+    """Expression for base_quantity given the expression of a row's (new) quantity."""
+    return ExpressionWrapper(
+        quantity_expression * F('unit_factor'), output_field=DecimalField(max_digits=18, decimal_places=6),
+    )
+
+
+def conversion_changed(product_id, unit):
+    """Re-apply the conversion of ``unit`` (for ``product_id``, or the default) to the stock rows it covers."""
+    from .models import InventoryItem, UnitConversion
+
+    conversions = UnitConversion.objects.filter(unit=unit)
+    default = conversions.filter(product__isnull=True).values_list('factor', flat=True).first()
+    rows = InventoryItem.objects.filter(unit=unit)
+    if product_id is None:
+        rows = rows.exclude(product_id__in=conversions.filter(product__isnull=False).values('product_id'))
+        new_factor = default
+    else:
+        rows = rows.filter(product_id=product_id)
+        new_factor = conversions.filter(product_id=product_id).values_list('factor', flat=True).first() or default
+    new_factor = new_factor or ONE
+    # SET expressions read the old row, so the new factor is spelled out
+    rows.update(unit_factor=new_factor, base_quantity=ExpressionWrapper(
+        F('quantity') * Value(new_factor), output_field=DecimalField(max_digits=18, decimal_places=6),
+    ))
+    transaction.on_commit(bump_version)
+
+
+def total_stock(product_ids):
+    """{product id: stock in base units} summed over all the units it is stocked in, in one query."""
+    from .models import InventoryItem
+
+    rows = (
+        InventoryItem.objects.filter(product_id__in=list(product_ids)).order_by().values('product_id')
+        .annotate(total=Sum('base_quantity')).values_list('product_id', 'total')
+    )
+    return {product_id: total for product_id, total in rows}
@@ -5,6 +5,7 @@ app_name = 'inventory'
 
 urlpatterns = [
     path('', views.inventory_list, name='inventory_list'),
+    path('rows/', views.inventory_rows, name='inventory_rows'),
     path('add/', views.add_item, name='add'),
     path('edit/<int:pk>/', views.edit_item, name='edit'),
 ]
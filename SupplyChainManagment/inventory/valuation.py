@@ -0,0 +1,149 @@
+"""
+Inventory valuation from cost layers.
+
+Stock coming in (goods receipts, returns, positive adjustments) adds a
+CostLayer holding its quantity and unit cost; stock going out consumes the
+oldest open layers first. InventoryItem.stock_value, the book value of the
+stock on hand, moves by the value of every change in the same transaction,
+so valuing the stock is a SUM over the inventory rows (``stock_values``)
+however long the history grows, and a sale only reads the open layers of
+the rows it takes from.
+
+INVENTORY_VALUATION_METHOD sets what stock going out costs:
+
+- ``'fifo'``: the cost of the layers it is taken from;
+- ``'average'``: its share of the value of the open layers (moving average).
+
+The order services value their lines with ``issue`` before writing them,
+so an OrderItem (and its LedgerEntry) carries the cost of the stock it took;
+manual and imported quantity changes go through ``adjust``.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, DecimalField, F, IntegerField, Sum, Value, When
+
+from .models import CostLayer, InventoryItem
+
+FIFO = 'fifo'
+AVERAGE = 'average'
+COST = Decimal('0.0001')
+CENT = Decimal('0.01')
+ZERO = Decimal('0')
+MONEY = DecimalField(max_digits=16, decimal_places=4)
+
+
+def _items(item_ids, items=None):
+    """{id: InventoryItem with its product} for ``item_ids``, reusing the already loaded ``items``."""
+    found = {pk: items[pk] for pk in item_ids if items and pk in items}
+    missing = [pk for pk in item_ids if pk not in found]
+    if missing:
+        found.update(InventoryItem.objects.select_related('product').in_bulk(missing))
+    return found
+
+
+def _move_values(deltas):
+    """Move the stock_value of several rows, ``deltas`` being {item id: value}, in one UPDATE."""
+    deltas = {pk: delta.quantize(COST) for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    change = Case(*[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                  default=Value(ZERO), output_field=MONEY)
+    InventoryItem.objects.filter(pk__in=list(deltas)).update(stock_value=F('stock_value') + change)
+
+
+def unit_cost(value, quantity):
+    """Cost per unit, to the cent, of ``quantity`` units worth ``value``."""
+    return (value / quantity).quantize(CENT) if quantity else ZERO
+
+
+def add(quantities, unit_costs=None, reference='', items=None):
+    """
+    Book incoming ``quantities`` ({item id: quantity}) as one cost layer per
+    row, at ``unit_costs`` ({item id: cost per unit}) or, where no cost is
+    given, at the row's cost price.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    costs = {pk: cost for pk, cost in (unit_costs or {}).items() if cost is not None}
+    missing = [pk for pk in quantities if pk not in costs]
+    if missing:
+        costs.update((pk, item.cost_price) for pk, item in _items(missing, items).items())
+    layers = [
+        CostLayer(inventory_item_id=pk, quantity=quantity, remaining=quantity,
+                  unit_cost=Decimal(costs.get(pk) or 0).quantize(COST), reference=reference)
+        for pk, quantity in quantities.items()
+    ]
+    CostLayer.objects.bulk_create(layers)
+    _move_values({layer.inventory_item_id: layer.quantity * layer.unit_cost for layer in layers})
+
+
+def issue(quantities, items=None):
+    """
+    Take outgoing ``quantities`` ({item id: quantity}) out of the open cost
+    layers, oldest first, and return {item id: cost of what was taken}. Stock
+    the layers do not cover (changed outside this module) costs the row's
+    cost price and does not move its stock value.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return {}
+    layers = (
+        CostLayer.objects.select_for_update()
+        .filter(inventory_item_id__in=list(quantities), remaining__gt=0)
+        .order_by('inventory_item_id', 'received_at', 'pk')
+        .values_list('pk', 'inventory_item_id', 'remaining', 'unit_cost', 'inventory_item__stock_value')
+    )
+    left = dict(quantities)
+    held = {}  # item id: (open quantity, stock value)
+    layer_costs = {}
+    consumed = {}  # layer id: what remains of it
+    for pk, item_id, remaining, cost, stock_value in layers:
+        held[item_id] = (held.get(item_id, (0, stock_value))[0] + remaining, stock_value)
+        taken = min(left[item_id], remaining)
+        if taken:
+            left[item_id] -= taken
+            consumed[pk] = remaining - taken
+            layer_costs[item_id] = layer_costs.get(item_id, ZERO) + taken * cost
+
+    covered_values = {}
+    if settings.INVENTORY_VALUATION_METHOD == AVERAGE:
+        for item_id, (open_quantity, stock_value) in held.items():
+            covered = quantities[item_id] - left[item_id]
+            # The last units out take whatever value is left, so the row ends at zero
+            covered_values[item_id] = stock_value if covered == open_quantity else stock_value * covered / open_quantity
+    else:
+        covered_values = layer_costs
+
+    uncovered = {pk: quantity for pk, quantity in left.items() if quantity}
+    loaded = _items(uncovered, items) if uncovered else {}
+    values = {}
+    for pk in quantities:
+        value = covered_values.get(pk, ZERO)
+        if pk in uncovered and pk in loaded:
+            value += uncovered[pk] * loaded[pk].cost_price
+        values[pk] = value.quantize(COST)
+
+    if consumed:
+        CostLayer.objects.filter(pk__in=list(consumed)).update(remaining=Case(
+            *[When(pk=pk, then=Value(remaining)) for pk, remaining in consumed.items()],
+            default=F('remaining'), output_field=IntegerField(),
+        ))
+    _move_values({pk: -value for pk, value in covered_values.items()})
+    return values
+
+
+def adjust(changes, reference='', items=None):
+    """Value quantity corrections ({item id: signed quantity}): increases at the row's cost price, decreases out of the layers."""
+    add({pk: quantity for pk, quantity in changes.items() if quantity > 0}, reference=reference, items=items)
+    issue({pk: -quantity for pk, quantity in changes.items() if quantity < 0}, items=items)
+
+
+def stock_values(product_ids=None):
+    """{product id: book value of its stock}, summed over its inventory rows in one query."""
+    rows = InventoryItem.objects.all()
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=list(product_ids))
+    rows = rows.order_by().values('product_id').annotate(value=Sum('stock_value')).values_list('product_id', 'value')
+    return dict(rows)
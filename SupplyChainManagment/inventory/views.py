@@ -1,22 +1,86 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import InventoryItem
+from django.db import transaction
+from django.template.loader import render_to_string
+from .models import InventoryItem, StockMovement, UNIT_CHOICES
 from .forms import InventoryItemForm
+from . import stock, valuation
+from theme import keyset
+from theme.decorators import skip_notifications
 from theme.notification_utils import notify_low_inventory
 
 # Create your views here.
 
+def _filtered_items(params):
+    """
+    Inventory rows matching the list filters (product, unit, location,
+    low_stock), and the cleaned filter values.
+    """
+    items = InventoryItem.objects.select_related('product')
+    filters = {}
+    product = (params.get('product') or '').strip()
+    if product:
+        # Prefix match on the SKU or the name, so their indexes can be used
+        items = items.filter(Q(product__sku__startswith=product) | Q(product__name__startswith=product))
+        filters['product'] = product
+    unit = params.get('unit') or ''
+    if unit in dict(UNIT_CHOICES):
+        items = items.filter(unit=unit)
+        filters['unit'] = unit
+    location = (params.get('location') or '').strip()
+    if location:
+        items = items.filter(location__startswith=location)
+        filters['location'] = location
+    if params.get('low_stock'):
+        items = items.filter(quantity__lt=settings.INVENTORY_LOW_STOCK_THRESHOLD)
+        filters['low_stock'] = '1'
+    return items, filters
+
+
+def _inventory_page(request):
+    items, filters = _filtered_items(request.GET)
+    page = keyset.paginate(items, request.GET.get('cursor'), settings.INVENTORY_PAGE_SIZE, 'added_on')
+    filter_query = urlencode(filters)
+    next_url = None
+    if page.has_next:
+        next_url = f"?{filter_query}&cursor={page.next_cursor}" if filter_query else f"?cursor={page.next_cursor}"
+    return {
+        'items': page.object_list,
+        'page': page,
+        'next_url': next_url,
+        'filters': filters,
+        'filter_query': filter_query,
+        'unit_choices': UNIT_CHOICES,
+        'low_stock_threshold': settings.INVENTORY_LOW_STOCK_THRESHOLD,
+        'is_first_page': not request.GET.get('cursor'),
+    }
+
+
 def inventory_list(request):
-    items = InventoryItem.objects.all()
-    return render(request, 'inventory_list.html', {'items': items})
+    return render(request, 'inventory_list.html', _inventory_page(request))
+
+
+@skip_notifications
+def inventory_rows(request):
+    """JSON endpoint rendering the next page of inventory rows (the "Load more" button)"""
+    context = _inventory_page(request)
+    return JsonResponse({'html': render_to_string('inventory_rows.html', context), 'next_url': context['next_url']})
 
 def add_item(request):
     if request.method == 'POST':
         form = InventoryItemForm(request.POST)
         if form.is_valid():
-            item = form.save()
+            with transaction.atomic():
+                item = form.save()
+                stock.record({item.pk: item.quantity}, StockMovement.ADJUSTMENT, 'Added manually')
+                valuation.adjust({item.pk: item.quantity}, 'Added manually', items={item.pk: item})
             
             # Check for low inventory and send notification
-            if item.quantity < 5:
+            if item.quantity < settings.INVENTORY_LOW_STOCK_THRESHOLD:
                 notify_low_inventory(request, item)
             
             return redirect('inventory:inventory_list')
@@ -29,10 +93,19 @@ def edit_item(request, pk):
     if request.method == 'POST':
         form = InventoryItemForm(request.POST, instance=item)
         if form.is_valid():
-            updated_item = form.save()
+            with transaction.atomic():
+                # Journal the manual correction as the difference it makes to the stored quantity
+                # (the form saves the whole row, so it takes the locked stock value along)
+                previous_quantity, item.stock_value = (
+                    InventoryItem.objects.select_for_update().values_list('quantity', 'stock_value').get(pk=pk)
+                )
+                updated_item = form.save()
+                change = {item.pk: updated_item.quantity - previous_quantity}
+                stock.record(change, StockMovement.ADJUSTMENT, 'Edited manually')
+                valuation.adjust(change, 'Edited manually', items={item.pk: updated_item})
             
             # Check for low inventory and send notification
-            if updated_item.quantity < 5:
+            if updated_item.quantity < settings.INVENTORY_LOW_STOCK_THRESHOLD:
                 notify_low_inventory(request, updated_item)
             
             return redirect('inventory:inventory_list')
@@ -2,16 +2,28 @@ from django.shortcuts import render, redirect, get_object_or_404
 from .models import Invoice
 from .forms import InvoiceForm
 from django.contrib.auth.decorators import login_required
-from orders.models import Order, OrderItem
 from decimal import Decimal
 from django.http import HttpResponse
 from django.template.loader import get_template
 import io
 from xhtml2pdf import pisa
-from theme.views import get_notifications
 from django.contrib import messages
 from theme.notification_utils import notify_invoice_paid
 
+def order_subtotal(order):
+    """Order value from its header totals; legacy orders without items use the product price."""
+    if order.line_count:
+        return order.total_value
+    return order.product.selling_price * order.quantity
+
+
+def invoice_lines(order):
+    """Rows to print on the invoice: the order items, or the order itself for legacy orders."""
+    if order.line_count:
+        return order.items.select_related('product')
+    return [order]
+
+
 @login_required
 def invoice_list(request):
     # All users can see all invoices for customer orders
@@ -26,21 +38,20 @@ def add_invoice(request):
             invoice = form.save(commit=False)
             order = invoice.order
             
-            # Calculate amount from order items if present, else from order
-            order_items = OrderItem.objects.filter(order=order)
-            if order_items.exists():
-                amount = sum(item.unit_selling_price * item.quantity for item in order_items)
-            else:
-                amount = order.product.selling_price * order.quantity
+            amount = order_subtotal(order)
             tax = amount * Decimal('0.05')
             delivery = 100
             invoice.amount = amount + tax + delivery
             invoice.save()
+            
+            # Send notification if the invoice was created already paid
+            if invoice.payment_status == 'paid':
+                notify_invoice_paid(request, invoice)
+            
             return redirect('invoice_list')
     else:
         form = InvoiceForm(user=request.user)
-    notifications = get_notifications()
-    return render(request, 'add_invoice.html', {'form': form, 'notifications': notifications})
+    return render(request, 'add_invoice.html', {'form': form})
 
 @login_required
 def edit_invoice(request, pk):
@@ -65,11 +76,7 @@ def edit_invoice(request, pk):
             old_payment_status = Invoice.objects.get(pk=invoice.pk).payment_status
             invoice = form.save(commit=False)
             order = invoice.order
-            order_items = OrderItem.objects.filter(order=order)
-            if order_items.exists():
-                amount = sum(item.product.selling_price * item.quantity for item in order_items)
-            else:
-                amount = order.product.selling_price * order.quantity
+            amount = order_subtotal(order)
             tax = amount * Decimal('0.05')
             delivery = 100
             invoice.amount = amount + tax + delivery
@@ -89,13 +96,8 @@ def invoice_detail(request, pk):
     invoice = get_object_or_404(Invoice, pk=pk)
     order = invoice.order
     customer_name = order.customer_name or "Walk-in Customer"
-    order_items = OrderItem.objects.filter(order=order)
-    if order_items.exists():
-        products = order_items
-        subtotal = sum(item.total_price for item in order_items)
-    else:
-        products = [order]
-        subtotal = order.product.selling_price * order.quantity
+    products = invoice_lines(order)
+    subtotal = order_subtotal(order)
     
     # Calculate 5% tax on subtotal
     tax = subtotal * Decimal('0.05')
@@ -115,13 +117,8 @@ def download_invoice_pdf(request, pk):
     invoice = get_object_or_404(Invoice, pk=pk)
     order = invoice.order
     customer_name = order.customer_name or "Walk-in Customer"
-    order_items = OrderItem.objects.filter(order=order)
-    if order_items.exists():
-        products = order_items
-        subtotal = sum(item.total_price for item in order_items)
-    else:
-        products = [order]
-        subtotal = order.product.selling_price * order.quantity
+    products = invoice_lines(order)
+    subtotal = order_subtotal(order)
     
     # Calculate 5% tax on subtotal
     tax = subtotal * Decimal('0.05')
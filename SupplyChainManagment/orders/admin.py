@@ -1,8 +1,22 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Customer, Order, OrderItem, OrderStatusChange
 
 # Register your models here.
 
+@admin.register(Customer)
+class CustomerAdmin(admin.ModelAdmin):
+    list_display = ('name', 'email', 'phone', 'order_count', 'lifetime_value', 'created_at')
+    search_fields = ('name', 'email', 'phone')
+    ordering = ('-lifetime_value',)
+    # Maintained by orders.customers
+    readonly_fields = ('email_key', 'phone_key', 'name_key', 'order_count', 'lifetime_value')
+
+class OrderStatusChangeInline(admin.TabularInline):
+    model = OrderStatusChange
+    extra = 0
+    can_delete = False
+    readonly_fields = ('from_status', 'to_status', 'changed_by', 'changed_at')
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'customer_name', 'customer_email', 'customer_phone', 'order_date', 'status', 'ordered_by')
@@ -10,6 +24,7 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ('customer_name', 'customer_email', 'customer_phone', 'id')
     list_editable = ('status',)
     readonly_fields = ('ordered_by',)
+    inlines = [OrderStatusChangeInline]
     
     fieldsets = (
         ('Customer Information', {
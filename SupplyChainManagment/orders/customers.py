@@ -0,0 +1,216 @@
+"""
+Customers behind the orders.
+
+Orders keep the customer details they were placed with; ``resolve_many``
+maps those details onto one Customer row each, matching on the normalized
+email first, then on the phone number (digits only), and, for orders that
+carry neither, on the case-folded name. Walk-in orders without any details
+get no customer.
+
+Customer.order_count and lifetime_value (the sum of its orders'
+total_value) are moved with ``UPDATE ... SET x = x + delta`` by whatever
+writes the orders (orders.services, orders.totals, the Order delete signal),
+so the top customers are an indexed ORDER BY ... LIMIT. ``refresh``
+recomputes them from the orders.
+"""
+import re
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from theme.dashboard_cache import bump_version_on_commit
+
+WALK_IN_NAMES = {'', 'walk-in', 'walk-in customer'}
+ZERO = Decimal('0')
+
+
+def normalize_email(value):
+    return (value or '').strip().lower()
+
+
+def normalize_phone(value):
+    return re.sub(r'\D', '', value or '')
+
+
+def normalize_name(value):
+    return ' '.join((value or '').split()).casefold()
+
+
+def customer_keys(details):
+    """(email key, phone key, name key) of order ``details``, or None for an anonymous walk-in."""
+    email = normalize_email(details.get('customer_email'))
+    phone = normalize_phone(details.get('customer_phone'))
+    name = normalize_name(details.get('customer_name'))
+    if not email and not phone and name in WALK_IN_NAMES:
+        return None
+    return email, phone, name
+
+
+def _lookup(keys):
+    """{(kind, key): Customer} for the customers matching any of ``keys``, from one query."""
+    from .models import Customer
+
+    emails = {email for email, _, _ in keys if email}
+    phones = {phone for _, phone, _ in keys if phone}
+    names = {name for email, phone, name in keys if not email and not phone}
+    condition = Q(email_key__in=emails) | Q(phone_key__in=phones) | Q(email_key='', phone_key='', name_key__in=names)
+    found = {}
+    for customer in Customer.objects.filter(condition):
+        _remember(found, customer)
+    return found
+
+
+def _remember(found, customer):
+    if customer.email_key:
+        found.setdefault(('email', customer.email_key), customer)
+    if customer.phone_key:
+        found.setdefault(('phone', customer.phone_key), customer)
+    if not customer.email_key and not customer.phone_key:
+        found.setdefault(('name', customer.name_key), customer)
+
+
+def _match(found, keys):
+    email, phone, name = keys
+    if email or phone:
+        return found.get(('email', email)) or found.get(('phone', phone))
+    return found.get(('name', name))
+
+
+def _new_customer(details, keys):
+    from .models import Customer
+
+    email, phone, name = keys
+    display_name = (details.get('customer_name') or '').strip()
+    if name in WALK_IN_NAMES:
+        display_name = details.get('customer_email') or details.get('customer_phone')
+    return Customer(
+        name=display_name,
+        email=details.get('customer_email') or None,
+        phone=details.get('customer_phone') or None,
+        address=details.get('customer_address') or None,
+        email_key=email,
+        phone_key=phone,
+        name_key=name,
+    )
+
+
+def _fill_keys(customer, keys, found):
+    """Record an email or phone number a matched customer did not have yet."""
+    from .models import Customer
+
+    email, phone, _ = keys
+    changes = {}
+    if email and not customer.email_key and ('email', email) not in found:
+        changes['email_key'] = email
+    if phone and not customer.phone_key and ('phone', phone) not in found:
+        changes['phone_key'] = phone
+    if not changes:
+        return
+    try:
+        with transaction.atomic():
+            Customer.objects.filter(pk=customer.pk).update(**changes)
+    except IntegrityError:
+        return  # Taken by a customer created concurrently, keep the match as it is
+    for name, value in changes.items():
+        setattr(customer, name, value)
+    _remember(found, customer)
+
+
+def resolve_many(details_list):
+    """
+    The Customer for each of ``details_list`` (dicts with the Order customer_*
+    fields), creating the missing ones; None for anonymous walk-ins. Costs one
+    lookup query, plus one INSERT and a second lookup when customers are new.
+    """
+    from .models import Customer
+
+    keys_list = [customer_keys(details) for details in details_list]
+    known = [keys for keys in keys_list if keys is not None]
+    if not known:
+        return [None] * len(details_list)
+
+    found = _lookup(known)
+    new = []
+    for details, keys in zip(details_list, keys_list):
+        if keys is None:
+            continue
+        customer = _match(found, keys)
+        if customer is None:
+            customer = _new_customer(details, keys)
+            new.append(customer)
+            _remember(found, customer)
+        elif customer.pk is not None:
+            _fill_keys(customer, keys, found)
+    if new:
+        # Rows created concurrently in the meantime are picked up by the second lookup
+        Customer.objects.bulk_create(new, ignore_conflicts=True)
+        found = _lookup(known)
+        bump_version_on_commit(Customer)
+    return [None if keys is None else _match(found, keys) for keys in keys_list]
+
+
+def resolve(**details):
+    """The Customer for one order's customer_* fields (None for an anonymous walk-in)."""
+    return resolve_many([details])[0]
+
+
+def add_many(deltas):
+    """Move the counters of several customers, ``deltas`` being {customer id: (orders, value)}, in one UPDATE."""
+    from .models import Customer
+
+    deltas = {pk: delta for pk, delta in deltas.items() if pk and any(delta)}
+    if not deltas:
+        return
+    money = DecimalField(max_digits=14, decimal_places=2)
+    count = Case(*[When(pk=pk, then=Value(orders)) for pk, (orders, _) in deltas.items()],
+                 default=Value(0), output_field=IntegerField())
+    value = Case(*[When(pk=pk, then=Value(amount)) for pk, (_, amount) in deltas.items()],
+                 default=Value(ZERO), output_field=money)
+    Customer.objects.filter(pk__in=list(deltas)).update(
+        order_count=F('order_count') + count, lifetime_value=F('lifetime_value') + value,
+    )
+    bump_version_on_commit(Customer)
+
+
+def add(customer_id, orders=0, value=ZERO):
+    add_many({customer_id: (orders, value)})
+
+
+def add_order_value(order_id, value):
+    """Move the lifetime value of the customer of ``order_id`` (if any) by ``value``."""
+    from .models import Customer
+
+    if order_id and value and Customer.objects.filter(orders=order_id).update(
+        lifetime_value=F('lifetime_value') + value,
+    ):
+        bump_version_on_commit(Customer)
+
+
+def refresh(customer_ids):
+    """Recompute the counters of ``customer_ids`` from their orders in one UPDATE."""
+    from .models import Customer, Order
+
+    customer_ids = [pk for pk in set(customer_ids) if pk]
+    if not customer_ids:
+        return 0
+    money = DecimalField(max_digits=14, decimal_places=2)
+    orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+    updated = Customer.objects.filter(pk__in=customer_ids).update(
+        order_count=Coalesce(Subquery(orders.annotate(n=Count('pk')).values('n')), Value(0)),
+        lifetime_value=Coalesce(
+            Subquery(orders.annotate(total=Sum('total_value')).values('total')), Value(ZERO), output_field=money,
+        ),
+    )
+    bump_version_on_commit(Customer)
+    return updated
+
+
+def refresh_orders(order_ids):
+    """Recompute the counters of the customers of ``order_ids``."""
+    from .models import Order
+
+    return refresh(
+        Order.objects.filter(pk__in=list(order_ids), customer__isnull=False).values_list('customer_id', flat=True)
+    )
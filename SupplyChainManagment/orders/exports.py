@@ -0,0 +1,155 @@
+"""
+Streaming exports of orders, order items and the profit ledger.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and written
+out as they arrive (CSV through a generator, XLSX through openpyxl's
+write-only workbook), so memory stays flat however many rows match. The same
+order filters as the order list apply to every dataset. XLSX needs the
+optional openpyxl package.
+"""
+import csv
+import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import openpyxl
+except ImportError:  # XLSX export is optional
+    openpyxl = None
+
+# dataset -> model, path from the model to its Order, and (header, field) columns
+DATASETS = {
+    'orders': {
+        'model': 'orders.Order',
+        'order_path': '',
+        'columns': [
+            ('Order ID', 'pk'),
+            ('Order date', 'order_date'),
+            ('Status', 'status'),
+            ('Customer', 'customer_name'),
+            ('Email', 'customer_email'),
+            ('Phone', 'customer_phone'),
+            ('Lines', 'line_count'),
+            ('Quantity', 'quantity'),
+            ('Total value', 'total_value'),
+            ('Total cost', 'total_cost'),
+            ('Total profit', 'total_profit'),
+            ('Ordered by', 'ordered_by__username'),
+        ],
+    },
+    'order_items': {
+        'model': 'orders.OrderItem',
+        'order_path': 'order__',
+        'columns': [
+            ('Item ID', 'pk'),
+            ('Order ID', 'order_id'),
+            ('Order date', 'order__order_date'),
+            ('Status', 'order__status'),
+            ('Customer', 'order__customer_name'),
+            ('Product', 'product__name'),
+            ('SKU', 'product__sku'),
+            ('Unit', 'inventory_item__unit'),
+            ('Quantity', 'quantity'),
+            ('Unit price', 'unit_selling_price'),
+            ('Unit cost', 'unit_cost_price'),
+            ('Total price', 'total_price'),
+            ('Total profit', 'total_profit'),
+        ],
+    },
+    'ledger': {
+        'model': 'products.LedgerEntry',
+        'order_path': 'order_item__order__',
+        'columns': [
+            ('Entry ID', 'pk'),
+            ('Posted at', 'created_at'),
+            ('Order ID', 'order_item__order_id'),
+            ('Order date', 'order_item__order__order_date'),
+            ('Product', 'product__name'),
+            ('SKU', 'product__sku'),
+            ('Quantity', 'quantity_sold'),
+            ('Cost price', 'cost_price'),
+            ('Selling price', 'selling_price'),
+            ('Profit', 'profit'),
+        ],
+    },
+}
+FORMATS = ['csv', 'xlsx']
+
+
+def parse_filters(params):
+    """
+    Read the order filters (status, date_from, date_to, customer) from
+    ``params``. Returns (Order lookups, cleaned values); each lookup maps onto
+    an index of Order.
+    """
+    from .models import Order
+
+    lookups = {}
+    cleaned = {}
+    status = params.get('status') or ''
+    if status in dict(Order.STATUS_CHOICES):
+        lookups['status'] = status
+        cleaned['status'] = status
+    for name, lookup in (('date_from', 'order_date__gte'), ('date_to', 'order_date__lte')):
+        try:
+            day = datetime.date.fromisoformat(params.get(name) or '')
+        except ValueError:
+            continue
+        lookups[lookup] = day
+        cleaned[name] = day.isoformat()
+    customer = (params.get('customer') or '').strip()
+    if customer:
+        # Prefix match so the customer_name index can be used
+        lookups['customer_name__startswith'] = customer
+        cleaned['customer'] = customer
+    return lookups, cleaned
+
+
+def rows(dataset, lookups):
+    """Header row, then every matching row of ``dataset`` read in chunks."""
+    spec = DATASETS[dataset]
+    model = apps.get_model(spec['model'])
+    headers, fields = zip(*spec['columns'])
+    queryset = (
+        model.objects.filter(**{spec['order_path'] + lookup: value for lookup, value in lookups.items()})
+        .order_by('pk')
+        .values_list(*fields)
+    )
+    yield headers
+    yield from queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes to it."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(row_iter):
+    writer = csv.writer(_Echo())
+    for row in row_iter:
+        yield writer.writerow(row)
+
+
+def _xlsx_value(value):
+    # Excel has no time zones
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def write_xlsx(row_iter, target, title):
+    """Write the rows to ``target`` (a path or binary file) with a write-only workbook."""
+    if openpyxl is None:
+        raise RuntimeError('XLSX export needs the openpyxl package (pip install openpyxl).')
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title)
+    for row in row_iter:
+        sheet.append([_xlsx_value(value) for value in row])
+    workbook.save(target)
+
+
+def filename(dataset, export_format):
+    return f'{dataset}-{timezone.localdate().isoformat()}.{export_format}'
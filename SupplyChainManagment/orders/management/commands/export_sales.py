@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import exports
+
+
+class Command(BaseCommand):
+    help = 'Export orders, order items or ledger entries as CSV or XLSX without loading them into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(exports.DATASETS))
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write (CSV defaults to standard output)')
+        parser.add_argument('--date-from', help='First order date (YYYY-MM-DD)')
+        parser.add_argument('--date-to', help='Last order date (YYYY-MM-DD)')
+        parser.add_argument('--status', help='Only orders with this status')
+        parser.add_argument('--customer', help='Only customers whose name starts with this')
+
+    def handle(self, *args, **options):
+        lookups, _ = exports.parse_filters(options)
+        rows = exports.rows(options['dataset'], lookups)
+
+        if options['format'] == 'xlsx':
+            if not options['output']:
+                raise CommandError('XLSX export needs --output.')
+            try:
+                exports.write_xlsx(rows, options['output'], title=options['dataset'])
+            except RuntimeError as e:
+                raise CommandError(str(e))
+        elif options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as target:
+                target.writelines(exports.csv_lines(rows))
+        else:
+            for line in exports.csv_lines(rows):
+                self.stdout.write(line, ending='')
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders import totals
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Check the order header totals against the order items, optionally fixing (backfilling) them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Recompute the headers that differ from their items')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of orders checked per batch')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            ids = list(Order.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                wrong = totals.verify(ids)
+                if wrong and options['fix']:
+                    totals.refresh(wrong)
+            for order_id, expected in wrong.items():
+                self.stdout.write(f'Order #{order_id}: expected {expected}')
+            checked += len(ids)
+            drifted += len(wrong)
+            last_pk = ids[-1]
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'Checked {checked} order(s), all headers match their items.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Checked {checked} order(s), fixed {drifted} header(s).'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Checked {checked} order(s), {drifted} header(s) differ. Run with --fix to recompute them.'
+            ))
@@ -0,0 +1,45 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, F, IntegerField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 2000
+ZERO = Decimal('0')
+
+
+def backfill_header_totals(apps, schema_editor):
+    # Same sums as orders.totals.refresh at the time of this migration; orders
+    # without items (legacy single-product orders) keep a zero header
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    money = DecimalField(max_digits=12, decimal_places=2)
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    value = Coalesce(
+        Subquery(items.annotate(total=Sum(F('quantity') * F('unit_selling_price'), output_field=money)).values('total')),
+        Value(ZERO), output_field=money,
+    )
+    cost = Coalesce(
+        Subquery(items.annotate(total=Sum(F('quantity') * F('unit_cost_price'), output_field=money)).values('total')),
+        Value(ZERO), output_field=money,
+    )
+    lines = Coalesce(
+        Subquery(items.annotate(total=Sum(Value(1))).values('total')), Value(0), output_field=IntegerField(),
+    )
+    last_pk = Order.objects.aggregate(last=Max('pk'))['last'] or 0
+    for start in range(0, last_pk, CHUNK_SIZE):
+        Order.objects.filter(pk__gt=start, pk__lte=start + CHUNK_SIZE).update(
+            total_value=value, total_cost=cost, total_profit=value - cost, line_count=lines,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_order_header_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_header_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_backfill_order_header_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('address', models.TextField(blank=True, null=True)),
+                ('email_key', models.CharField(blank=True, default='', max_length=254)),
+                ('phone_key', models.CharField(blank=True, default='', max_length=20)),
+                ('name_key', models.CharField(blank=True, default='', max_length=255)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('lifetime_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-order_count', '-lifetime_value'], name='customer_top_orders_idx'), models.Index(fields=['-lifetime_value'], name='customer_top_value_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('email_key', ''), _negated=True), fields=('email_key',), name='customer_unique_email_key'), models.UniqueConstraint(condition=models.Q(('phone_key', ''), _negated=True), fields=('phone_key',), name='customer_unique_phone_key'), models.UniqueConstraint(condition=models.Q(('email_key', ''), ('phone_key', '')), fields=('name_key',), name='customer_unique_name_key')],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='orders.customer'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+import re
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 2000
+WALK_IN_NAMES = {'', 'walk-in', 'walk-in customer'}
+
+
+def _keys(name, email, phone):
+    # Same matching rules as orders.customers at the time of this migration
+    email = (email or '').strip().lower()
+    phone = re.sub(r'\D', '', phone or '')
+    name = ' '.join((name or '').split()).casefold()
+    if not email and not phone and name in WALK_IN_NAMES:
+        return None
+    return email, phone, name
+
+
+def backfill_customers(apps, schema_editor):
+    Customer = apps.get_model('orders', 'Customer')
+    Order = apps.get_model('orders', 'Order')
+
+    # Oldest order first, so a customer keeps the details of its first order
+    by_email, by_phone, by_name = {}, {}, {}
+    last_pk = 0
+    while True:
+        rows = list(
+            Order.objects.filter(pk__gt=last_pk, customer__isnull=True).order_by('pk')
+            .values_list('pk', 'customer_name', 'customer_email', 'customer_phone', 'customer_address')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        assigned = {}
+        for pk, name, email, phone, address in rows:
+            keys = _keys(name, email, phone)
+            if keys is None:
+                continue
+            email_key, phone_key, name_key = keys
+            if email_key or phone_key:
+                customer = by_email.get(email_key) or by_phone.get(phone_key)
+            else:
+                customer = by_name.get(name_key)
+            if customer is None:
+                display_name = (name or '').strip()
+                if name_key in WALK_IN_NAMES:
+                    display_name = email or phone
+                customer = Customer.objects.create(
+                    name=display_name, email=email or None, phone=phone or None, address=address or None,
+                    email_key=email_key, phone_key=phone_key, name_key=name_key,
+                )
+            else:
+                filled = []
+                if email_key and not customer.email_key and email_key not in by_email:
+                    customer.email_key = email_key
+                    filled.append('email_key')
+                if phone_key and not customer.phone_key and phone_key not in by_phone:
+                    customer.phone_key = phone_key
+                    filled.append('phone_key')
+                if filled:
+                    customer.save(update_fields=filled)
+            if customer.email_key:
+                by_email.setdefault(customer.email_key, customer)
+            if customer.phone_key:
+                by_phone.setdefault(customer.phone_key, customer)
+            if not customer.email_key and not customer.phone_key:
+                by_name.setdefault(customer.name_key, customer)
+            assigned.setdefault(customer.pk, []).append(pk)
+        for customer_id, order_ids in assigned.items():
+            Order.objects.filter(pk__in=order_ids).update(customer_id=customer_id)
+
+    # Lifetime counters from the order headers; where those were never backfilled,
+    # verify_order_totals --fix refreshes the counters along with the headers
+    orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+    Customer.objects.update(
+        order_count=Coalesce(Subquery(orders.annotate(n=Count('pk')).values('n')), Value(0)),
+        lifetime_value=Coalesce(
+            Subquery(orders.annotate(total=Sum('total_value')).values('total')), Value(0),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_customer'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_customers, migrations.RunPython.noop),
+    ]
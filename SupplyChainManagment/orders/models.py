@@ -1,10 +1,47 @@
 from django.db import models
+from products import ledger
+from . import totals
 from products.models import Product
 from inventory.models import InventoryItem
 from django.conf import settings
 
 # Create your models here.
 
+class Customer(models.Model):
+    """A customer behind one or more orders, deduplicated by orders.customers."""
+    name = models.CharField(max_length=255)
+    email = models.EmailField(blank=True, null=True)
+    phone = models.CharField(max_length=20, blank=True, null=True)
+    address = models.TextField(blank=True, null=True)
+    # Matching keys, see orders.customers (empty when unknown)
+    email_key = models.CharField(max_length=254, blank=True, default='')
+    phone_key = models.CharField(max_length=20, blank=True, default='')
+    name_key = models.CharField(max_length=255, blank=True, default='')
+    # Lifetime counters, moved incrementally by orders.customers
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['email_key'], condition=~models.Q(email_key=''),
+                                    name='customer_unique_email_key'),
+            models.UniqueConstraint(fields=['phone_key'], condition=~models.Q(phone_key=''),
+                                    name='customer_unique_phone_key'),
+            # Customers known by name only (no email or phone on their orders)
+            models.UniqueConstraint(fields=['name_key'], condition=models.Q(email_key='', phone_key=''),
+                                    name='customer_unique_name_key'),
+        ]
+        # Top customers are read with ORDER BY ... LIMIT on these
+        indexes = [
+            models.Index(fields=['-order_count', '-lifetime_value'], name='customer_top_orders_idx'),
+            models.Index(fields=['-lifetime_value'], name='customer_top_value_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -13,6 +50,14 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
+    # status -> statuses an order can be moved to from it (orders.services.transition_orders)
+    TRANSITIONS = {
+        'pending': ['approved', 'cancelled'],
+        'approved': ['shipped', 'cancelled'],
+        'shipped': ['delivered'],
+        'delivered': [],
+        'cancelled': [],
+    }
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     customer_name = models.CharField(max_length=255, blank=True, null=True, help_text="Customer name for this order")
@@ -23,6 +68,22 @@ class Order(models.Model):
     order_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     ordered_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Set by orders.customers from the customer details above
+    customer = models.ForeignKey(Customer, related_name='orders', on_delete=models.SET_NULL, null=True, blank=True)
+    # Header totals of the order items, kept in sync by orders.totals
+    total_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_profit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    line_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # The order list pages newest first on (order_date, id), optionally
+        # filtered by status or customer name prefix
+        indexes = [
+            models.Index(fields=['order_date', 'id'], name='order_date_id_idx'),
+            models.Index(fields=['status', 'order_date', 'id'], name='order_status_date_id_idx'),
+            models.Index(fields=['customer_name', 'order_date'], name='order_customer_date_idx'),
+        ]
 
     def __str__(self):
         if self.order_date:
@@ -30,6 +91,23 @@ class Order(models.Model):
         else:
             return f"Order Id #{self.id} (No Date)"
 
+class OrderStatusChange(models.Model):
+    """One status change of an order, written in bulk by orders.services."""
+    order = models.ForeignKey(Order, related_name='status_changes', on_delete=models.CASCADE)
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-changed_at', '-id']
+        indexes = [
+            models.Index(fields=['order', '-changed_at'], name='order_status_change_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -40,6 +118,14 @@ class OrderItem(models.Model):
     total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Total selling price
     total_profit = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Total profit
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored line so a save only moves the header by the difference
+        if totals.ITEM_FIELDS <= set(field_names):
+            instance._header_line = (instance.order_id, totals.line_totals(instance))
+        return instance
+
     def save(self, *args, **kwargs):
         # Auto-fill prices from product if not set
         if not self.unit_selling_price:
@@ -51,20 +137,18 @@ class OrderItem(models.Model):
         self.total_price = self.quantity * self.unit_selling_price
         self.total_profit = self.quantity * (self.unit_selling_price - self.unit_cost_price)
         
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        
-        # Create ledger entry for profit tracking
-        from products.models import LedgerEntry
-        LedgerEntry.objects.update_or_create(
-            order_item=self,
-            defaults={
-                'product': self.product,
-                'quantity_sold': self.quantity,
-                'cost_price': self.unit_cost_price,
-                'selling_price': self.unit_selling_price,
-                'profit': self.total_profit
-            }
-        )
+
+        # The ledger entry is posted in bulk once the transaction commits
+        ledger.schedule([self.pk])
+
+        if adding or hasattr(self, '_header_line'):
+            totals.item_saved(self, getattr(self, '_header_line', None))
+        else:
+            # Loaded with deferred fields: recompute the header instead
+            totals.refresh([self.order_id])
+        self._header_line = (self.order_id, totals.line_totals(self))
 
     @property
     def profit_per_unit(self):
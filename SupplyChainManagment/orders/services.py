@@ -0,0 +1,482 @@
+"""
+Order placement.
+
+place_order() validates every line of an order at once, locks the inventory
+rows it touches and writes the order in a fixed number of queries whatever
+the number of lines: one locking SELECT, one conditional UPDATE for the
+stock and one INSERT for its journal (inventory.stock), and one INSERT each
+for the order (with its header totals) and its items. Lines cost what the
+stock they take is valued at (inventory.valuation: one SELECT of the open
+cost layers, one UPDATE each for the layers and the rows' stock value).
+The ledger rows are posted in one batch at commit (products.ledger), and
+the customer (orders.customers) is matched and its counters moved with one
+lookup and one UPDATE.
+
+place_orders() is the batch variant used by the ingest API: one locking
+SELECT and one stock UPDATE for the whole batch, then bulk INSERTs for all
+the accepted orders and their items.
+
+update_order() edits an existing order by diffing the submitted lines with
+the stored ones, so its cost grows with the number of changed lines only.
+
+transition_orders() moves many orders to a new status at once: one locking
+SELECT, one UPDATE and one INSERT for the status history.
+"""
+import datetime
+import re
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.timezone import now
+
+from inventory import stock as stock_api
+from inventory import valuation
+from inventory.models import InventoryItem, StockMovement
+from products import ledger
+from theme.dashboard_cache import bump_version_on_commit
+from theme.rollups import mark_day_dirty
+from . import customers, totals
+from .models import Order, OrderItem, OrderStatusChange
+
+LINE_FIELD = re.compile(r'^quantity_(\d+)_(\d+)$')
+CUSTOMER_FIELDS = ['customer_name', 'customer_email', 'customer_phone', 'customer_address']
+BATCH_SIZE = 500
+
+
+def parse_order_lines(data):
+    """
+    Read the ``quantity_<product id>_<inventory item id>`` fields of the order
+    form and return {inventory item id: (product id, quantity)} for the lines
+    with a positive quantity.
+    """
+    lines = {}
+    errors = []
+    for field, value in data.items():
+        match = LINE_FIELD.match(field)
+        if not match:
+            continue
+        value = str(value).strip()
+        try:
+            quantity = int(value) if value else 0
+        except ValueError:
+            errors.append(f'Invalid quantity "{value}".')
+            continue
+        if quantity < 0:
+            errors.append(f'Invalid quantity "{value}".')
+        elif quantity > 0:
+            product_id, inventory_id = int(match.group(1)), int(match.group(2))
+            lines[inventory_id] = (product_id, quantity)
+    if errors:
+        raise ValidationError(errors)
+    return lines
+
+
+def lock_inventory(inventory_ids):
+    """Lock the given inventory rows until the end of the transaction."""
+    return {
+        item.pk: item
+        for item in InventoryItem.objects.select_for_update().select_related('product').filter(pk__in=inventory_ids)
+    }
+
+
+def build_order_item(order, item, quantity, cost_price=None):
+    """
+    Unsaved OrderItem with the prices and totals OrderItem.save() would set,
+    costing ``cost_price`` per unit (the stock's valuation) when given.
+    """
+    selling_price = item.selling_price or item.product.selling_price or Decimal('0')
+    if cost_price is None:
+        cost_price = item.cost_price or item.product.cost_price or Decimal('0')
+    return OrderItem(
+        order=order,
+        product=item.product,
+        inventory_item=item,
+        quantity=quantity,
+        unit_selling_price=selling_price,
+        unit_cost_price=cost_price,
+        total_price=quantity * selling_price,
+        total_profit=quantity * (selling_price - cost_price),
+    )
+
+
+def place_order(lines, ordered_by, order_date, status='pending', customer_name=None,
+                customer_email=None, customer_phone=None, customer_address=None):
+    """
+    Create an order for ``lines`` ({inventory item id: (product id, quantity)}).
+
+    Raises ValidationError (with one message per problem line) when a line
+    refers to unknown stock or asks for more than is available; in that case
+    nothing is written.
+    """
+    if not lines:
+        raise ValidationError('Please enter quantity for at least one product.')
+
+    with transaction.atomic():
+        stock = lock_inventory(lines)
+        errors = []
+        for inventory_id, (product_id, quantity) in lines.items():
+            item = stock.get(inventory_id)
+            if item is None or item.product_id != product_id:
+                errors.append('Inventory item not found for the selected product.')
+            elif item.quantity < quantity:
+                errors.append(
+                    f'Not enough inventory for {item.product.name} ({item.get_unit_display()}). '
+                    f'Available: {item.quantity}'
+                )
+        if errors:
+            raise ValidationError(errors)
+
+        quantities = {inventory_id: quantity for inventory_id, (_, quantity) in lines.items()}
+        # Each line costs what its stock was valued at (inventory.valuation)
+        values = valuation.issue(quantities, items=stock)
+        first = stock[next(iter(lines))]
+        customer = customers.resolve(
+            customer_name=customer_name, customer_email=customer_email,
+            customer_phone=customer_phone, customer_address=customer_address,
+        )
+        order = Order(
+            product=first.product,  # Legacy single-product field, the lines are in items
+            quantity=sum(quantity for _, quantity in lines.values()),
+            order_date=order_date,
+            status=status,
+            ordered_by=ordered_by,
+            customer_name=customer_name,
+            customer_email=customer_email,
+            customer_phone=customer_phone,
+            customer_address=customer_address,
+            customer=customer,
+        )
+        order_items = [
+            build_order_item(order, stock[inventory_id], quantity, valuation.unit_cost(values[inventory_id], quantity))
+            for inventory_id, quantity in quantities.items()
+        ]
+        # The header carries the totals from the start, see orders.totals
+        for name, value in totals.order_totals(order_items).items():
+            setattr(order, name, value)
+        order.save()
+        # The lines were checked against the locked rows above, so this cannot fail
+        stock_api.take_many(quantities, reference=f'Order #{order.pk}')
+        OrderItem.objects.bulk_create(order_items)
+        ledger.schedule(item.pk for item in order_items)
+        customers.add(order.customer_id, 1, order.total_value)
+
+        # bulk_create sends no signals: refresh the rollup and dashboard sections here
+        mark_day_dirty(order_date)
+        bump_version_on_commit(OrderItem)
+    return order
+
+
+def _sku_index(batch):
+    """{(sku, unit): inventory item id} for every SKU line of the batch, from one query."""
+    skus = {
+        line['sku']
+        for raw in batch if isinstance(raw, dict) and isinstance(raw.get('lines'), list)
+        for line in raw['lines'] if isinstance(line, dict) and line.get('sku')
+    }
+    if not skus:
+        return {}
+    rows = InventoryItem.objects.filter(product__sku__in=skus).values_list('product__sku', 'unit', 'pk')
+    return {(sku, unit): pk for sku, unit, pk in rows}
+
+
+def parse_batch_order(raw, skus, today):
+    """
+    Validate one order of an ingest batch. Returns (order fields, lines, errors)
+    with lines as {inventory item id: quantity}; lines may name the stock by
+    ``inventory_item`` id or by ``sku`` and ``unit`` (default piece).
+    """
+    if not isinstance(raw, dict):
+        return {}, {}, ['Each order must be a JSON object.']
+    errors = []
+    lines = {}
+    raw_lines = raw.get('lines')
+    if not isinstance(raw_lines, list) or not raw_lines:
+        errors.append('An order needs at least one line.')
+        raw_lines = []
+    for number, line in enumerate(raw_lines, 1):
+        if not isinstance(line, dict):
+            errors.append(f'Line {number}: must be a JSON object.')
+            continue
+        quantity = line.get('quantity')
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            errors.append(f'Line {number}: quantity must be a positive integer.')
+            continue
+        if line.get('inventory_item') is not None:
+            inventory_id = line['inventory_item']
+            if not isinstance(inventory_id, int) or isinstance(inventory_id, bool):
+                errors.append(f'Line {number}: inventory_item must be an id.')
+                continue
+        elif line.get('sku'):
+            unit = line.get('unit') or 'piece'
+            inventory_id = skus.get((line['sku'], unit))
+            if inventory_id is None:
+                errors.append(f'Line {number}: no stock for SKU {line["sku"]} ({unit}).')
+                continue
+        else:
+            errors.append(f'Line {number}: give either inventory_item or sku.')
+            continue
+        lines[inventory_id] = lines.get(inventory_id, 0) + quantity
+
+    fields = {'status': raw.get('status') or 'pending', 'order_date': today}
+    if fields['status'] not in dict(Order.STATUS_CHOICES):
+        errors.append(f'Unknown status "{fields["status"]}".')
+    if raw.get('order_date'):
+        try:
+            fields['order_date'] = datetime.date.fromisoformat(str(raw['order_date']))
+        except ValueError:
+            errors.append('order_date must be a YYYY-MM-DD date.')
+    for name in CUSTOMER_FIELDS:
+        value = raw.get(name)
+        fields[name] = (str(value).strip() or None) if value is not None else None
+    return fields, lines, errors
+
+
+def place_orders(batch, ordered_by):
+    """
+    Place a batch of orders (dicts as read by parse_batch_order) in one
+    transaction. Orders are checked against the stock in batch order, so an
+    order the remaining stock cannot cover is rejected without affecting the
+    others.
+
+    Returns one result per order, in batch order: {'order': Order} for a
+    placed order, {'errors': [...]} for a rejected one.
+    """
+    if len(batch) > settings.ORDER_INGEST_MAX_BATCH:
+        raise ValidationError(f'A batch holds at most {settings.ORDER_INGEST_MAX_BATCH} orders.')
+    skus = _sku_index(batch)
+    today = now().date()
+    parsed = [parse_batch_order(raw, skus, today) for raw in batch]
+    results = [None] * len(batch)
+
+    with transaction.atomic():
+        stock = lock_inventory({inventory_id for _, lines, _ in parsed for inventory_id in lines})
+        available = {inventory_id: item.quantity for inventory_id, item in stock.items()}
+        accepted = []
+        for index, (fields, lines, errors) in enumerate(parsed):
+            for inventory_id, quantity in lines.items():
+                item = stock.get(inventory_id)
+                if item is None:
+                    errors.append(f'Inventory item {inventory_id} not found.')
+                elif available[inventory_id] < quantity:
+                    errors.append(
+                        f'Not enough inventory for {item.product.name} ({item.get_unit_display()}). '
+                        f'Available: {available[inventory_id]}'
+                    )
+            if errors:
+                results[index] = {'errors': errors}
+                continue
+            for inventory_id, quantity in lines.items():
+                available[inventory_id] -= quantity
+            accepted.append((index, fields, lines))
+        if not accepted:
+            return results
+
+        taken = {inventory_id: item.quantity - available[inventory_id] for inventory_id, item in stock.items()}
+        # The batch's stock is valued together, every order pays the same unit cost per row
+        values = valuation.issue(taken, items=stock)
+        unit_costs = {inventory_id: valuation.unit_cost(value, taken[inventory_id]) for inventory_id, value in values.items()}
+        orders = []
+        order_items = []
+        matched = customers.resolve_many([fields for _, fields, _ in accepted])
+        for (index, fields, lines), customer in zip(accepted, matched):
+            order = Order(
+                product=stock[next(iter(lines))].product,  # Legacy single-product field
+                quantity=sum(lines.values()),
+                ordered_by=ordered_by,
+                customer=customer,
+                **fields,
+            )
+            items = [
+                build_order_item(order, stock[inventory_id], quantity, unit_costs[inventory_id])
+                for inventory_id, quantity in lines.items()
+            ]
+            for name, value in totals.order_totals(items).items():
+                setattr(order, name, value)
+            orders.append(order)
+            order_items.extend(items)
+            results[index] = {'order': order}
+        Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+        # One stock UPDATE for the batch, journaled per order
+        stock_api.take_many(
+            taken,
+            movements=[
+                StockMovement(inventory_item_id=item.inventory_item_id, kind=StockMovement.SALE,
+                              quantity=-item.quantity, reference=f'Order #{item.order.pk}')
+                for item in order_items
+            ],
+        )
+        OrderItem.objects.bulk_create(order_items, batch_size=BATCH_SIZE)
+        ledger.schedule(item.pk for item in order_items)
+        deltas = {}
+        for order in orders:
+            count, value = deltas.get(order.customer_id, (0, totals.ZERO))
+            deltas[order.customer_id] = (count + 1, value + order.total_value)
+        customers.add_many(deltas)
+
+        # bulk_create sends no signals: refresh the rollup and dashboard sections here
+        for day in {order.order_date for order in orders}:
+            mark_day_dirty(day)
+        for model in (Order, OrderItem):
+            bump_version_on_commit(model)
+    return results
+
+
+def update_order(order, lines, **fields):
+    """
+    Make ``order`` hold exactly ``lines`` ({inventory item id: (product id,
+    quantity)}), as submitted by the edit form, and set the other Order
+    ``fields`` given (customer details, status). The customer is matched again
+    when its details change.
+
+    Only the lines whose quantity changed are written: removed lines are
+    deleted, changed ones updated in place and new ones created, and the stock
+    moves by the difference. Changed lines keep their selling price; a line
+    that grows costs its old units at the old cost and the new ones at what
+    they took out of stock. Raises ValidationError and writes nothing if a
+    line refers to unknown stock or to stock of another product, the stock
+    cannot cover an increase or the status change is not allowed by
+    Order.TRANSITIONS.
+    """
+    if not lines:
+        raise ValidationError('Please add at least one product to the order.')
+    status = fields.get('status')
+    if status is not None and status not in dict(Order.STATUS_CHOICES):
+        raise ValidationError(f'Unknown status "{status}".')
+
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        if status is not None and status != order.status and status not in Order.TRANSITIONS.get(order.status, []):
+            raise ValidationError(f'Order #{order.pk} is {order.status} and cannot be moved to {status}.')
+        current = {}
+        removed = []
+        for item in order.items.all():
+            # Lines the form cannot show (legacy rows, duplicates) are dropped like before
+            if item.inventory_item_id in lines and item.inventory_item_id not in current:
+                current[item.inventory_item_id] = item
+            else:
+                removed.append(item)
+
+        added = [inventory_id for inventory_id in lines if inventory_id not in current]
+        stock = lock_inventory(added) if added else {}
+        errors = []
+        for inventory_id, item in current.items():
+            if item.product_id != lines[inventory_id][0]:
+                errors.append('Inventory item not found for the selected product.')
+        for inventory_id in added:
+            item = stock.get(inventory_id)
+            if item is None or item.product_id != lines[inventory_id][0]:
+                errors.append('Inventory item not found for the selected product.')
+        if errors:
+            raise ValidationError(errors)
+
+        changed = []
+        delta = {}
+        for inventory_id, item in current.items():
+            quantity = lines[inventory_id][1]
+            if item.quantity != quantity:
+                delta[inventory_id] = quantity - item.quantity
+                item.quantity = quantity
+                changed.append(item)
+        for item in removed:
+            if item.inventory_item_id:
+                delta[item.inventory_item_id] = delta.get(item.inventory_item_id, 0) - item.quantity
+        for inventory_id in added:
+            delta[inventory_id] = delta.get(inventory_id, 0) + lines[inventory_id][1]
+
+        reference = f'Order #{order.pk}'
+        returned = {pk: -quantity for pk, quantity in delta.items() if quantity < 0}
+        taken = {pk: quantity for pk, quantity in delta.items() if quantity > 0}
+        # Returned stock goes back at the cost it was sold at, new lines cost what they take
+        sold_at = {item.inventory_item_id: item.unit_cost_price for item in [*removed, *current.values()]}
+        valuation.add(returned, {pk: sold_at.get(pk) for pk in returned}, reference)
+        values = valuation.issue(taken, items=stock)
+        stock_api.put_many(returned, reference=reference)
+        stock_api.take_many(taken, reference=reference)
+
+        for item in changed:
+            pk = item.inventory_item_id
+            if pk in values:
+                # The units the line already held keep their cost, the new ones cost what they took
+                kept = item.quantity - taken[pk]
+                item.unit_cost_price = valuation.unit_cost(kept * item.unit_cost_price + values[pk], item.quantity)
+            item.total_price = item.quantity * item.unit_selling_price
+            item.total_profit = item.quantity * (item.unit_selling_price - item.unit_cost_price)
+
+        if removed:
+            OrderItem.objects.filter(pk__in=[item.pk for item in removed]).delete()
+        if changed:
+            OrderItem.objects.bulk_update(changed, ['quantity', 'unit_cost_price', 'total_price', 'total_profit'])
+        created = OrderItem.objects.bulk_create([
+            build_order_item(
+                order, stock[inventory_id], lines[inventory_id][1],
+                valuation.unit_cost(values[inventory_id], taken[inventory_id]) if inventory_id in values else None,
+            )
+            for inventory_id in added
+        ])
+        ledger.schedule(item.pk for item in changed + created)
+
+        previous_customer = order.customer_id
+        previous_status = order.status
+        details_changed = any(name in fields and fields[name] != getattr(order, name) for name in CUSTOMER_FIELDS)
+        for name, value in fields.items():
+            setattr(order, name, value)
+        if details_changed:
+            order.customer = customers.resolve(**{name: getattr(order, name) for name in CUSTOMER_FIELDS})
+            fields['customer'] = order.customer
+        order.quantity = sum(quantity for _, quantity in lines.values())
+        # The order row is locked: set the header outright (item deletes above moved it too)
+        header = totals.order_totals(list(current.values()) + created)
+        for name, value in header.items():
+            setattr(order, name, value)
+        order.save(update_fields=['quantity', *header, *fields])
+        if order.status != previous_status:
+            OrderStatusChange.objects.create(order=order, from_status=previous_status, to_status=order.status)
+        # Item deletes moved the customer's value too: recompute rather than adjust
+        customers.refresh([previous_customer, order.customer_id])
+
+        if changed or created:
+            # bulk writes send no signals (order.save() refreshes the rollup day)
+            bump_version_on_commit(OrderItem)
+    return order
+
+
+def transition_orders(order_ids, status, changed_by=None):
+    """
+    Move the orders ``order_ids`` to ``status``, following Order.TRANSITIONS.
+
+    Returns (ids of the orders moved, {order id: error} for the others);
+    orders that cannot make the transition are left as they are.
+    """
+    if status not in dict(Order.STATUS_CHOICES):
+        raise ValidationError(f'Unknown status "{status}".')
+    order_ids = list(dict.fromkeys(order_ids))
+    if not order_ids:
+        raise ValidationError('Select at least one order.')
+    if len(order_ids) > settings.ORDER_STATUS_MAX_BATCH:
+        raise ValidationError(f'At most {settings.ORDER_STATUS_MAX_BATCH} orders can be changed at once.')
+
+    with transaction.atomic():
+        current = dict(Order.objects.select_for_update().filter(pk__in=order_ids).values_list('pk', 'status'))
+        moved = []
+        errors = {}
+        for order_id in order_ids:
+            if order_id not in current:
+                errors[order_id] = f'Order #{order_id} not found.'
+            elif status not in Order.TRANSITIONS.get(current[order_id], []):
+                errors[order_id] = f'Order #{order_id} is {current[order_id]} and cannot be moved to {status}.'
+            else:
+                moved.append(order_id)
+        if not moved:
+            return moved, errors
+
+        Order.objects.filter(pk__in=moved).update(status=status)
+        OrderStatusChange.objects.bulk_create([
+            OrderStatusChange(order_id=order_id, from_status=current[order_id], to_status=status, changed_by=changed_by)
+            for order_id in moved
+        ], batch_size=BATCH_SIZE)
+
+        # update() sends no signals: refresh the dashboard sections here
+        bump_version_on_commit(Order)
+    return moved, errors
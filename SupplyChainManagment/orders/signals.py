@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import customers, totals
+from .models import Order, OrderItem
+
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted(sender, instance, origin=None, **kwargs):
+    # Nothing to keep in sync when the whole order is being deleted
+    if isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        return
+    totals.add(instance.order_id, totals.line_totals(instance), sign=-1)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    customers.add(instance.customer_id, -1, -instance.total_value)
@@ -1,3 +1,603 @@
-from django.test import TestCase
+import csv
+import datetime
+import importlib
+import io
+import json
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from inventory import stock as stock_api
+from inventory import valuation
+from inventory.models import InventoryItem
+from products.models import Category, LedgerEntry, Product
+from theme import metrics
+from theme.models import Notification
+from . import exports
+from .models import Customer, Order, OrderItem, OrderStatusChange
+from .services import parse_order_lines, place_order, place_orders, transition_orders, update_order
+
+User = get_user_model()
+
+
+class PlaceOrderTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cashier', password='testpass123', role='staff')
+        self.category = Category.objects.create(name='Test Category')
+        self.stock = []
+        for i in range(50):
+            product = Product.objects.create(
+                name=f'Product {i}',
+                category=self.category,
+                sku=f'P-{i}',
+                cost_price=Decimal('4.00'),
+                selling_price=Decimal('10.00'),
+                created_by=self.user,
+            )
+            self.stock.append(InventoryItem.objects.create(product=product, quantity=20))
+        valuation.add({item.pk: 20 for item in self.stock}, reference='Opening balance')
+
+    def lines(self, quantity=2):
+        return {item.pk: (item.product_id, quantity) for item in self.stock}
+
+    def test_large_order_uses_constant_queries(self):
+        """A 50-line order is written with a handful of queries"""
+        with self.captureOnCommitCallbacks(execute=True):
+            # Includes reading and consuming the cost layers (inventory.valuation)
+            # and looking for rows that ran low
+            with self.assertNumQueries(13):
+                order = place_order(self.lines(), ordered_by=self.user, order_date=now().date())
+
+        self.assertEqual(order.items.count(), 50)
+        self.assertEqual(order.quantity, 100)
+        self.assertEqual(order.total_value, Decimal('1000.00'))
+        order.refresh_from_db()
+        self.assertEqual((order.total_value, order.total_cost, order.line_count), (Decimal('1000.00'), Decimal('400.00'), 50))
+        self.assertEqual(LedgerEntry.objects.filter(order_item__order=order).count(), 50)
+        self.assertEqual(LedgerEntry.objects.filter(order_item__order=order).first().profit, Decimal('12.00'))
+        self.assertEqual(set(InventoryItem.objects.values_list('quantity', flat=True)), {18})
+
+    def test_short_line_writes_nothing(self):
+        """One line without enough stock rejects the whole order"""
+        lines = self.lines()
+        lines[self.stock[7].pk] = (self.stock[7].product_id, 21)
+        with self.assertRaises(ValidationError) as ctx:
+            place_order(lines, ordered_by=self.user, order_date=now().date())
+
+        self.assertIn('Not enough inventory for Product 7', ctx.exception.messages[0])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(set(InventoryItem.objects.values_list('quantity', flat=True)), {20})
+
+    def test_parse_order_lines(self):
+        item = self.stock[0]
+        lines = parse_order_lines({
+            f'quantity_{item.product_id}_{item.pk}': '3',
+            f'quantity_{item.product_id}_999': '',
+            'customer_name': 'Jo',
+        })
+        self.assertEqual(lines, {item.pk: (item.product_id, 3)})
+        with self.assertRaises(ValidationError):
+            parse_order_lines({f'quantity_{item.product_id}_{item.pk}': 'abc'})
+
+    def test_add_order_view(self):
+        self.client.force_login(self.user)
+        item = self.stock[0]
+        response = self.client.post('/orders/add/', {
+            f'quantity_{item.product_id}_{item.pk}': '5',
+            'customer_name': 'Jo',
+            'order_date': now().date().isoformat(),
+        })
+        self.assertRedirects(response, '/orders/', fetch_redirect_response=False)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 15)
+        self.assertEqual(Order.objects.get().customer_name, 'Jo')
+
+
+    def test_running_low_is_notified_once(self):
+        """Only the order that takes a row below the low-stock threshold records a feed entry"""
+        item = self.stock[0]
+        for quantity in (4, 12, 2):
+            place_order({item.pk: (item.product_id, quantity)}, ordered_by=self.user, order_date=now().date())
+        self.assertEqual(
+            list(Notification.objects.filter(type='inventory').values_list('text', flat=True)),
+            [f'{item.product.name} - Only 4 left in stock'],
+        )
+
+    def test_edit_touches_only_changed_lines(self):
+        """Changing one line of a 40-line order costs the same as a 1-line order"""
+        with self.captureOnCommitCallbacks(execute=True):
+            order = place_order(
+                {item.pk: (item.product_id, 2) for item in self.stock[:40]},
+                ordered_by=self.user, order_date=now().date(), customer_name='Jo',
+            )
+        untouched = set(order.items.exclude(inventory_item=self.stock[0]).values_list('pk', 'quantity'))
+
+        lines = {item.pk: (item.product_id, 2) for item in self.stock[:40]}
+        lines[self.stock[0].pk] = (self.stock[0].product_id, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(15):
+                update_order(order, lines, customer_name='Jo')
+
+        self.assertEqual(set(order.items.exclude(inventory_item=self.stock[0]).values_list('pk', 'quantity')), untouched)
+        self.stock[0].refresh_from_db()
+        self.assertEqual(self.stock[0].quantity, 15)
+        entry = LedgerEntry.objects.get(order_item__inventory_item=self.stock[0])
+        self.assertEqual((entry.quantity_sold, entry.profit), (5, Decimal('30.00')))
+        order.refresh_from_db()
+        self.assertEqual((order.quantity, order.customer_name), (83, 'Jo'))
+        self.assertEqual((order.total_value, order.total_profit, order.line_count), (Decimal('830.00'), Decimal('498.00'), 40))
+
+    def test_edit_adds_and_removes_lines(self):
+        first, second, third = self.stock[:3]
+        with self.captureOnCommitCallbacks(execute=True):
+            order = place_order(
+                {first.pk: (first.product_id, 4), second.pk: (second.product_id, 4)},
+                ordered_by=self.user, order_date=now().date(),
+            )
+        with self.assertRaises(ValidationError):
+            update_order(order, {second.pk: (second.product_id, 4), third.pk: (third.product_id, 25)})
+        self.assertEqual(order.items.count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_order(order, {second.pk: (second.product_id, 1), third.pk: (third.product_id, 6)})
+        self.assertEqual(
+            dict(order.items.values_list('inventory_item_id', 'quantity')),
+            {second.pk: 1, third.pk: 6},
+        )
+        self.assertEqual(
+            dict(InventoryItem.objects.filter(pk__in=[first.pk, second.pk, third.pk]).values_list('pk', 'quantity')),
+            {first.pk: 20, second.pk: 19, third.pk: 14},
+        )
+        self.assertEqual(LedgerEntry.objects.filter(order_item__order=order).count(), 2)
+        order.refresh_from_db()
+        self.assertEqual((order.total_value, order.line_count), (Decimal('70.00'), 2))
+
+    def test_edit_costs_added_units_from_stock(self):
+        """A line that grows keeps the cost of its old units and takes the cost of the new ones from the layers"""
+        item = self.stock[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            order = place_order({item.pk: (item.product_id, 2)}, ordered_by=self.user, order_date=now().date())
+        stock_api.receive(item.product, item.unit, 10, unit_cost_price=Decimal('7.00'), reference='PO-1')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_order(order, {item.pk: (item.product_id, 21)})
+
+        # 2 units at 4.00 already on the line, 18 more at 4.00 and 1 at 7.00 from the layers
+        line = order.items.get()
+        self.assertEqual(line.unit_cost_price, Decimal('4.14'))
+        self.assertEqual(line.total_profit, Decimal('123.06'))
+        self.assertEqual(LedgerEntry.objects.get(order_item=line).profit, Decimal('123.06'))
+        item.refresh_from_db()
+        self.assertEqual((item.quantity, item.stock_value), (9, Decimal('63.0000')))
+        order.refresh_from_db()
+        self.assertEqual(order.total_cost, Decimal('86.94'))
+
+    def test_edit_checks_status_transitions(self):
+        item = self.stock[0]
+        order = place_order({item.pk: (item.product_id, 3)}, ordered_by=self.user, order_date=now().date())
+        lines = {item.pk: (item.product_id, 3)}
+        with self.assertRaisesMessage(ValidationError, 'cannot be moved to delivered'):
+            update_order(order, lines, status='delivered')
+        with self.assertRaisesMessage(ValidationError, 'Unknown status'):
+            update_order(order, lines, status='lost')
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pending')
+
+        update_order(order, lines, status='approved')
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'approved')
+
+    def test_edit_order_view_keeps_order_on_error(self):
+        self.client.force_login(self.user)
+        item = self.stock[0]
+        order = place_order({item.pk: (item.product_id, 3)}, ordered_by=self.user, order_date=now().date())
+        response = self.client.post(f'/orders/edit/{order.pk}/', {f'quantity_{item.product_id}_{item.pk}': '99'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(order.items.get().quantity, 3)
+        response = self.client.post(f'/orders/edit/{order.pk}/', {f'quantity_{item.product_id}_{item.pk}': '7'})
+        self.assertRedirects(response, '/orders/', fetch_redirect_response=False)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 13)
+
+    def test_edit_order_view_keeps_status_when_not_posted(self):
+        self.client.force_login(self.user)
+        item = self.stock[0]
+        order = place_order({item.pk: (item.product_id, 3)}, ordered_by=self.user, order_date=now().date())
+        Order.objects.filter(pk=order.pk).update(status='shipped')
+        response = self.client.post(f'/orders/edit/{order.pk}/', {f'quantity_{item.product_id}_{item.pk}': '4'})
+        self.assertRedirects(response, '/orders/', fetch_redirect_response=False)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.items.get().quantity), ('shipped', 4))
+
+    def test_edit_checks_product_of_existing_lines(self):
+        item = self.stock[0]
+        order = place_order({item.pk: (item.product_id, 3)}, ordered_by=self.user, order_date=now().date())
+        with self.assertRaisesMessage(ValidationError, 'Inventory item not found for the selected product.'):
+            update_order(order, {item.pk: (self.stock[1].product_id, 5)})
+        item.refresh_from_db()
+        self.assertEqual((item.quantity, order.items.get().quantity), (17, 3))
+
+
+@override_settings(ORDERS_PAGE_SIZE=3)
+class OrderListTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='testpass123', role='staff')
+        category = Category.objects.create(name='Test Category')
+        self.product = Product.objects.create(
+            name='Widget', category=category, sku='W-1',
+            cost_price=Decimal('4.00'), selling_price=Decimal('10.00'), created_by=self.user,
+        )
+        self.orders = []
+        days = [datetime.date(2025, 1, day) for day in (3, 1, 3, 2, 5, 1, 2)] + [None]
+        for i, day in enumerate(days):
+            order = Order.objects.create(
+                product=self.product, quantity=i + 1, order_date=day, ordered_by=self.user,
+                customer_name='Acme' if i % 2 else 'Bolt', status='delivered' if i < 4 else 'pending',
+            )
+            for _ in range(2):
+                OrderItem.objects.create(order=order, product=self.product, quantity=i + 1)
+            self.orders.append(order)
+        self.client.force_login(self.user)
+
+    def walk(self, **params):
+        """Follow the cursors from the first page, returning the order ids and queries per page."""
+        ids, queries, cursor = [], [], ''
+        while True:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/orders/', dict(params, cursor=cursor))
+            queries.append(len(ctx))
+            ids += [order.pk for order in response.context['orders']]
+            page = response.context['page']
+            if not page.has_next:
+                return ids, queries
+            cursor = page.next_cursor
+
+    def test_pages_follow_order_date_and_id(self):
+        ids, queries = self.walk()
+        expected = sorted(
+            (order for order in self.orders if order.order_date),
+            key=lambda order: (order.order_date, order.pk), reverse=True,
+        ) + [self.orders[-1]]
+        self.assertEqual(ids, [order.pk for order in expected])
+        # Every page costs the same, whatever its depth
+        self.assertEqual(len(set(queries)), 1)
+
+    def test_totals_come_from_the_header(self):
+        response = self.client.get('/orders/', {'customer': 'Bolt', 'status': 'pending'})
+        orders = response.context['orders']
+        self.assertEqual([order.pk for order in orders], [self.orders[4].pk, self.orders[6].pk])
+        self.assertEqual(orders[0].total_value, Decimal('100.00'))
+        self.assertEqual(orders[0].total_profit, Decimal('60.00'))
+        self.assertEqual((orders[0].line_count, orders[0].first_product_name), (2, 'Widget'))
+
+    def test_date_filters_and_bad_cursor(self):
+        ids, _ = self.walk(date_from='2025-01-02', date_to='2025-01-03')
+        self.assertEqual(len(ids), 4)
+        response = self.client.get('/orders/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(len(response.context['orders']), 3)
+
+
+class OrderTotalsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='keeper', password='testpass123', role='staff')
+        self.product = Product.objects.create(
+            name='Widget', category=Category.objects.create(name='Test Category'), sku='T-1',
+            cost_price=Decimal('4.00'), selling_price=Decimal('10.00'), created_by=self.user,
+        )
+        self.order = Order.objects.create(
+            product=self.product, quantity=1, order_date=now().date(), ordered_by=self.user,
+        )
+
+    def header(self):
+        self.order.refresh_from_db()
+        return (self.order.total_value, self.order.total_cost, self.order.total_profit, self.order.line_count)
+
+    def test_item_writes_move_the_header(self):
+        first = OrderItem.objects.create(order=self.order, product=self.product, quantity=2)
+        second = OrderItem.objects.create(order=self.order, product=self.product, quantity=1)
+        self.assertEqual(self.header(), (Decimal('30.00'), Decimal('12.00'), Decimal('18.00'), 2))
+
+        item = OrderItem.objects.get(pk=first.pk)
+        item.quantity = 5
+        item.save()
+        self.assertEqual(self.header(), (Decimal('60.00'), Decimal('24.00'), Decimal('36.00'), 2))
+
+        OrderItem.objects.filter(pk=second.pk).delete()
+        self.assertEqual(self.header(), (Decimal('50.00'), Decimal('20.00'), Decimal('30.00'), 1))
+
+        deferred = OrderItem.objects.only('pk', 'order', 'quantity').get(pk=first.pk)
+        deferred.quantity = 1
+        deferred.save()
+        self.assertEqual(self.header(), (Decimal('10.00'), Decimal('4.00'), Decimal('6.00'), 1))
+        self.order.delete()
+
+    def test_verify_command_backfills_headers(self):
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=3)
+        Order.objects.update(total_value=0, total_cost=0, total_profit=0, line_count=0)
+
+        out = StringIO()
+        call_command('verify_order_totals', stdout=out)
+        self.assertIn('1 header(s) differ', out.getvalue())
+        self.assertEqual(self.header()[3], 0)
+
+        call_command('verify_order_totals', '--fix', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(self.header(), (Decimal('30.00'), Decimal('12.00'), Decimal('18.00'), 1))
+        out = StringIO()
+        call_command('verify_order_totals', stdout=out)
+        self.assertIn('all headers match', out.getvalue())
+
+
+class CustomerTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='testpass123', role='staff')
+        product = Product.objects.create(
+            name='Widget', category=Category.objects.create(name='Test Category'), sku='C-1',
+            cost_price=Decimal('4.00'), selling_price=Decimal('10.00'), created_by=self.user,
+        )
+        self.stock = InventoryItem.objects.create(product=product, quantity=100)
+
+    def place(self, quantity=1, **customer):
+        return place_order({self.stock.pk: (self.stock.product_id, quantity)}, ordered_by=self.user,
+                           order_date=now().date(), **customer)
+
+    def counters(self, customer):
+        customer.refresh_from_db()
+        return customer.order_count, customer.lifetime_value
+
+    def test_orders_are_matched_on_normalized_email_and_phone(self):
+        first = self.place(customer_name='Ann Lee', customer_email=' Ann@Example.com')
+        second = self.place(2, customer_name='A. Lee', customer_email='ann@example.COM', customer_phone='+1 (555) 010-0100')
+        by_phone = self.place(3, customer_name='Ann', customer_phone='15550100100')
+        by_name = self.place(customer_name='Corner  Shop')
+        walk_in = self.place(customer_name='Walk-in Customer')
+
+        self.assertEqual(first.customer_id, second.customer_id)
+        self.assertEqual(first.customer_id, by_phone.customer_id)
+        self.assertIsNone(walk_in.customer_id)
+        self.assertEqual(self.place(customer_name='corner shop').customer_id, by_name.customer_id)
+        self.assertEqual(Customer.objects.count(), 2)
+        self.assertEqual(self.counters(first.customer), (3, Decimal('60.00')))
+
+    def test_counters_follow_order_changes(self):
+        order = self.place(2, customer_name='Bob', customer_email='bob@example.com')
+        customer = order.customer
+        item = order.items.get()
+        item.quantity = 4
+        item.save()
+        self.assertEqual(self.counters(customer), (1, Decimal('40.00')))
+
+        update_order(order, {self.stock.pk: (self.stock.product_id, 1)},
+                     customer_name='Bob', customer_email='bob@example.com')
+        self.assertEqual(self.counters(customer), (1, Decimal('10.00')))
+
+        update_order(order, {self.stock.pk: (self.stock.product_id, 1)},
+                     customer_name='Bea', customer_email='bea@example.com')
+        order.refresh_from_db()
+        self.assertEqual(self.counters(customer), (0, Decimal('0.00')))
+        self.assertEqual(self.counters(order.customer), (1, Decimal('10.00')))
+
+        new_customer = order.customer
+        order.delete()
+        self.assertEqual(self.counters(new_customer), (0, Decimal('0.00')))
+
+    def test_ingest_resolves_customers_in_bulk(self):
+        batch = [
+            {'customer_name': f'Shop {n % 3}', 'customer_email': f'shop{n % 3}@example.com',
+             'lines': [{'inventory_item': self.stock.pk, 'quantity': 1}]}
+            for n in range(9)
+        ]
+        results = place_orders(batch, ordered_by=self.user)
+        self.assertTrue(all('order' in result for result in results))
+        self.assertEqual(
+            list(Customer.objects.order_by('email_key').values_list('order_count', 'lifetime_value')),
+            [(3, Decimal('30.00'))] * 3,
+        )
+
+    def test_top_customers_read_the_counters(self):
+        for n in range(3):
+            self.place(customer_name='Regular', customer_phone='555-0100')
+        self.place(5, customer_name='Big spender', customer_phone='555-0199')
+        with self.assertNumQueries(1):
+            top = list(metrics.top_customers())
+        self.assertEqual(top, [{'customer_name': 'Regular', 'count': 3}, {'customer_name': 'Big spender', 'count': 1}])
+
+    def test_migration_backfills_existing_orders(self):
+        backfill = importlib.import_module('orders.migrations.0017_backfill_customers')
+        for email in ['x@example.com', 'X@example.com ', None]:
+            Order.objects.create(
+                product=self.stock.product, quantity=1, ordered_by=self.user,
+                customer_name='Xavier', customer_email=email, total_value=Decimal('5.00'),
+            )
+        Order.objects.create(product=self.stock.product, quantity=1, ordered_by=self.user)
+
+        backfill.backfill_customers(django_apps, None)
+        self.assertEqual(
+            sorted(Customer.objects.values_list('email_key', 'order_count', 'lifetime_value')),
+            [('', 1, Decimal('5.00')), ('x@example.com', 2, Decimal('10.00'))],
+        )
+        self.assertEqual(Order.objects.filter(customer__isnull=True).count(), 1)
+
+
+class BulkStatusTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='approver', password='testpass123', role='staff')
+        self.product = Product.objects.create(
+            name='Widget', category=Category.objects.create(name='Test Category'), sku='S-1',
+            cost_price=Decimal('4.00'), selling_price=Decimal('10.00'), created_by=self.user,
+        )
+        self.orders = Order.objects.bulk_create([
+            Order(product=self.product, quantity=1, order_date=now().date(), ordered_by=self.user)
+            for _ in range(150)
+        ])
+        self.client.force_login(self.user)
+
+    def test_transition_is_set_based(self):
+        ids = [order.pk for order in self.orders]
+        Order.objects.filter(pk=ids[0]).update(status='delivered')
+        with self.assertNumQueries(5):
+            moved, errors = transition_orders(ids + [0], 'approved', changed_by=self.user)
+
+        self.assertEqual(moved, ids[1:])
+        self.assertEqual(set(errors), {ids[0], 0})
+        self.assertIn('cannot be moved to approved', errors[ids[0]])
+        self.assertEqual(Order.objects.filter(status='approved').count(), 149)
+        self.assertEqual(OrderStatusChange.objects.filter(from_status='pending', to_status='approved').count(), 149)
+        with self.assertRaises(ValidationError):
+            transition_orders(ids, 'archived')
+
+    def test_json_endpoint(self):
+        ids = [order.pk for order in self.orders[:10]]
+        response = self.client.post('/orders/status/bulk/', json.dumps({'orders': ids, 'status': 'approved'}),
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'updated': ids, 'errors': {}})
+        self.assertEqual(Notification.objects.filter(title='10 Orders Marked Approved').count(), 1)
+
+        response = self.client.post('/orders/status/bulk/', json.dumps({'orders': ids[:1], 'status': 'delivered'}),
+                                    content_type='application/json')
+        self.assertEqual(list(response.json()['errors']), [str(ids[0])])
+        response = self.client.post('/orders/status/bulk/', '{"orders": "all"}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_order_list_action(self):
+        ids = [str(order.pk) for order in self.orders[:3]]
+        response = self.client.post('/orders/status/bulk/', {
+            'order_ids': ids, 'status': 'cancelled', 'filter_query': 'status=pending',
+        })
+        self.assertRedirects(response, '/orders/?status=pending', fetch_redirect_response=False)
+        self.assertEqual(Order.objects.filter(status='cancelled').count(), 3)
+
+        self.client.force_login(User.objects.create_user(username='viewer', password='testpass123', role='user'))
+        response = self.client.post('/orders/status/bulk/', {'order_ids': ids, 'status': 'pending'})
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkOrderIngestTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pos', password='testpass123', role='staff')
+        category = Category.objects.create(name='Test Category')
+        self.stock = []
+        for i in range(3):
+            product = Product.objects.create(
+                name=f'Item {i}', category=category, sku=f'SKU-{i}',
+                cost_price=Decimal('4.00'), selling_price=Decimal('10.00'), created_by=self.user,
+            )
+            self.stock.append(InventoryItem.objects.create(product=product, quantity=500, unit='box'))
+        self.client.force_login(self.user)
+
+    def post(self, orders):
+        return self.client.post('/orders/api/bulk/', json.dumps({'orders': orders}), content_type='application/json')
+
+    def batch(self, size):
+        return [
+            {'ref': f'pos-{n}', 'customer_name': 'Walk-in', 'lines': [
+                {'inventory_item': self.stock[0].pk, 'quantity': 1},
+                {'sku': 'SKU-1', 'unit': 'box', 'quantity': 2},
+            ]}
+            for n in range(size)
+        ]
+
+    def test_batch_is_written_in_bulk(self):
+        """200 orders cost about what one costs through the form, give or take a few INSERT chunks"""
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(self.batch(200))
+
+        self.assertLess(len(queries), 25)
+        body = response.json()
+        self.assertEqual((body['created'], body['rejected']), (200, 0))
+        self.assertEqual(body['results'][5]['ref'], 'pos-5')
+        order = Order.objects.get(pk=body['results'][5]['order_id'])
+        # Boxes without a price of their own sell at 10 pieces each (inventory.units)
+        self.assertEqual((order.line_count, order.total_value, order.quantity), (2, Decimal('300.00'), 3))
+        self.assertEqual(LedgerEntry.objects.filter(order_item__order=order).count(), 2)
+        self.assertEqual(
+            list(InventoryItem.objects.filter(pk__in=[item.pk for item in self.stock]).order_by('pk').values_list('quantity', flat=True)),
+            [300, 100, 500],
+        )
+
+    def test_rejected_orders_do_not_block_the_batch(self):
+        response = self.post([
+            {'lines': [{'inventory_item': self.stock[2].pk, 'quantity': 400}]},
+            {'lines': [{'inventory_item': self.stock[2].pk, 'quantity': 200}]},
+            {'lines': [{'sku': 'NOPE', 'quantity': 1}], 'status': 'lost'},
+            {'lines': [{'inventory_item': self.stock[2].pk, 'quantity': 100}]},
+            'junk',
+        ])
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'rejected', 'rejected', 'created', 'rejected'])
+        self.assertIn('Available: 100', results[1]['errors'][0])
+        self.assertEqual(len(results[2]['errors']), 2)
+        self.stock[2].refresh_from_db()
+        self.assertEqual(self.stock[2].quantity, 0)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.post('/orders/api/bulk/', 'nope', content_type='application/json').status_code, 400)
+        with self.settings(ORDER_INGEST_MAX_BATCH=1):
+            self.assertEqual(self.post(self.batch(2)).status_code, 400)
+        supplier = User.objects.create_user(username='vendor', password='testpass123', role='supplier')
+        self.client.force_login(supplier)
+        self.assertEqual(self.post(self.batch(1)).status_code, 403)
+        self.assertFalse(Order.objects.exists())
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='finance', password='testpass123', role='staff')
+        product = Product.objects.create(
+            name='Widget, large', category=Category.objects.create(name='Test Category'), sku='E-1',
+            cost_price=Decimal('4.00'), selling_price=Decimal('10.00'), created_by=self.user,
+        )
+        for day, status in ((1, 'pending'), (2, 'delivered'), (3, 'delivered')):
+            order = Order.objects.create(
+                product=product, quantity=day, order_date=datetime.date(2025, 2, day),
+                status=status, ordered_by=self.user, customer_name='Acme',
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                OrderItem.objects.create(order=order, product=product, quantity=day)
+        self.client.force_login(self.user)
+
+    def export(self, dataset, **params):
+        response = self.client.get(f'/orders/export/{dataset}/', params)
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_csv_exports_follow_the_filters(self):
+        orders = self.export('orders', status='delivered')
+        self.assertEqual(orders[0][:3], ['Order ID', 'Order date', 'Status'])
+        self.assertEqual([row[1] for row in orders[1:]], ['2025-02-02', '2025-02-03'])
+        self.assertEqual(orders[1][8], '20.00')
+
+        items = self.export('order_items', date_from='2025-02-02', date_to='2025-02-02')
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[1][5], 'Widget, large')
+
+        ledger = self.export('ledger')
+        self.assertEqual([row[-1] for row in ledger[1:]], ['6.00', '12.00', '18.00'])
+
+    def test_rows_are_read_in_chunks(self):
+        with self.settings(EXPORT_CHUNK_SIZE=1), CaptureQueriesContext(connection) as queries:
+            rows = list(exports.rows('orders', {}))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(len(queries), 1)
+
+    def test_export_command_and_access(self):
+        out = StringIO()
+        call_command('export_sales', 'order_items', '--status', 'pending', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+        self.assertEqual(self.client.get('/orders/export/nope/').status_code, 404)
+        self.assertEqual(self.client.get('/orders/export/orders/', {'format': 'pdf'}).status_code, 400)
+        response = self.client.get('/orders/export/orders/', {'format': 'xlsx'})
+        if exports.openpyxl is None:
+            self.assertEqual(response.status_code, 400)
+        else:
+            self.assertEqual(response['Content-Disposition'][:10], 'attachment')
+        self.client.force_login(User.objects.create_user(username='vendor', password='testpass123', role='supplier'))
+        self.assertEqual(self.client.get('/orders/export/orders/').status_code, 403)
@@ -0,0 +1,114 @@
+"""
+Header totals of an order (Order.total_value/total_cost/total_profit/line_count).
+
+Every write to an OrderItem moves its order's header by the difference it
+makes, with a single ``UPDATE ... SET total = total + delta`` in the same
+transaction, so readers never have to aggregate the items. Bulk writers
+(orders.services) set the header themselves. ``refresh`` recomputes headers
+from the items and ``verify`` finds the ones that drifted. Changes of
+total_value are passed on to the order's customer (orders.customers).
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import customers
+
+FIELDS = ('total_value', 'total_cost', 'total_profit', 'line_count')
+ITEM_FIELDS = {'order_id', 'quantity', 'unit_selling_price', 'unit_cost_price'}
+ZERO = Decimal('0')
+
+
+def line_totals(item):
+    """What an order item adds to its order header, in FIELDS order."""
+    cost = item.quantity * item.unit_cost_price
+    value = item.quantity * item.unit_selling_price
+    return (value, cost, value - cost, 1)
+
+
+def order_totals(items):
+    """Header values for a whole list of order items."""
+    value = sum((item.quantity * item.unit_selling_price for item in items), ZERO)
+    cost = sum((item.quantity * item.unit_cost_price for item in items), ZERO)
+    return {'total_value': value, 'total_cost': cost, 'total_profit': value - cost, 'line_count': len(items)}
+
+
+def add(order_id, amounts, sign=1):
+    """Move the header of ``order_id`` by ``amounts`` (as returned by line_totals)."""
+    from .models import Order
+
+    changes = {field: F(field) + sign * amount for field, amount in zip(FIELDS, amounts) if amount}
+    if order_id and changes:
+        Order.objects.filter(pk=order_id).update(**changes)
+        customers.add_order_value(order_id, sign * amounts[0])
+
+
+def item_saved(item, previous):
+    """Apply a saved item to the header, ``previous`` being (order id, line totals) as loaded."""
+    current = line_totals(item)
+    if previous is not None and previous[0] == item.order_id:
+        add(item.order_id, [now - before for now, before in zip(current, previous[1])])
+    else:
+        if previous is not None:
+            add(previous[0], previous[1], sign=-1)
+        add(item.order_id, current)
+
+
+def _item_sums():
+    from .models import OrderItem
+
+    money = DecimalField(max_digits=12, decimal_places=2)
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    sums = {
+        'total_value': Sum(F('quantity') * F('unit_selling_price'), output_field=money),
+        'total_cost': Sum(F('quantity') * F('unit_cost_price'), output_field=money),
+    }
+    return {
+        name: Coalesce(Subquery(items.annotate(total=aggregate).values('total')), Value(ZERO), output_field=money)
+        for name, aggregate in sums.items()
+    } | {
+        'line_count': Coalesce(
+            Subquery(items.annotate(total=Sum(Value(1))).values('total')), Value(0), output_field=IntegerField(),
+        ),
+    }
+
+
+def refresh(order_ids):
+    """Recompute the headers of ``order_ids`` from their items in one UPDATE."""
+    from .models import Order
+
+    order_ids = list(order_ids)
+    sums = _item_sums()
+    updated = Order.objects.filter(pk__in=order_ids).update(
+        **sums, total_profit=sums['total_value'] - sums['total_cost'],
+    )
+    customers.refresh_orders(order_ids)
+    return updated
+
+
+def verify(order_ids):
+    """Orders among ``order_ids`` whose header differs from their items, as {id: expected header}."""
+    from .models import Order, OrderItem
+
+    expected = {order_id: {'total_value': ZERO, 'total_cost': ZERO, 'total_profit': ZERO, 'line_count': 0}
+                for order_id in order_ids}
+    money = DecimalField(max_digits=12, decimal_places=2)
+    rows = (
+        OrderItem.objects.filter(order_id__in=list(order_ids)).order_by().values('order_id')
+        .annotate(
+            value=Sum(F('quantity') * F('unit_selling_price'), output_field=money),
+            cost=Sum(F('quantity') * F('unit_cost_price'), output_field=money),
+            lines=Sum(Value(1)),
+        )
+    )
+    for row in rows:
+        expected[row['order_id']] = {
+            'total_value': row['value'], 'total_cost': row['cost'],
+            'total_profit': row['value'] - row['cost'], 'line_count': row['lines'],
+        }
+    drifted = {}
+    for order_id, *stored in Order.objects.filter(pk__in=list(order_ids)).values_list('pk', *FIELDS):
+        if dict(zip(FIELDS, stored)) != expected[order_id]:
+            drifted[order_id] = expected[order_id]
+    return drifted
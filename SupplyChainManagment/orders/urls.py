@@ -5,5 +5,8 @@ urlpatterns = [
     path('', views.order_list, name='order_list'),
     path('add/', views.add_order, name='add_order'),
     path('edit/<int:pk>/', views.edit_order, name='edit_order'),
+    path('api/bulk/', views.bulk_order_ingest, name='bulk_order_ingest'),
+    path('status/bulk/', views.bulk_order_status, name='bulk_order_status'),
+    path('export/<str:dataset>/', views.export_data, name='export_data'),
 
 ]
@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from .models import Order
 from .forms import OrderForm
 from django.contrib.auth.decorators import login_required
@@ -6,31 +7,42 @@ from products.models import Product
 from .models import OrderItem
 from django.contrib import messages
 from inventory.models import InventoryItem
-from django.utils.timezone import make_aware, is_aware
-from theme.notification_utils import notify_new_order
+from django.core.exceptions import ValidationError
+from django.utils.timezone import now
+from theme.notification_utils import notify_new_order, notify_orders_ingested, notify_orders_status_changed
+from django.conf import settings
+from django.http import (FileResponse, Http404, HttpResponseBadRequest, HttpResponseForbidden,
+                         JsonResponse, QueryDict, StreamingHttpResponse)
+from django.views.decorators.http import require_POST
+from inventory import stock
+from django.db.models import OuterRef, Subquery
+from theme import keyset
+from theme.decorators import skip_notifications
+from theme.idempotency import idempotent
+from . import exports
+from .services import parse_order_lines, place_order, place_orders, transition_orders, update_order
+from urllib.parse import urlencode
+import datetime
+import json
+import tempfile
 
 # Create your views here.
 
 
 
-@login_required
-def add_order(request):
-    products = Product.objects.all()
-    
-    # Group inventory items by product to show all available units
-    inventory_by_product = {}
-    
-    # Initialize empty lists for all products first
-    for product in products:
-        inventory_by_product[product.id] = []
-    
-    # Then populate with actual inventory data
-    for item in InventoryItem.objects.select_related('product'):
+def _inventory_choices(products):
+    """Inventory rows per product for the order forms, from a single query."""
+    inventory_by_product = {product.id: [] for product in products}
+    # Keep old format for backward compatibility (use first inventory item)
+    inventory = {}
+    inventory_items = {}
+    inventory_units = {}
+    for item in InventoryItem.objects.select_related('product').order_by('id'):
         cost_price = item.cost_price
         selling_price = item.selling_price
         profit_margin = selling_price - cost_price if cost_price and selling_price else 0
-        
-        inventory_by_product[item.product.id].append({
+
+        inventory_by_product.setdefault(item.product_id, []).append({
             'id': item.id,
             'quantity': item.quantity,
             'unit': item.unit,
@@ -39,286 +51,123 @@ def add_order(request):
             'selling_price': selling_price,  # Use inventory's unit-specific selling price
             'profit_margin': profit_margin  # Calculate profit for this unit
         })
-    
-    # Keep old format for backward compatibility (use first inventory item)
-    inventory = {}
-    inventory_items = {}
-    inventory_units = {}
-    for item in InventoryItem.objects.all():
-        if item.product.id not in inventory:  # Only take first entry per product
-            inventory[item.product.id] = item.quantity
-            inventory_items[item.product.id] = item
-            inventory_units[item.product.id] = item.get_unit_display()
+        if item.product_id not in inventory:  # Only take first entry per product
+            inventory[item.product_id] = item.quantity
+            inventory_items[item.product_id] = item
+            inventory_units[item.product_id] = item.get_unit_display()
+    return {
+        'inventory': inventory,
+        'inventory_items': inventory_items,
+        'inventory_units': inventory_units,
+        'inventory_by_product': inventory_by_product,
+    }
+
+@login_required
+@idempotent('order')
+def add_order(request):
+    products = list(Product.objects.all())
+
     if request.method == 'POST':
-        status = request.POST.get('status', 'pending')
         order_date_str = request.POST.get('order_date')
-        customer_name = request.POST.get('customer_name', 'Walk-in Customer')
-        customer_email = request.POST.get('customer_email', '').strip()
-        customer_phone = request.POST.get('customer_phone', '').strip()
-        customer_address = request.POST.get('customer_address', '').strip()
-        
-        import datetime
         if order_date_str:
-            dt = datetime.datetime.strptime(order_date_str, '%Y-%m-%d')  # Only date, no time
-            if not is_aware(dt):
-                order_date = make_aware(dt)
-            else:
-                order_date = dt
+            order_date = datetime.datetime.strptime(order_date_str, '%Y-%m-%d').date()  # Only date, no time
         else:
-            from django.utils.timezone import now
-            order_date = now().date()  # Only date
-        
-        order = Order.objects.create(
-            customer_name=customer_name,
-            customer_email=customer_email if customer_email else None,
-            customer_phone=customer_phone if customer_phone else None,
-            customer_address=customer_address if customer_address else None,
-            status=status,
-            ordered_by=request.user,
-            quantity=0,  # Will update after adding items
-            product=products.first(),  # Dummy, not used for multi-product
-            order_date=order_date
-        )
-        total_quantity = 0
-        total_order_value = 0
-        total_profit = 0
-        
-        # Process each inventory item separately
-        for product in products:
-            for inv_item_data in inventory_by_product.get(product.id, []):
-                inv_item_id = inv_item_data['id']
-                field_name = f'quantity_{product.id}_{inv_item_id}'
-                qty = int(request.POST.get(field_name, 0))
-                
-                if qty > 0:
-                    # Get the actual inventory item
-                    try:
-                        inv_item = InventoryItem.objects.get(id=inv_item_id)
-                        
-                        if inv_item.quantity >= qty:
-                            # Create OrderItem with unit-specific prices from inventory
-                            order_item = OrderItem.objects.create(
-                                order=order, 
-                                product=product, 
-                                quantity=qty,
-                                unit_selling_price=inv_item.selling_price,  # Use inventory's unit-specific price
-                                unit_cost_price=inv_item.cost_price,  # Use inventory's unit-specific price
-                                inventory_item=inv_item  # Link to specific inventory item
-                            )
-                            
-                            total_order_value += order_item.total_price
-                            total_profit += order_item.total_profit
-                            
-                            # Subtract from specific inventory item
-                            inv_item.quantity -= qty
-                            inv_item.save()
-                            
-                            total_quantity += qty
-                        else:
-                            order.delete()
-                            messages.error(request, f'Not enough inventory for {product.name} ({inv_item.get_unit_display()}). Available: {inv_item.quantity}')
-                            return render(request, 'add_order.html', {
-                                'products': products, 
-                                'inventory': inventory, 
-                                'inventory_items': inventory_items, 
-                                'inventory_units': inventory_units,
-                                'inventory_by_product': inventory_by_product
-                            })
-                    except InventoryItem.DoesNotExist:
-                        order.delete()
-                        messages.error(request, f'Inventory item not found for {product.name}.')
-                        return render(request, 'add_order.html', {
-                            'products': products, 
-                            'inventory': inventory, 
-                            'inventory_items': inventory_items, 
-                            'inventory_units': inventory_units,
-                            'inventory_by_product': inventory_by_product
-                        })
-        if total_quantity == 0:
-            order.delete()
-            messages.error(request, 'Please enter quantity for at least one product.')
-            return render(request, 'add_order.html', {
-                'products': products, 
-                'inventory': inventory, 
-                'inventory_items': inventory_items, 
-                'inventory_units': inventory_units,
-                'inventory_by_product': inventory_by_product
-            })
-        
-        order.quantity = total_quantity
-        order.save()
-        
-        # Send real-time toast notification
-        notify_new_order(request, order)
-        
-        # Success message with profit information
-        messages.success(request, f'Order placed successfully! Total Value: ${total_order_value:.2f}, Expected Profit: ${total_profit:.2f}')
-        request.session['show_success'] = True
-        return redirect('order_list')
-    return render(request, 'add_order.html', {
-        'products': products, 
-        'inventory': inventory, 
-        'inventory_items': inventory_items, 
-        'inventory_units': inventory_units,
-        'inventory_by_product': inventory_by_product
-    })
+            order_date = now().date()
+
+        try:
+            order = place_order(
+                parse_order_lines(request.POST),
+                ordered_by=request.user,
+                order_date=order_date,
+                status=request.POST.get('status', 'pending'),
+                customer_name=request.POST.get('customer_name', 'Walk-in Customer'),
+                customer_email=request.POST.get('customer_email', '').strip() or None,
+                customer_phone=request.POST.get('customer_phone', '').strip() or None,
+                customer_address=request.POST.get('customer_address', '').strip() or None,
+            )
+        except ValidationError as e:
+            for message in e.messages:
+                messages.error(request, message)
+        else:
+            # Send real-time toast notification
+            notify_new_order(request, order)
+
+            # Success message with profit information
+            messages.success(request, f'Order placed successfully! Total Value: ${order.total_value:.2f}, Expected Profit: ${order.total_profit:.2f}')
+            request.session['show_success'] = True
+            return redirect('order_list')
+
+    context = {'products': products}
+    context.update(_inventory_choices(products))
+    return render(request, 'add_order.html', context)
+
+def _filtered_orders(params):
+    """Orders matching the list filters, and the cleaned filter values."""
+    lookups, filters = exports.parse_filters(params)
+    return Order.objects.filter(**lookups), filters
+
 
 @login_required
 def order_list(request):
     # All users can see all customer orders (this is for sales, not purchases)
-    orders = Order.objects.all().prefetch_related('items')
-    
-    # Add calculated totals to each order
-    orders_with_totals = []
-    for order in orders:
-        total_value = sum(item.total_price for item in order.items.all())
-        total_profit = sum(item.total_profit for item in order.items.all())
-        order.calculated_total_value = total_value
-        order.calculated_total_profit = total_profit
-        orders_with_totals.append(order)
-    
-    return render(request, 'order_list.html', {'orders': orders_with_totals})
+    orders, filters = _filtered_orders(request.GET)
+    first_item = OrderItem.objects.filter(order=OuterRef('pk')).order_by('pk')
+    # Totals come from the order header (orders.totals), only the first line is looked up
+    orders = orders.annotate(
+        first_product_name=Subquery(first_item.values('product__name')[:1]),
+        first_item_quantity=Subquery(first_item.values('quantity')[:1]),
+    )
+    page = keyset.paginate(orders, request.GET.get('cursor'), settings.ORDERS_PAGE_SIZE, 'order_date')
+
+    return render(request, 'order_list.html', {
+        'orders': page.object_list,
+        'page': page,
+        'filters': filters,
+        'filter_query': urlencode(filters),
+        'status_choices': Order.STATUS_CHOICES,
+        'is_first_page': not request.GET.get('cursor'),
+    })
 
 @login_required
 def edit_order(request, pk):
     order = get_object_or_404(Order, pk=pk)
-    
-    products = Product.objects.all()
-    
-    # Build inventory by product structure (same as add_order)
-    inventory_by_product = {}
-    for product in products:
-        inventory_by_product[product.id] = []
-    
-    # Populate inventory for each product with different units
-    for item in InventoryItem.objects.select_related('product'):
-        cost_price = item.cost_price
-        selling_price = item.selling_price
-        profit_margin = selling_price - cost_price if cost_price and selling_price else 0
-        
-        inventory_by_product[item.product.id].append({
-            'id': item.id,
-            'quantity': item.quantity,
-            'unit': item.unit,
-            'unit_display': item.get_unit_display(),
-            'current_order_qty': 0,  # Will be updated below
-            'cost_price': cost_price,  # Use inventory's unit-specific cost price
-            'selling_price': selling_price,  # Use inventory's unit-specific selling price
-            'profit_margin': profit_margin  # Calculate profit for this unit
-        })
-    
-    # Get current order items and update inventory data with current order quantities
+
+    if request.method == 'POST':
+        try:
+            update_order(
+                order,
+                parse_order_lines(request.POST),
+                customer_name=request.POST.get('customer_name', '').strip() or None,
+                customer_email=request.POST.get('customer_email', '').strip() or None,
+                customer_phone=request.POST.get('customer_phone', '').strip() or None,
+                customer_address=request.POST.get('customer_address', '').strip() or None,
+                status=request.POST.get('status') or order.status,
+            )
+        except ValidationError as e:
+            for message in e.messages:
+                messages.error(request, message)
+        else:
+            messages.success(request, 'Order updated successfully!')
+            return redirect('order_list')
+
+    products = list(Product.objects.all())
+    inventory_by_product = _inventory_choices(products)['inventory_by_product']
+    order_lines = list(order.items.all())
+
+    # Current order quantities, added back to what is available for this order
     order_items = {}
-    for item in order.items.all().select_related('product'):
-        if item.inventory_item:
-            key = f"{item.product.id}_{item.inventory_item.id}"
-            order_items[key] = item.quantity
-            
-            # Find the corresponding inventory item and add current order quantity
-            for inv_data in inventory_by_product.get(item.product.id, []):
-                if inv_data['id'] == item.inventory_item.id:
+    for item in order_lines:
+        if item.inventory_item_id:
+            order_items[f"{item.product_id}_{item.inventory_item_id}"] = item.quantity
+            for inv_data in inventory_by_product.get(item.product_id, []):
+                if inv_data['id'] == item.inventory_item_id:
                     inv_data['current_order_qty'] = item.quantity
-                    # Add current order quantity to available quantity for max calculation
                     inv_data['quantity'] += item.quantity
-                    print(f"Debug: Product {item.product.name}, Inventory {item.inventory_item.id}, Current Order Qty: {item.quantity}, Updated Available: {inv_data['quantity']}")
                     break
         else:
             # Handle legacy orders without inventory_item reference
-            key = f"{item.product.id}_legacy"
-            order_items[key] = item.quantity
-    
-    if request.method == 'POST':
-        customer_name = request.POST.get('customer_name', '').strip()
-        customer_email = request.POST.get('customer_email', '').strip()
-        customer_phone = request.POST.get('customer_phone', '').strip()
-        customer_address = request.POST.get('customer_address', '').strip()
-        status = request.POST.get('status', 'pending')
-        
-        # Clear existing order items and restore inventory
-        for item in order.items.all():
-            # Restore inventory if inventory_item exists
-            if item.inventory_item:
-                item.inventory_item.quantity += item.quantity
-                item.inventory_item.save()
-            item.delete()
-        
-        # Process new quantities for each inventory item
-        total_quantity = 0
-        has_items = False
-        
-        for product in products:
-            for inv_item_data in inventory_by_product.get(product.id, []):
-                inv_item_id = inv_item_data['id']
-                qty_str = request.POST.get(f'quantity_{product.id}_{inv_item_id}', '0')
-                # Handle empty strings and convert to int
-                try:
-                    qty = int(qty_str) if qty_str.strip() else 0
-                except (ValueError, AttributeError):
-                    qty = 0
-                
-                if qty > 0:
-                    # Check if enough inventory
-                    inv_item = InventoryItem.objects.get(id=inv_item_id)
-                    if qty > inv_item.quantity:
-                        messages.error(request, f'Not enough inventory for {product.name} ({inv_item.get_unit_display()}). Available: {inv_item.quantity}')
-                        # Restore previously cleared items
-                        for restored_item in order.items.all():
-                            restored_item.inventory_item.quantity -= restored_item.quantity
-                            restored_item.inventory_item.save()
-                        return render(request, 'edit_order.html', {
-                            'order': order,
-                            'products': products,
-                            'order_items': order_items,
-                            'inventory_by_product': inventory_by_product
-                        })
-                    
-                    # Create order item
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        inventory_item=inv_item,
-                        quantity=qty,
-                        unit_selling_price=product.selling_price,
-                        unit_cost_price=product.cost_price or 0
-                    )
-                    
-                    # Update inventory
-                    inv_item.quantity -= qty
-                    inv_item.save()
-                    
-                    total_quantity += qty
-                    has_items = True
-        
-        if not has_items:
-            messages.error(request, 'Please add at least one product to the order.')
-            return render(request, 'edit_order.html', {
-                'order': order,
-                'products': products,
-                'order_items': order_items,
-                'inventory_by_product': inventory_by_product
-            })
-                    
-        order.customer_name = customer_name if customer_name else None
-        order.customer_email = customer_email if customer_email else None
-        order.customer_phone = customer_phone if customer_phone else None
-        order.customer_address = customer_address if customer_address else None
-        order.status = status
-        order.customer_name = customer_name if customer_name else None
-        order.customer_email = customer_email if customer_email else None
-        order.customer_phone = customer_phone if customer_phone else None
-        order.customer_address = customer_address if customer_address else None
-        order.status = status
-        order.quantity = total_quantity
-        order.save()
-        messages.success(request, 'Order updated successfully!')
-        return redirect('order_list')
-    
-    # Add calculated totals to order
-    total_value = sum(item.total_price for item in order.items.all())
-    total_profit = sum(item.total_profit for item in order.items.all())
-    order.calculated_total_value = total_value
-    order.calculated_total_profit = total_profit
-    
+            order_items[f"{item.product_id}_legacy"] = item.quantity
+
     return render(request, 'edit_order.html', {
         'order': order,
         'products': products,
@@ -326,3 +175,130 @@ def edit_order(request, pk):
         'inventory_by_product': inventory_by_product
     })
 
+
+@require_POST
+@idempotent('order_batch')
+def bulk_order_ingest(request):
+    """
+    JSON ingest for POS terminals and marketplace feeds.
+
+    Takes {"orders": [{"lines": [{"inventory_item": id, "quantity": n} or
+    {"sku": ..., "unit": ..., "quantity": n}], "order_date", "status",
+    "customer_name", ...}]} and answers with one result per order. Uses the
+    session login, so clients send the CSRF token in X-CSRFToken.
+    """
+    if not request.user.is_authenticated or request.user.role not in ['staff', 'admin']:
+        return JsonResponse({'error': 'Staff login required.'}, status=403)
+    try:
+        batch = json.loads(request.body)['orders']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected a JSON object with an "orders" list.'}, status=400)
+    if not isinstance(batch, list):
+        return JsonResponse({'error': 'Expected a JSON object with an "orders" list.'}, status=400)
+
+    try:
+        results = place_orders(batch, ordered_by=request.user)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=409 if isinstance(e, stock.InsufficientStock) else 400)
+
+    response = []
+    for index, (raw, result) in enumerate(zip(batch, results)):
+        entry = {'index': index}
+        if isinstance(raw, dict) and 'ref' in raw:
+            entry['ref'] = raw['ref']
+        if 'order' in result:
+            entry.update(status='created', order_id=result['order'].pk, total_value=str(result['order'].total_value))
+        else:
+            entry.update(status='rejected', errors=result['errors'])
+        response.append(entry)
+    created = sum(1 for entry in response if entry['status'] == 'created')
+    if created:
+        notify_orders_ingested(request.user, created)
+    return JsonResponse({'created': created, 'rejected': len(response) - created, 'results': response})
+
+
+@require_POST
+@idempotent('order_status')
+def bulk_order_status(request):
+    """
+    Move many orders to a new status at once.
+
+    Takes the order list's selection form (``order_ids`` and ``status``) and
+    redirects back to the list, or JSON {"orders": [ids], "status": ...} and
+    answers with the ids moved and the errors for the others.
+    """
+    is_json = request.content_type == 'application/json'
+    if not request.user.is_authenticated or request.user.role not in ['staff', 'admin']:
+        if is_json:
+            return JsonResponse({'error': 'Staff login required.'}, status=403)
+        return HttpResponseForbidden('Order status changes are only available to admin and staff members.')
+
+    if is_json:
+        try:
+            payload = json.loads(request.body)
+            order_ids, status = payload['orders'], payload['status']
+        except (ValueError, KeyError, TypeError):
+            order_ids = status = None
+        if not isinstance(order_ids, list) or not all(type(order_id) is int for order_id in order_ids):
+            return JsonResponse({'error': 'Expected a JSON object with an "orders" list of ids and a "status".'}, status=400)
+    else:
+        order_ids = [int(value) for value in request.POST.getlist('order_ids') if value.isdigit()]
+        status = request.POST.get('status', '')
+        # Back to the list with the filters it was showing
+        _, filters = exports.parse_filters(QueryDict(request.POST.get('filter_query', '')))
+        back = reverse('order_list') + (f'?{urlencode(filters)}' if filters else '')
+
+    try:
+        moved, errors = transition_orders(order_ids, status, changed_by=request.user)
+    except ValidationError as e:
+        if is_json:
+            return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+        for message in e.messages:
+            messages.error(request, message)
+        return redirect(back)
+
+    if moved:
+        notify_orders_status_changed(request.user, len(moved), status)
+    if is_json:
+        return JsonResponse({'updated': moved, 'errors': {str(order_id): error for order_id, error in errors.items()}})
+
+    if moved:
+        messages.success(request, f'{len(moved)} order(s) marked {status}.')
+    error_list = list(errors.values())
+    for message in error_list[:10]:
+        messages.error(request, message)
+    if len(error_list) > 10:
+        messages.error(request, f'{len(error_list) - 10} more order(s) could not be changed.')
+    return redirect(back)
+
+
+@login_required
+@skip_notifications
+def export_data(request, dataset):
+    """Stream orders, order items or ledger entries (with the order list filters) as CSV or XLSX."""
+    if request.user.role not in ['staff', 'admin']:
+        return HttpResponseForbidden('Exports are only available to admin and staff members.')
+    if dataset not in exports.DATASETS:
+        raise Http404('Unknown export')
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in exports.FORMATS:
+        return HttpResponseBadRequest('Unknown export format.')
+
+    lookups, _ = exports.parse_filters(request.GET)
+    rows = exports.rows(dataset, lookups)
+    name = exports.filename(dataset, export_format)
+    if export_format == 'csv':
+        response = StreamingHttpResponse(exports.csv_lines(rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{name}"'
+        return response
+
+    if exports.openpyxl is None:
+        return HttpResponseBadRequest('XLSX export needs the openpyxl package; use format=csv.')
+    # The workbook is spooled to a temporary file and streamed from there
+    target = tempfile.TemporaryFile()
+    exports.write_xlsx(rows, target, title=dataset)
+    target.seek(0)
+    return FileResponse(
+        target, as_attachment=True, filename=name,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
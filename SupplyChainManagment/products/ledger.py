@@ -0,0 +1,112 @@
+"""
+Posting of the profit ledger.
+
+Every OrderItem has one LedgerEntry mirroring its quantity and prices. Writes
+to order items only schedule their ids here; the entries of everything
+scheduled in a transaction are posted together once it commits, with one
+bulk UPDATE for items that already have an entry and one bulk INSERT for the
+rest. ``rebuild`` regenerates the ledger from OrderItem in chunks.
+"""
+import threading
+
+from django.db import transaction
+
+from .models import LedgerEntry
+
+_pending = threading.local()
+
+BATCH_SIZE = 500
+FIELDS = ['product_id', 'quantity_sold', 'cost_price', 'selling_price', 'profit']
+
+
+def schedule(order_item_ids):
+    """Post the ledger entries of ``order_item_ids`` once the current transaction commits."""
+    ids = getattr(_pending, 'ids', None)
+    if ids is None:
+        ids = _pending.ids = set()
+    ids.update(order_item_ids)
+    # Same scheme as theme.rollups.mark_day_dirty: the first flush drains the set
+    transaction.on_commit(flush_pending)
+
+
+def flush_pending():
+    """Post every scheduled entry now (also called before the rollup reads the ledger)."""
+    ids = getattr(_pending, 'ids', None)
+    if not ids:
+        return
+    _pending.ids = set()
+    post(ids)
+
+
+def post(order_item_ids):
+    """Create or refresh the ledger entries of the given order items. Returns the number posted."""
+    from orders.models import OrderItem
+    from theme.dashboard_cache import bump_version_on_commit
+
+    items = list(
+        OrderItem.objects.filter(pk__in=list(order_item_ids))
+        .values_list('pk', 'product_id', 'quantity', 'unit_cost_price', 'unit_selling_price')
+    )
+    if not items:
+        return 0
+    existing = {}
+    for pk, item_id in (
+        LedgerEntry.objects.filter(order_item_id__in=[item[0] for item in items])
+        .order_by('pk')
+        .values_list('pk', 'order_item_id')
+    ):
+        existing.setdefault(item_id, pk)
+
+    to_update, to_create = [], []
+    for item_id, product_id, quantity, cost_price, selling_price in items:
+        entry = LedgerEntry(
+            pk=existing.get(item_id),
+            order_item_id=item_id,
+            product_id=product_id,
+            quantity_sold=quantity,
+            cost_price=cost_price,
+            selling_price=selling_price,
+            profit=(selling_price - cost_price) * quantity,
+        )
+        (to_update if entry.pk else to_create).append(entry)
+
+    with transaction.atomic():
+        if to_update:
+            LedgerEntry.objects.bulk_update(to_update, FIELDS, batch_size=BATCH_SIZE)
+        if to_create:
+            LedgerEntry.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    # Bulk writes send no signals
+    bump_version_on_commit(LedgerEntry)
+    return len(items)
+
+
+def rebuild(chunk_size=1000):
+    """
+    Regenerate the ledger from OrderItem, ``chunk_size`` items per transaction.
+    Duplicate entries left by the old per-save posting are removed.
+    Returns (items posted, duplicates removed).
+    """
+    from orders.models import OrderItem
+
+    keep = {}
+    duplicates = []
+    for pk, item_id in LedgerEntry.objects.order_by('pk').values_list('pk', 'order_item_id').iterator():
+        if item_id in keep:
+            duplicates.append(pk)
+        else:
+            keep[item_id] = pk
+    for i in range(0, len(duplicates), BATCH_SIZE):
+        LedgerEntry.objects.filter(pk__in=duplicates[i:i + BATCH_SIZE]).delete()
+
+    posted = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            OrderItem.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            posted += post(ids)
+        last_pk = ids[-1]
+    return posted, len(duplicates)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from products.ledger import rebuild
+from theme import rollups
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the profit ledger (LedgerEntry) from order items, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of order items posted per transaction')
+        parser.add_argument('--skip-rollup', action='store_true', help='Do not rebuild the sales rollup afterwards')
+
+    def handle(self, *args, **options):
+        posted, removed = rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Posted {posted} ledger entr(ies), removed {removed} duplicate(s).'))
+        if not options['skip_rollup']:
+            days, rows = rollups.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {days} rollup day(s), {rows} row(s) written.'))
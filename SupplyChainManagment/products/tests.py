@@ -1,3 +1,79 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from inventory.models import InventoryItem
+from orders.models import Order, OrderItem
+from theme.models import DailySalesRollup
+from . import ledger
+from .models import Category, LedgerEntry, Product
+
+User = get_user_model()
+
+
+class LedgerPostingTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='clerk', password='testpass123', role='staff')
+        category = Category.objects.create(name='Test Category')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', category=category, sku=f'L-{i}',
+                cost_price=Decimal('4.00'), selling_price=Decimal('10.00'), created_by=self.user,
+            )
+            for i in range(5)
+        ]
+        self.order = Order.objects.create(
+            product=self.products[0], quantity=5, order_date=date(2025, 3, 1), ordered_by=self.user,
+        )
+
+    def add_items(self):
+        return [
+            OrderItem.objects.create(order=self.order, product=product, quantity=1)
+            for product in self.products
+        ]
+
+    def test_entries_are_posted_in_one_batch_at_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            items = self.add_items()
+        self.assertFalse(LedgerEntry.objects.exists())
+
+        # Read the items and their current entries, then one INSERT in a savepoint
+        with self.assertNumQueries(5):
+            ledger.flush_pending()
+        self.assertEqual(LedgerEntry.objects.count(), 5)
+        self.assertEqual(set(LedgerEntry.objects.values_list('profit', flat=True)), {Decimal('6.00')})
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            DailySalesRollup.objects.get(product__isnull=True).profit, Decimal('30.00'),
+        )
+
+        items[0].quantity = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            items[0].save()
+        entry = LedgerEntry.objects.get(order_item=items[0])
+        self.assertEqual((entry.quantity_sold, entry.profit), (3, Decimal('18.00')))
+        self.assertEqual(LedgerEntry.objects.count(), 5)
+
+    def test_rebuild_restores_one_entry_per_item(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            items = self.add_items()
+        LedgerEntry.objects.filter(order_item=items[1]).delete()
+        LedgerEntry.objects.create(
+            product=self.products[2], order_item=items[2], quantity_sold=9,
+            cost_price=Decimal('1.00'), selling_price=Decimal('2.00'), profit=0,
+        )
+        InventoryItem.objects.create(product=self.products[0], quantity=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            posted, removed = ledger.rebuild(chunk_size=2)
+
+        self.assertEqual((posted, removed), (5, 1))
+        self.assertEqual(
+            sorted(LedgerEntry.objects.values_list('order_item_id', flat=True)),
+            sorted(item.pk for item in items),
+        )
+        self.assertEqual(LedgerEntry.objects.get(order_item=items[2]).profit, Decimal('6.00'))
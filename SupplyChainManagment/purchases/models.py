@@ -172,31 +172,20 @@ class GoodsReceiptItem(models.Model):
         self.purchase_order_item.quantity_received += self.quantity_received
         self.purchase_order_item.save()
         
-        # Update inventory
-        from inventory.models import InventoryItem
-        try:
-            # Look for existing inventory item with same product AND unit type
-            inventory_item = InventoryItem.objects.get(
-                product=self.purchase_order_item.product,
-                unit=self.purchase_order_item.unit_type
-            )
-            inventory_item.quantity += self.quantity_received
+        # Update inventory: add to the stock row with the same product AND unit type
+        # (created on first receipt), with an atomic UPDATE so concurrent
+        # receipts and sales cannot overwrite each other
+        from inventory import stock
+        stock.receive(
+            product=self.purchase_order_item.product,
+            unit=self.purchase_order_item.unit_type,
+            quantity=self.quantity_received,
             # Update unit-specific prices if provided in purchase order
-            if self.purchase_order_item.unit_price:
-                inventory_item.unit_cost_price = self.purchase_order_item.unit_price
-            if self.purchase_order_item.unit_selling_price:
-                inventory_item.unit_selling_price = self.purchase_order_item.unit_selling_price
-            inventory_item.save()
-        except InventoryItem.DoesNotExist:
-            # Create new inventory item if it doesn't exist, using the same unit type as purchased
-            InventoryItem.objects.create(
-                product=self.purchase_order_item.product,
-                quantity=self.quantity_received,
-                unit=self.purchase_order_item.unit_type,  # Use the unit type from purchase order
-                unit_cost_price=self.purchase_order_item.unit_price,
-                unit_selling_price=self.purchase_order_item.unit_selling_price,
-                description=f"Added from Purchase Order {self.goods_receipt.purchase_order.po_number}"
-            )
+            unit_cost_price=self.purchase_order_item.unit_price,
+            unit_selling_price=self.purchase_order_item.unit_selling_price,
+            description=f"Added from Purchase Order {self.goods_receipt.purchase_order.po_number}",
+            reference=self.goods_receipt.receipt_number,
+        )
 
     def __str__(self):
         return f"{self.purchase_order_item.product.name} - {self.quantity_received} units received"
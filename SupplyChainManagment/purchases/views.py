@@ -12,7 +12,9 @@ from .forms import (PurchaseOrderForm, PurchaseOrderItemFormSet, PurchaseInvoice
 from suppliers.models import Supplier
 from suppliers.decorators import staff_or_admin_required, supplier_required
 from products.models import Product
+from inventory import units
 from inventory.models import InventoryItem
+from theme.idempotency import idempotent
 
 @staff_or_admin_required
 def purchase_dashboard(request):
@@ -78,6 +80,7 @@ def purchase_order_list(request):
     return render(request, 'purchases/purchase_order_list.html', context)
 
 @staff_or_admin_required
+@idempotent('purchase_order')
 def create_purchase_order(request):
     """Create a new purchase order - Staff/Admin only"""
     products = Product.objects.all()
@@ -520,40 +523,16 @@ def get_product_price(request):
                     'source': 'inventory'
                 })
             except InventoryItem.DoesNotExist:
-                # Fallback to calculated prices based on product base prices
-                base_cost_price = product.cost_price
-                base_selling_price = product.selling_price
-                
-                # Unit conversion multipliers
-                unit_multipliers = {
-                    'piece': 1,
-                    'box': 10,      # 1 box = 10 pieces
-                    'case': 50,     # 1 case = 50 pieces  
-                    'pallet': 1000, # 1 pallet = 1000 pieces
-                    'dozen': 12,    # 1 dozen = 12 pieces
-                    'pack': 5,      # 1 pack = 5 pieces
-                    'set': 3,       # 1 set = 3 pieces
-                    'kg': 1,        # For weight-based products
-                    'gram': 0.001,  # 1 gram = 0.001 kg
-                    'liter': 1,     # For volume-based products
-                    'ml': 0.001,    # 1 ml = 0.001 liter
-                    'meter': 1,     # For length-based products
-                    'cm': 0.01,     # 1 cm = 0.01 meter
-                    'unit': 1,      # Generic unit
-                }
-                
-                # Get multiplier for the selected unit
-                multiplier = unit_multipliers.get(unit_type, 1)
-                
-                # Calculate prices for the selected unit
-                unit_cost_price = base_cost_price * multiplier
-                unit_selling_price = base_selling_price * multiplier
+                # Fallback to the product's base prices converted to the selected unit
+                multiplier = units.factor(product.id, unit_type)
+                unit_cost_price = product.cost_price * multiplier
+                unit_selling_price = product.selling_price * multiplier
                 
                 return JsonResponse({
                     'cost_price': f"{unit_cost_price:.2f}",
                     'selling_price': f"{unit_selling_price:.2f}",
                     'unit_type': unit_type,
-                    'multiplier': multiplier,
+                    'multiplier': float(multiplier),
                     'source': 'calculated'
                 })
         except Product.DoesNotExist:
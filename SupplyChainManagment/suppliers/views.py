@@ -38,7 +38,8 @@ def add_supplier(request):
     if request.method == 'POST':
         form = SupplierForm(request.POST)
         if form.is_valid():
-            form.save()
+            supplier = form.save()
+            notify_supplier_registered(request, supplier)
             messages.success(request, 'Supplier added successfully!')
             return redirect('supplier_list')
     else:
@@ -1,4 +1,33 @@
-from .views import get_notifications
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .views import get_request_notifications
+
+
+def wants_notifications(request):
+    """
+    The header feed is only needed by full HTML pages. AJAX calls, JSON
+    clients, excluded paths (PDF downloads, ...) and views decorated with
+    theme.decorators.skip_notifications never load it.
+    """
+    if getattr(request, 'skip_notifications', False):
+        return False
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return False
+    accept = request.headers.get('accept', '')
+    if 'application/json' in accept and 'text/html' not in accept:
+        return False
+    excluded = getattr(settings, 'NOTIFICATIONS_EXCLUDED_PATHS', [])
+    return not any(request.path.startswith(prefix) for prefix in excluded)
+
 
 def notifications(request):
-    return {'notifications': get_notifications()}
+    if not wants_notifications(request):
+        return {'notifications': [], 'unread_notifications_count': 0}
+    # Lazy: templates that never touch the feed never query it
+    return {
+        'notifications': SimpleLazyObject(lambda: get_request_notifications(request)),
+        'unread_notifications_count': SimpleLazyObject(
+            lambda: sum(1 for n in get_request_notifications(request) if not getattr(n, 'is_read', False))
+        ),
+    }
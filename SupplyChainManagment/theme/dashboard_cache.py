@@ -0,0 +1,117 @@
+"""
+Per-section cache for the dashboards.
+
+Each section lists the tables it is computed from. Every table has a version
+number in the cache that is bumped (after commit) whenever a row of it is
+saved or deleted, see theme.signals. A section's cache key embeds the current
+versions of its tables, so a write makes the old entries unreachable instead
+of having to find and delete them.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import singleflight
+
+# section name -> tables (app_label.Model) it is computed from
+SECTIONS = {
+    'sales_summary': ['theme.DailySalesRollup', 'orders.Order', 'purchases.PurchaseOrderItem'],
+    'daily_sales': ['theme.DailySalesRollup'],
+    'product_breakdown': ['theme.DailySalesRollup', 'products.Product'],
+    'operations': ['shipments.Shipment', 'invoices.Invoice', 'products.Product'],
+    'top_customers': ['orders.Customer'],
+    'recent_orders': ['orders.Order', 'orders.OrderItem', 'invoices.Invoice', 'products.Product'],
+    'recent_sales': ['orders.Order', 'orders.OrderItem', 'products.Product'],
+}
+
+VERSION_KEY = 'dashboard:version:{}'
+STATS_KEY = 'dashboard:stats:{}:{}'
+
+
+def _label(model):
+    return model if isinstance(model, str) else model._meta.label
+
+
+def bump_version(model):
+    """Invalidate every section computed from ``model`` (a model class or label)."""
+    key = VERSION_KEY.format(_label(model))
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_version_on_commit(model):
+    # Bumping before commit would let a concurrent request cache pre-commit data
+    transaction.on_commit(lambda: bump_version(model))
+
+
+def table_versions(labels):
+    keys = [VERSION_KEY.format(label) for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from the clock so an evicted version never reuses an old number
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def section_key(name, *parts):
+    versions = '-'.join(str(v) for v in table_versions(SECTIONS[name]))
+    return ':'.join(['dashboard', name, *[str(p) for p in parts], versions])
+
+
+def stale_key(name, *parts):
+    # Unversioned copy of the last computed value, served while it is recomputed
+    return ':'.join(['dashboard', name, *[str(p) for p in parts], 'stale'])
+
+
+def _count(name, outcome):
+    key = STATS_KEY.format(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def cached_section(name, compute, *parts):
+    """
+    Return the cached value of a dashboard section, computing and storing it
+    on a miss. ``parts`` (e.g. the current date) are added to the key. Only one
+    caller recomputes a missing section, the others get the previous value
+    (see theme.singleflight).
+    """
+    key = section_key(name, *parts)
+    value = cache.get(key)
+    if value is not None:
+        _count(name, 'hits')
+        return value
+    _count(name, 'misses')
+    return singleflight.get_or_compute(
+        key, compute, settings.DASHBOARD_CACHE_TIMEOUT, stale_key=stale_key(name, *parts), name=f'dashboard:{name}',
+    )
+
+
+def stats():
+    """Hit/miss counters per section since the last reset."""
+    keys = [STATS_KEY.format(name, outcome) for name in SECTIONS for outcome in ['hits', 'misses']]
+    values = cache.get_many(keys)
+    return {
+        name: {
+            'hits': values.get(STATS_KEY.format(name, 'hits'), 0),
+            'misses': values.get(STATS_KEY.format(name, 'misses'), 0),
+        }
+        for name in SECTIONS
+    }
+
+
+def reset_stats():
+    cache.delete_many([STATS_KEY.format(name, outcome) for name in SECTIONS for outcome in ['hits', 'misses']])
+    singleflight.reset_stats(singleflight_names())
+
+
+def singleflight_names():
+    return [f'dashboard:{name}' for name in SECTIONS]
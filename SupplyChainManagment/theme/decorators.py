@@ -0,0 +1,13 @@
+from functools import wraps
+
+
+def skip_notifications(view_func):
+    """
+    Decorator for views whose templates never show the header notification
+    feed (partials, exports), so the context processor does not load it.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        request.skip_notifications = True
+        return view_func(request, *args, **kwargs)
+    return _wrapped_view
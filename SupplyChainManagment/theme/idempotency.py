@@ -0,0 +1,92 @@
+"""
+Idempotency keys for form and API submissions.
+
+A POST carrying a key (the ``Idempotency-Key`` header, or the hidden field
+rendered by ``{% idempotency_field %}``) is handled once per user and scope.
+The key's row is inserted in the same transaction as the view's writes and
+the outcome (a redirect, or a successful JSON body) is stored on it; a retry
+with the same key replays that outcome without calling the view. A retry
+that arrives while the first submission is still running waits on the
+unique index, then replays. Submissions that end without an outcome to
+replay (a form re-rendered with errors) release their key.
+"""
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+FIELD = 'idempotency_key'
+
+
+def submitted_key(request):
+    return (request.headers.get(HEADER) or request.POST.get(FIELD, '')).strip()[:100]
+
+
+def _is_json(response):
+    return response.get('Content-Type', '').startswith('application/json')
+
+
+def _replay(request, record):
+    if record.response_location:
+        if not request.headers.get(HEADER):
+            messages.info(request, 'This form was already submitted, showing the original result.')
+        return HttpResponseRedirect(record.response_location)
+    response = HttpResponse(record.response_body, status=record.response_status, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _store(record, response):
+    """Keep what a retry should replay; False when the response is not worth replaying."""
+    if 300 <= response.status_code < 400 and response.has_header('Location'):
+        record.response_location = response['Location']
+    elif 200 <= response.status_code < 300 and _is_json(response) and not response.streaming:
+        record.response_body = response.content.decode(response.charset)
+    else:
+        return False
+    record.response_status = response.status_code
+    record.save(update_fields=['response_status', 'response_location', 'response_body'])
+    return True
+
+
+def idempotent(scope):
+    """Decorator making POSTs to a view that carry an idempotency key safe to retry."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            key = submitted_key(request) if request.method == 'POST' else ''
+            if not key or not request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            keys = IdempotencyKey.objects.filter(user=request.user, scope=scope, key=key)
+            expired = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+            with transaction.atomic():
+                keys.filter(created_at__lt=expired).delete()
+                try:
+                    with transaction.atomic():
+                        record = IdempotencyKey.objects.create(user=request.user, scope=scope, key=key)
+                except IntegrityError:
+                    record = keys.first()
+                    if record is not None and record.response_status:
+                        return _replay(request, record)
+                    return JsonResponse({'error': 'This submission is still being processed.'}, status=409)
+
+                response = view_func(request, *args, **kwargs)
+                if not _store(record, response):
+                    record.delete()
+            return response
+        return _wrapped_view
+    return decorator
+
+
+def purge_expired():
+    """Delete the keys older than IDEMPOTENCY_KEY_TTL; returns how many were removed."""
+    expired = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    return IdempotencyKey.objects.filter(created_at__lt=expired).delete()[0]
@@ -0,0 +1,33 @@
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_POST
+import io
+from . import imports
+from .decorators import skip_notifications
+
+@require_POST
+@skip_notifications
+def import_data(request, dataset):
+    """
+    Upload endpoint for bulk imports (see theme.imports): a multipart POST
+    with the CSV or JSON Lines ``file`` and an optional ``format``. Answers
+    with the created/updated/rejected counts and the per-row errors.
+    """
+    if not request.user.is_authenticated or request.user.role not in ['staff', 'admin']:
+        return JsonResponse({'error': 'Staff login required.'}, status=403)
+    if dataset not in imports.IMPORTERS:
+        raise Http404(f"Unknown import '{dataset}'")
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'Expected a "file" upload.'}, status=400)
+    file_format = request.POST.get('format') or imports.file_format(upload.name)
+    if file_format not in imports.FORMATS:
+        return JsonResponse({'error': 'Unknown import format.'}, status=400)
+
+    # Large uploads are already spooled to a temporary file, which is read line by line
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        result = imports.run(dataset, stream, file_format, user=request.user, reference=f'Import {upload.name}')
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+    return JsonResponse(result.as_dict())
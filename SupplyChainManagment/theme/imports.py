@@ -0,0 +1,368 @@
+"""
+Bulk imports of products, suppliers and inventory rows from CSV or JSON Lines.
+
+Rows are read from the file one at a time and handled in chunks of
+IMPORT_CHUNK_SIZE. Each chunk is validated with the model fields' own form
+fields, matched against the existing rows it refers to (looked up for the
+whole chunk in one query per key) and written with one upsert, in its own
+transaction, so memory stays bounded by the chunk size however long the file
+is. Invalid rows are skipped and reported by line number; when a key appears
+twice, the later row wins. Existing rows only change in the columns a row
+fills in; rows that create a record take the field defaults for the others.
+
+- products: keyed on ``sku``; ``category`` is a category name, created when missing.
+- suppliers: keyed on ``name``.
+- inventory: keyed on (``sku``, ``unit``); ``quantity`` is the stock on hand
+  and the difference to the stored quantity is journaled and valued as an adjustment.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .dashboard_cache import bump_version_on_commit
+
+FORMATS = ['csv', 'jsonl']
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    """Counts of an import, and the errors of the first MAX_REPORTED_ERRORS rejected rows."""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, messages):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': messages})
+
+    def as_dict(self):
+        return {'created': self.created, 'updated': self.updated, 'rejected': self.rejected, 'errors': self.errors}
+
+
+def file_format(name):
+    """Import format for a file name, from its extension (CSV unless it is .jsonl/.ndjson/.json)."""
+    return 'jsonl' if name.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(stream, file_format):
+    """(line number, row dict or None when the line is not an object) for each row of text ``stream``."""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        try:
+            for row in reader:
+                yield reader.line_num, row
+        except csv.Error as e:
+            raise ValidationError(f'Line {reader.line_num}: {e}')
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+class _Columns:
+    """Form fields of a model's importable columns, built once per import."""
+
+    def __init__(self, model, columns):
+        self.fields = {column: model._meta.get_field(column) for column in columns}
+        self.form_fields = {column: field.formfield() for column, field in self.fields.items()}
+
+    def clean(self, row):
+        """(cleaned values of the columns ``row`` fills in, errors); empty cells are left out."""
+        values, errors = {}, []
+        for column, form_field in self.form_fields.items():
+            value = row.get(column)
+            if value in (None, ''):
+                continue
+            try:
+                values[column] = form_field.clean(value)
+            except ValidationError as e:
+                errors.extend(f'{column}: {message}' for message in e.messages)
+        return values, errors
+
+    def complete(self, values):
+        """``values`` of a row to create, with the field defaults for the columns it left out."""
+        values, errors = dict(values), []
+        for column, field in self.fields.items():
+            if column in values:
+                continue
+            try:
+                values[column] = self.form_fields[column].clean(field.get_default() if field.has_default() else None)
+            except ValidationError as e:
+                errors.extend(f'{column}: {message}' for message in e.messages)
+        return values, errors
+
+
+def _update_existing(model, rows):
+    """Write ``rows`` ([(instance with pk, fields to write)]) with one bulk_update per set of fields."""
+    groups = {}
+    for instance, fields in rows:
+        if fields:
+            groups.setdefault(tuple(sorted(fields)), []).append(instance)
+    for fields, instances in groups.items():
+        model.objects.bulk_update(instances, fields)
+
+
+def _create_new(model, rows, unique_fields):
+    """
+    Insert ``rows`` ([(unsaved instance, fields the file filled in)]) with one
+    INSERT per set of fields. A row created concurrently since the lookup is
+    updated instead, in those fields only.
+    """
+    groups = {}
+    for instance, fields in rows:
+        groups.setdefault(tuple(sorted(fields)), []).append(instance)
+    for fields, instances in groups.items():
+        if fields:
+            model.objects.bulk_create(instances, update_conflicts=True, unique_fields=unique_fields,
+                                      update_fields=list(fields))
+        else:
+            model.objects.bulk_create(instances, ignore_conflicts=True)
+
+
+class ProductImporter:
+    def __init__(self, user, reference):
+        from products.models import Product
+
+        if user is None:
+            raise ValidationError('Importing products needs a user to record as their creator.')
+        self.user = user
+        self.columns = _Columns(Product, ['sku', 'name', 'cost_price', 'selling_price'])
+        self.categories = {}
+
+    def _category_ids(self, names):
+        from products.models import Category
+
+        missing = {name for name in names if name not in self.categories}
+        if missing:
+            for pk, name in Category.objects.filter(name__in=missing).order_by('pk').values_list('pk', 'name'):
+                self.categories.setdefault(name, pk)
+            new = [Category(name=name) for name in missing if name not in self.categories]
+            if new:
+                Category.objects.bulk_create(new)
+                created = Category.objects.filter(name__in=[category.name for category in new]).order_by('pk')
+                for pk, name in created.values_list('pk', 'name'):
+                    self.categories.setdefault(name, pk)
+        return self.categories
+
+    def write(self, chunk, result):
+        from products.models import Product
+
+        cleaned = {}
+        for line, row in chunk:
+            values, errors = self.columns.clean(row)
+            if 'sku' not in values and not errors:
+                errors.append('sku: This field is required.')
+            if errors:
+                result.reject(line, errors)
+                continue
+            category = str(row.get('category') or '').strip()[:100]
+            if category:
+                values['category'] = category
+            cleaned[values['sku']] = (line, values)
+        if not cleaned:
+            return
+
+        existing = dict(Product.objects.filter(sku__in=list(cleaned)).values_list('sku', 'pk'))
+        categories = self._category_ids({
+            values['category'] for _, values in cleaned.values() if 'category' in values
+        })
+        new, updates = [], []
+        for sku, (line, values) in cleaned.items():
+            fields = {name: value for name, value in values.items() if name not in ('sku', 'category')}
+            if 'category' in values:
+                fields['category_id'] = categories[values['category']]
+            supplied = [name.removesuffix('_id') for name in fields]
+            if sku in existing:
+                updates.append((Product(pk=existing[sku], **fields), supplied))
+                continue
+            complete, errors = self.columns.complete(values)
+            if errors:
+                result.reject(line, errors)
+                continue
+            complete.pop('category', None)
+            new.append((Product(category_id=fields.get('category_id'), created_by=self.user, **complete), supplied))
+
+        _create_new(Product, new, ['sku'])
+        _update_existing(Product, updates)
+        bump_version_on_commit(Product)
+        result.created += len(new)
+        result.updated += len(updates)
+
+
+class SupplierImporter:
+    fields = ['contact_person', 'email', 'phone', 'address']
+
+    def __init__(self, user, reference):
+        from suppliers.models import Supplier
+
+        self.columns = _Columns(Supplier, ['name', *self.fields])
+
+    def write(self, chunk, result):
+        from suppliers.models import Supplier
+
+        cleaned = {}
+        for line, row in chunk:
+            values, errors = self.columns.clean(row)
+            if 'name' not in values and not errors:
+                errors.append('name: This field is required.')
+            if errors:
+                result.reject(line, errors)
+                continue
+            cleaned[values['name']] = (line, values)
+        if not cleaned:
+            return
+
+        # Supplier names are not unique in the table; the oldest supplier of a name is the one updated
+        existing = {}
+        for pk, name in Supplier.objects.filter(name__in=list(cleaned)).order_by('pk').values_list('pk', 'name'):
+            existing.setdefault(name, pk)
+        new, updates = [], []
+        for name, (line, values) in cleaned.items():
+            if name in existing:
+                updates.append((Supplier(pk=existing[name], **values), [field for field in values if field != 'name']))
+                continue
+            complete, errors = self.columns.complete(values)
+            if errors:
+                result.reject(line, errors)
+            else:
+                new.append(Supplier(**complete))
+        Supplier.objects.bulk_create(new)
+        _update_existing(Supplier, updates)
+        result.created += len(new)
+        result.updated += len(updates)
+
+
+class InventoryImporter:
+    fields = ['quantity', 'location', 'description', 'unit_cost_price', 'unit_selling_price']
+
+    def __init__(self, user, reference):
+        from inventory.models import InventoryItem
+
+        self.columns = _Columns(InventoryItem, ['unit', *self.fields])
+        self.reference = reference
+
+    def write(self, chunk, result):
+        from inventory import stock, units, valuation
+        from inventory.models import InventoryItem, StockMovement
+        from products.models import Product
+
+        rows = []
+        for line, row in chunk:
+            values, errors = self.columns.clean(row)
+            sku = str(row.get('sku') or '').strip()
+            if not sku:
+                errors.insert(0, 'sku: This field is required.')
+            if errors:
+                result.reject(line, errors)
+            else:
+                rows.append((line, sku, values))
+        if not rows:
+            return
+
+        products = dict(Product.objects.filter(sku__in={sku for _, sku, _ in rows}).values_list('sku', 'pk'))
+        unit_field = self.columns.fields['unit']
+        cleaned = {}
+        for line, sku, values in rows:
+            if sku not in products:
+                result.reject(line, [f'sku: Unknown SKU "{sku}".'])
+                continue
+            # The unit is part of the key, so a row without one means the default unit
+            values.setdefault('unit', unit_field.get_default())
+            cleaned[products[sku], values['unit']] = (line, values)
+        if not cleaned:
+            return
+
+        # The stored quantities, locked, so the journal records what the import changed
+        existing = {
+            (product_id, unit): (pk, quantity)
+            for product_id, unit, pk, quantity in InventoryItem.objects.select_for_update()
+            .filter(product_id__in={product_id for product_id, _ in cleaned})
+            .values_list('product_id', 'unit', 'pk', 'quantity')
+            if (product_id, unit) in cleaned
+        }
+        new, updates, quantities = [], [], {}
+        for key, (line, values) in cleaned.items():
+            product_id, unit = key
+            supplied = [name for name in values if name != 'unit']
+            if key not in existing:
+                values, errors = self.columns.complete(values)
+                if errors:
+                    result.reject(line, errors)
+                    continue
+            fields = {name: value for name, value in values.items() if name != 'unit'}
+            if 'quantity' in fields:
+                quantities[key] = fields['quantity']
+                fields['unit_factor'] = units.factor(product_id, unit)
+                fields['base_quantity'] = fields['quantity'] * fields['unit_factor']
+                supplied += ['unit_factor', 'base_quantity']
+            if key in existing:
+                updates.append((InventoryItem(pk=existing[key][0], **fields), list(fields)))
+            else:
+                new.append((InventoryItem(product_id=product_id, unit=unit, **fields), supplied))
+
+        _create_new(InventoryItem, new, ['product', 'unit'])
+        _update_existing(InventoryItem, updates)
+
+        new_keys = {(item.product_id, item.unit) for item, _ in new}
+        if new_keys:
+            for product_id, unit, pk in (
+                InventoryItem.objects.filter(product_id__in={product_id for product_id, _ in new_keys})
+                .values_list('product_id', 'unit', 'pk')
+            ):
+                if (product_id, unit) in new_keys:
+                    existing[product_id, unit] = (pk, 0)
+        changes = {existing[key][0]: quantity - existing[key][1] for key, quantity in quantities.items()}
+        stock.record(changes, StockMovement.ADJUSTMENT, self.reference)
+        valuation.adjust(changes, self.reference)
+        stock.record_low_stock(changes)
+        result.created += len(new)
+        result.updated += len(updates)
+
+
+IMPORTERS = {
+    'products': ProductImporter,
+    'suppliers': SupplierImporter,
+    'inventory': InventoryImporter,
+}
+
+
+def _chunks(rows, size):
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(dataset, stream, file_format, user=None, reference='Imported', chunk_size=None):
+    """
+    Import the rows of text ``stream`` into ``dataset``, one chunk per
+    transaction. Returns an ImportResult; raises ValidationError when the
+    file cannot be read at all (chunks before the bad line stay imported).
+    """
+    importer = IMPORTERS[dataset](user, reference[:100])
+    result = ImportResult()
+    for chunk in _chunks(read_rows(stream, file_format), chunk_size or settings.IMPORT_CHUNK_SIZE):
+        rows = []
+        for line, row in chunk:
+            if row is None:
+                result.reject(line, ['Not a JSON object.'])
+            else:
+                rows.append((line, row))
+        if rows:
+            with transaction.atomic():
+                importer.write(rows, result)
+    return result
@@ -0,0 +1,64 @@
+"""
+Keyset (cursor) pagination for long, newest-first lists.
+
+Rows are ordered on (field, id) descending and the next page is selected with
+``field < last value OR (field = last value AND id < last id)`` instead of an
+OFFSET, so with an index on (field, id) every page costs the same whatever
+its depth. Rows where ``field`` is NULL come after all the others.
+"""
+from typing import NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class KeysetPage(NamedTuple):
+    object_list: list
+    next_cursor: str | None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(value, pk):
+    raw = f'{"" if value is None else value.isoformat()}|{pk}'
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(cursor, model_field):
+    """(value, pk) from a cursor made by encode_cursor, or None when it is missing or invalid."""
+    if not cursor:
+        return None
+    try:
+        value, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        return (model_field.to_python(value) if value else None), int(pk)
+    except (ValueError, UnicodeDecodeError, ValidationError):
+        return None
+
+
+def paginate(queryset, cursor, page_size, field):
+    """Return the KeysetPage of ``queryset`` that follows ``cursor`` (the first page when empty)."""
+    model_field = queryset.model._meta.get_field(field)
+    queryset = queryset.order_by(F(field).desc(nulls_last=True), '-pk')
+
+    position = decode_cursor(cursor, model_field)
+    if position is not None:
+        value, pk = position
+        if value is None:
+            queryset = queryset.filter(**{f'{field}__isnull': True, 'pk__lt': pk})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'pk__lt': pk})
+                | Q(**{f'{field}__isnull': True})
+            )
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, model_field.attname), last.pk)
+    return KeysetPage(rows, next_cursor)
@@ -0,0 +1,138 @@
+"""
+Latency of the dashboard pages, measured in-process through Django's test
+clients on the current (optionally seeded) database.
+
+A dashboard is a shell plus one JSON request per card. The command times
+each of them on its own, one request after another. Cards cost their queries;
+the shells cost only the session, user and notification feed. It does not
+measure concurrency: browsers fetch the cards in parallel, here they run in
+sequence.
+"""
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.utils.timezone import now
+
+from theme import rollups
+
+# (label, url, cards)
+PAGES = [
+    ('dashboard', '/dashboard/',
+     ['report_cards', 'tasks_this_week', 'sales_overview', 'sales_numbers', 'profit_overview', 'recent_sales']),
+    ('sales', '/sales/',
+     ['month_summary', 'order_summary', 'sales_windows', 'best_seller_table', 'recent_orders']),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time the dashboard shells and each of their cards, one request at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Requests per view')
+        parser.add_argument('--username', help='User to log in as (defaults to the first staff user)')
+        parser.add_argument('--warm', action='store_true', help='Keep the dashboard cache between requests')
+        parser.add_argument('--seed-days', type=int, default=0,
+                            help='Seed this many days of synthetic orders first (rolled back afterwards)')
+        parser.add_argument('--orders-per-day', type=int, default=50)
+        parser.add_argument('--products', type=int, default=20)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(username=options['username']) if options['username'] else \
+            User.objects.filter(role__in=['staff', 'admin']).order_by('pk')
+        user = users.first()
+        if user is None:
+            raise CommandError('No staff user found, pass --username')
+
+        try:
+            with transaction.atomic():
+                if options['seed_days']:
+                    self.seed(user, options['seed_days'], options['orders_per_day'], options['products'])
+                self.run(user, options['iterations'], options['warm'])
+                if options['seed_days']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write('Seed data rolled back.')
+
+    def run(self, user, iterations, warm):
+        client = Client(headers={'host': 'localhost'})
+        client.force_login(user)
+
+        for label, url, cards in PAGES:
+            timings = [('shell', self.measure(lambda: client.get(url), iterations, warm))]
+            for card in cards:
+                card_url = f'/dashboard/widgets/{card}/'
+                timings.append((card, self.measure(lambda: client.get(card_url), iterations, warm)))
+            for part, times in timings:
+                self.stdout.write(
+                    f"{label:<10} {part:<18} median={statistics.median(times):8.1f}ms "
+                    f"p95={self.percentile(times, 95):8.1f}ms min={min(times):8.1f}ms"
+                )
+            cards_total = sum(statistics.median(times) for part, times in timings if part != 'shell')
+            self.stdout.write(f"{label:<10} {'all cards':<18} median sum={cards_total:8.1f}ms")
+
+    def measure(self, request, iterations, warm):
+        times = []
+        for _ in range(iterations):
+            if not warm:
+                cache.clear()
+            started = time.perf_counter()
+            response = request()
+            times.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'Unexpected status {response.status_code}')
+        return times
+
+    @staticmethod
+    def percentile(values, percent):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def seed(self, user, days, orders_per_day, products):
+        """Bulk insert synthetic orders and refresh the rollup for them."""
+        from inventory.models import InventoryItem
+        from orders.models import Order, OrderItem
+        from products.models import Category, LedgerEntry, Product
+
+        category, _ = Category.objects.get_or_create(name='Benchmark')
+        stamp = int(time.time())
+        catalog = Product.objects.bulk_create([
+            Product(name=f'Benchmark {i}', category=category, sku=f'BENCH-{stamp}-{i}',
+                    cost_price=Decimal('4.00'), selling_price=Decimal('9.00'), created_by=user)
+            for i in range(products)
+        ])
+        stock = InventoryItem.objects.bulk_create([
+            InventoryItem(product=product, quantity=100000) for product in catalog
+        ])
+        today = now().date()
+        order_days = [today - timedelta(days=d) for d in range(days)]
+        orders = Order.objects.bulk_create([
+            Order(product=catalog[n % products], quantity=3, order_date=day, status='delivered',
+                  customer_name=f'Customer {n % 25}', ordered_by=user)
+            for day in order_days for n in range(orders_per_day)
+        ], batch_size=500)
+        items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=catalog[(order.pk + k) % products],
+                      inventory_item=stock[(order.pk + k) % products], quantity=1,
+                      unit_selling_price=Decimal('9.00'), unit_cost_price=Decimal('4.00'),
+                      total_price=Decimal('9.00'), total_profit=Decimal('5.00'))
+            for order in orders for k in range(3)
+        ], batch_size=500)
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(product_id=item.product_id, order_item=item, quantity_sold=1,
+                        cost_price=Decimal('4.00'), selling_price=Decimal('9.00'), profit=Decimal('5.00'))
+            for item in items
+        ], batch_size=500)
+        rollups.refresh_days(order_days)
+        self.stdout.write(f'Seeded {len(orders)} orders over {days} day(s).')
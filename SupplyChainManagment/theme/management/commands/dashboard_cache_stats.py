@@ -0,0 +1,35 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from theme import dashboard_cache, singleflight
+
+
+class Command(BaseCommand):
+    help = 'Show the dashboard section cache hit/miss and single-flight counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache):
+            # The counters would be this command's own, empty, in-memory cache
+            raise CommandError(
+                'The counters live in each server process\'s in-memory cache; '
+                'set REDIS_URL so the server and this command share one cache.'
+            )
+        for name, counts in dashboard_cache.stats().items():
+            total = counts['hits'] + counts['misses']
+            ratio = (counts['hits'] / total) * 100 if total else 0
+            self.stdout.write(f"{name:<15} hits={counts['hits']:<8} misses={counts['misses']:<8} hit rate={ratio:.1f}%")
+        self.stdout.write('')
+        names = dashboard_cache.singleflight_names() + ['notifications']
+        for name, counts in singleflight.stats(names).items():
+            self.stdout.write(
+                f"{name:<28} computed={counts['computed']:<6} suppressed={counts['suppressed']:<6} "
+                f"(stale served={counts['stale_served']}, waited={counts['waited']}) fallback={counts['fallback']}"
+            )
+        if options['reset']:
+            dashboard_cache.reset_stats()
+            singleflight.reset_stats(['notifications'])
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
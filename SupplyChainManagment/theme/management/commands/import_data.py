@@ -0,0 +1,45 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from theme import imports
+
+
+class Command(BaseCommand):
+    help = 'Import products, suppliers or inventory rows from a CSV or JSON Lines file in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(imports.IMPORTERS))
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--format', choices=imports.FORMATS, help='File format (default: from the extension)')
+        parser.add_argument('--user', help='Username recorded as the creator of new products')
+        parser.add_argument('--chunk-size', type=int, help='Rows validated and written per transaction')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'Unknown user "{options["user"]}".')
+
+        path = options['path']
+        file_format = options['format'] or imports.file_format(path)
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as source:
+                result = imports.run(
+                    options['dataset'], source, file_format, user=user,
+                    reference=f'Import {os.path.basename(path)}', chunk_size=options['chunk_size'],
+                )
+        except (OSError, ValidationError) as e:
+            raise CommandError(' '.join(getattr(e, 'messages', [str(e)])))
+
+        for error in result.errors:
+            self.stderr.write(f'Line {error["line"]}: {"; ".join(error["errors"])}')
+        if result.rejected > len(result.errors):
+            self.stderr.write(f'... and {result.rejected - len(result.errors)} more rejected row(s).')
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} created, {result.updated} updated, {result.rejected} rejected.'
+        ))
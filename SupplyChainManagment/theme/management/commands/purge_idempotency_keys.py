@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from theme.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys older than IDEMPOTENCY_KEY_TTL'
+
+    def handle(self, *args, **options):
+        removed = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired idempotency key(s).'))
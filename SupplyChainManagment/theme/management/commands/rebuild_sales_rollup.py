@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from theme.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailySalesRollup table from orders, order items and ledger entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Number of days recomputed per batch')
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else None
+        end = parse_date(options['end']) if options['end'] else None
+        days, rows = rebuild(start=start, end=end, chunk_days=options['chunk_days'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {days} day(s), {rows} rollup row(s) written.'))
@@ -0,0 +1,312 @@
+"""
+Dashboard metrics behind the dashboard cards (theme.widgets).
+
+Every period window (today, yesterday, last week, last month, 90 days, this
+month and the same windows one year back) is computed in a single query using
+conditional aggregation over the DailySalesRollup day totals, so the number of
+queries per card stays constant whatever the data volume.
+"""
+import calendar
+import json
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Q, Sum
+
+from orders.models import Customer, Order, OrderItem
+from products.models import Product
+from purchases.models import PurchaseOrderItem
+from shipments.models import Shipment
+from .models import DailySalesRollup
+
+DAY_TOTALS = DailySalesRollup.objects.filter(product__isnull=True)
+PURCHASE_COST = Sum(F('quantity_ordered') * F('unit_price'))
+
+
+def shift_year(day, year):
+    """Move ``day`` into ``year`` (29 February becomes 28 February)."""
+    try:
+        return day.replace(year=year)
+    except ValueError:
+        return day.replace(year=year, day=28)
+
+
+def percent_change(current, previous):
+    """Percentage change used by every dashboard card (100% when starting from zero)."""
+    current = float(current)
+    previous = float(previous)
+    if previous > 0:
+        return ((current - previous) / previous) * 100
+    return 100 if current > 0 else 0
+
+
+def period_windows(today):
+    """Inclusive (start, end) day ranges for every window shown on the dashboards."""
+    start_of_week = today - timedelta(days=today.weekday())
+    first_day_this_month = today.replace(day=1)
+    last_day_last_month = first_day_this_month - timedelta(days=1)
+    windows = {
+        'today': (today, today),
+        'yesterday': (today - timedelta(days=1), today - timedelta(days=1)),
+        'last_week': (start_of_week - timedelta(days=7), start_of_week - timedelta(days=1)),
+        'last_month': (last_day_last_month.replace(day=1), last_day_last_month),
+        '90_days': (today - timedelta(days=89), today),
+        'this_month': (first_day_this_month, today),
+    }
+    last_year = today.year - 1
+    for name in ['today', 'yesterday', 'last_week', 'last_month', '90_days']:
+        start, end = windows[name]
+        shifted = shift_year(start, last_year)
+        windows[f'{name}_last_year'] = (shifted, shifted + (end - start))
+    return windows
+
+
+def window_aggregates(today):
+    """Conditional aggregates over the rollup day totals for every window."""
+    aggregates = {
+        'total_orders': Sum('order_count', default=0),
+        'total_item_sales': Sum('units_sold', default=0),
+        'total_profit': Sum('profit', default=0),
+    }
+    for name, (start, end) in period_windows(today).items():
+        in_window = Q(day__gte=start, day__lte=end)
+        aggregates[f'sales_{name}'] = Sum('revenue', filter=in_window, default=0)
+        aggregates[f'orders_{name}'] = Sum('order_count', filter=in_window, default=0)
+        aggregates[f'units_{name}'] = Sum('units_sold', filter=in_window, default=0)
+        aggregates[f'profit_{name}'] = Sum('profit', filter=in_window, default=0)
+    return aggregates
+
+
+def _float_totals(totals):
+    return {key: (float(value) if key.startswith(('sales_', 'profit_', 'total_profit')) else value)
+            for key, value in totals.items()}
+
+
+def window_totals(today):
+    """
+    Revenue, orders, units and profit for every window plus the all-time
+    totals, in one conditional aggregation query.
+    """
+    return _float_totals(DAY_TOTALS.aggregate(**window_aggregates(today)))
+
+
+def _daily_sales_rows(today):
+    first_day_this_month = today.replace(day=1)
+    return DAY_TOTALS.filter(
+        day__gte=min(first_day_this_month, today - timedelta(days=6)),
+        day__lte=today,
+    ).values_list('day', 'revenue')
+
+
+def _format_daily_sales(today, rows):
+    first_day_this_month = today.replace(day=1)
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    last_7_days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+    sales_by_date = {day: round(float(revenue), 2) for day, revenue in rows}
+
+    sales_per_day = [0] * days_in_month
+    for day, sales in sales_by_date.items():
+        if day >= first_day_this_month:
+            sales_per_day[day.day - 1] = sales
+
+    return {
+        'sales_per_day': sales_per_day,
+        'days_in_month': list(range(1, days_in_month + 1)),
+        'sales_per_day_data': [(i + 1, sales) for i, sales in enumerate(sales_per_day)],
+        'last_7_days_labels': json.dumps([d.strftime('%a') for d in last_7_days], cls=DjangoJSONEncoder),
+        'last_7_days_sales': json.dumps([sales_by_date.get(d, 0) for d in last_7_days], cls=DjangoJSONEncoder),
+    }
+
+
+def daily_sales(today):
+    """Sales per day for this month and the last 7 days, from one query."""
+    return _format_daily_sales(today, _daily_sales_rows(today))
+
+
+def _product_sales_rows(today):
+    return (
+        DailySalesRollup.objects.filter(product__isnull=False, day__gte=today.replace(day=1), day__lte=today)
+        .values('product__name')
+        .annotate(total_sold=Sum('units_sold'), total_sales=Sum('revenue'), total_profit=Sum('profit'))
+        .order_by('-total_sold')
+    )
+
+
+def _top_profitable_rows(limit=5):
+    return (
+        DailySalesRollup.objects.filter(product__isnull=False)
+        .values('product__name')
+        .annotate(total_profit=Sum('profit'), total_quantity=Sum('units_sold'))
+        .order_by('-total_profit')[:limit]
+    )
+
+
+def _format_product_breakdown(product_sales, top_profitable_products):
+    best_sellers = []
+    for entry in product_sales[:4]:
+        total_sold = entry['total_sold']
+        total_sales = round(float(entry['total_sales'] or 0), 2)
+        best_sellers.append({
+            'name': entry['product__name'],
+            'price': round(total_sales / total_sold, 2) if total_sold else 0,
+            'total_sold': total_sold,
+            'total_sales': total_sales,
+            'total_profit': round(float(entry['total_profit'] or 0), 2),
+        })
+
+    product_names = [entry['product__name'] for entry in product_sales]
+    sales_counts = [entry['total_sold'] for entry in product_sales]
+    return {
+        'product_names': json.dumps(product_names, cls=DjangoJSONEncoder),
+        'sales_counts': json.dumps(sales_counts, cls=DjangoJSONEncoder),
+        'product_sales_data': list(zip(product_names, sales_counts)),
+        'best_sellers': best_sellers,
+        'top_profitable_products': top_profitable_products,
+    }
+
+
+def product_breakdown(today):
+    """This month's per-product sales, best sellers and the most profitable products."""
+    return _format_product_breakdown(list(_product_sales_rows(today)), list(_top_profitable_rows()))
+
+
+def sales_summary(today):
+    """Sales, order and profit figures for every period window."""
+    total_purchase_cost = PurchaseOrderItem.objects.aggregate(total=PURCHASE_COST)['total'] or 0
+    return _format_sales_summary(window_totals(today), total_purchase_cost)
+
+
+def _format_sales_summary(totals, total_purchase_cost):
+
+    sales_this_month = totals['sales_this_month']
+    orders_this_month = totals['orders_this_month']
+    sales_last_month = totals['sales_last_month']
+    orders_last_month = totals['orders_last_month']
+    revenue_per_sale_this_month = sales_this_month / orders_this_month if orders_this_month > 0 else 0
+    revenue_per_sale_last_month = sales_last_month / orders_last_month if orders_last_month > 0 else 0
+
+    this_month_profit = totals['profit_this_month']
+    last_month_profit = totals['profit_last_month']
+
+    context = {
+        'total_orders': totals['total_orders'],
+        'total_item_sales': totals['total_item_sales'],
+        'orders_this_month': orders_this_month,
+        'revenue_per_sale_this_month': round(revenue_per_sale_this_month, 2),
+        'revenue_per_sale_last_month': round(revenue_per_sale_last_month, 2),
+        'percent_more_sales': round(percent_change(sales_this_month, sales_last_month), 2),
+        'percent_revenue_per_sale': round(percent_change(revenue_per_sale_this_month, revenue_per_sale_last_month), 2),
+        'percent_sales_vs_yesterday': round(percent_change(totals['sales_today'], totals['sales_yesterday']), 2),
+        'percent_orders_vs_yesterday': round(percent_change(totals['orders_today'], totals['orders_yesterday']), 2),
+        'total_profit': round(totals['total_profit'], 2),
+        'this_month_profit': round(this_month_profit, 2),
+        'last_month_profit': round(last_month_profit, 2),
+        'profit_change_percent': round(percent_change(this_month_profit, last_month_profit), 2),
+        'overall_profit_margin': round((this_month_profit / sales_this_month) * 100, 2) if sales_this_month > 0 else 0,
+        'total_purchase_cost': round(float(total_purchase_cost), 2),
+        'dashboard_sales': round(sales_this_month, 2),
+        'dashboard_orders': orders_this_month,
+        'dashboard_items': totals['units_this_month'],
+    }
+    for name in ['today', 'yesterday', 'last_week', 'last_month', '90_days']:
+        context[f'sales_{name}'] = round(totals[f'sales_{name}'], 2)
+        context[f'orders_{name}'] = totals[f'orders_{name}']
+        context[f'sales_{name}_last_year'] = round(totals[f'sales_{name}_last_year'], 2)
+    context['sales_this_month'] = round(sales_this_month, 2)
+    context['orders_last_month'] = orders_last_month
+    return context
+
+
+def _operations_aggregates(today):
+    yesterday = today - timedelta(days=1)
+    return {
+        'total': Count('id'),
+        'delivered': Count('id', filter=Q(status='delivered')),
+        'total_yesterday': Count('id', filter=Q(delivery_date=yesterday)),
+        'delivered_yesterday': Count('id', filter=Q(status='delivered', delivery_date=yesterday)),
+    }
+
+
+def _paid_invoices(today):
+    from invoices.models import Invoice
+    return Invoice.objects.filter(payment_status='paid', invoice_date__month=today.month, invoice_date__year=today.year)
+
+
+def _format_operations(shipments, total_products, dashboard_payments):
+    fulfillment_rate = (shipments['delivered'] / shipments['total']) * 100 if shipments['total'] > 0 else 0
+    if shipments['total_yesterday'] > 0:
+        fulfillment_rate_yesterday = (shipments['delivered_yesterday'] / shipments['total_yesterday']) * 100
+    else:
+        fulfillment_rate_yesterday = 0
+
+    # Products have no creation timestamp yet, so the daily comparison stays at zero
+    products_today = products_yesterday = 0
+
+    return {
+        'total_shipments': shipments['total'],
+        'total_products': total_products,
+        'fulfillment_rate': round(fulfillment_rate, 2),
+        'percent_fulfillment_rate_vs_yesterday': round(percent_change(fulfillment_rate, fulfillment_rate_yesterday), 2),
+        'percent_products_vs_yesterday': round(percent_change(products_today, products_yesterday), 2),
+        'dashboard_payments': dashboard_payments,
+    }
+
+
+def operations_metrics(today):
+    """Shipment fulfilment, product and payment counters for the main dashboards."""
+    return _format_operations(
+        Shipment.objects.aggregate(**_operations_aggregates(today)),
+        Product.objects.count(),
+        _paid_invoices(today).count(),
+    )
+
+
+def top_customers(limit=5):
+    """Customers with the most orders, read from their counters (orders.customers)."""
+    return (
+        Customer.objects.filter(order_count__gt=0)
+        .order_by('-order_count', '-lifetime_value')
+        .values(customer_name=F('name'), count=F('order_count'))[:limit]
+    )
+
+
+def recent_orders(today, limit=5):
+    return (
+        Order.objects.filter(order_date__gte=today - timedelta(days=30))
+        .select_related('invoice')
+        .prefetch_related('items__product')
+        .order_by('-order_date')[:limit]
+    )
+
+
+def recent_sales(limit=6):
+    recent_order_items = OrderItem.objects.select_related('order', 'product').order_by('-order__order_date')[:limit]
+    return [
+        {
+            'product': item.product.name,
+            'price': item.product.selling_price,
+            'quantity': item.quantity,
+            'date': item.order.order_date.strftime('%Y-%m-%d') if item.order.order_date else ''
+        }
+        for item in recent_order_items
+    ]
+
+
+def tasks_this_week(user, today):
+    """Orders and shipments the user completed this week."""
+    start_of_week = today - timedelta(days=today.weekday())
+    end_of_week = start_of_week + timedelta(days=6)
+    completed_orders = Order.objects.filter(
+        ordered_by=user, order_date__gte=start_of_week, order_date__lte=end_of_week, status='delivered'
+    ).select_related('product')
+    completed_shipments = Shipment.objects.filter(
+        order__ordered_by=user, delivery_date__gte=start_of_week, delivery_date__lte=end_of_week, status='delivered'
+    )
+    tasks = []
+    for order in completed_orders:
+        tasks.append(f"Delivered order #{order.id} for {order.product.name}")
+    for shipment in completed_shipments:
+        tasks.append(f"Shipment {shipment.tracking_number} delivered for order #{shipment.order_id}")
+    # If no tasks, show a default message
+    return tasks or ["No tasks completed this week."]
+
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_orderitem_inventory_item'),
+        ('theme', '0003_dailysalesrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('order', 'Order'), ('shipment', 'Shipment'), ('product', 'Product'), ('inventory', 'Inventory'), ('invoice', 'Invoice'), ('supplier', 'Supplier')], max_length=20)),
+                ('icon', models.CharField(default='fa-bell', max_length=50)),
+                ('title', models.CharField(max_length=255)),
+                ('text', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orders.order')),
+                ('read_by', models.ManyToManyField(blank=True, related_name='read_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['-created_at', '-id'], name='notification_feed_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+# Create your models here.
+
+
+class DailySalesRollup(models.Model):
+    """
+    Pre-aggregated sales per day and product, used by the dashboards instead of
+    scanning Order/OrderItem/LedgerEntry. Rows with product=None hold the day
+    totals (all products, including the number of orders placed that day).
+    """
+    day = models.DateField()
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, null=True, blank=True)
+    order_count = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_rollup_day_product'),
+            models.UniqueConstraint(fields=['day'], condition=Q(product__isnull=True), name='unique_rollup_day_total'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'day'], name='rollup_product_day_idx'),
+        ]
+
+    def __str__(self):
+        label = self.product.name if self.product_id else 'All products'
+        return f"{self.day} - {label}: ${self.revenue}"
+
+
+class Notification(models.Model):
+    """
+    Persistent activity feed shown in the header, written by the
+    theme.notification_utils hooks when orders, shipments, stock, invoices
+    and suppliers change. Read state is kept per user.
+    """
+    TYPE_CHOICES = [
+        ('order', 'Order'),
+        ('shipment', 'Shipment'),
+        ('product', 'Product'),
+        ('inventory', 'Inventory'),
+        ('invoice', 'Invoice'),
+        ('supplier', 'Supplier'),
+    ]
+
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    icon = models.CharField(max_length=50, default='fa-bell')
+    title = models.CharField(max_length=255)
+    text = models.CharField(max_length=255, blank=True)
+    order = models.ForeignKey('orders.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    read_by = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name='read_notifications')
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='notification_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_display()}: {self.title}"
+
+    @property
+    def time(self):
+        return timezone.localtime(self.created_at).strftime('%d %b') if self.created_at else ''
+
+
+class IdempotencyKey(models.Model):
+    """
+    Outcome of a submission made with an idempotency key (theme.idempotency),
+    so a retried submission replays it instead of writing again. Rows older
+    than IDEMPOTENCY_KEY_TTL are ignored and purged.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=100)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_location = models.CharField(max_length=500, blank=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} ({self.response_status or 'pending'})"
@@ -1,6 +1,22 @@
 from django.contrib import messages
+from django.core.cache import cache
 from django.utils.html import format_html
 
+FEED_VERSION_KEY = 'notifications:feed-version'
+
+def feed_version():
+    """Current version of the notification feed, bumped whenever an entry is recorded"""
+    return cache.get_or_set(FEED_VERSION_KEY, 1, None)
+
+def bump_feed_version():
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        cache.set(FEED_VERSION_KEY, 1, None)
+
+def feed_cache_key(user_id):
+    return f'notifications:feed:{feed_version()}:{user_id or 0}'
+
 def send_toast_notification(request, notification_type, title, text, icon="fa-bell"):
     """
     Send a toast notification using Django messages system
@@ -34,29 +50,76 @@ def send_toast_notification(request, notification_type, title, text, icon="fa-be
     else:
         messages.info(request, message_html)
 
+def record_notification(notification_type, title, text, icon="fa-bell", order=None):
+    """
+    Store a notification in the persistent feed shown in the header
+    
+    Args:
+        notification_type: Type of notification (order, shipment, product, inventory, invoice, supplier)
+        title: Notification title
+        text: Notification text
+        icon: FontAwesome icon class
+        order: Related customer order, if any
+    """
+    from .models import Notification
+    notification = Notification.objects.create(
+        type=notification_type,
+        title=title,
+        text=text[:255],
+        icon=icon,
+        order=order,
+    )
+    bump_feed_version()
+    return notification
+
+def notify(request, notification_type, title, text, icon="fa-bell", order=None):
+    """Record a notification in the feed and show it as a toast to the current user"""
+    record_notification(notification_type, title, text, icon, order)
+    send_toast_notification(request, notification_type, title, text, icon)
+
 def notify_new_order(request, order):
     """Send notification for new order"""
-    send_toast_notification(
+    notify(
         request, 
         'order',
         f'New Order #{order.id}',
         f'Order placed by {order.ordered_by.username}',
-        'fa-shopping-cart'
+        'fa-shopping-cart',
+        order=order
+    )
+
+def notify_orders_ingested(user, count):
+    """Record one feed entry for a batch of orders pushed through the ingest API"""
+    record_notification(
+        'order',
+        f'{count} New Orders',
+        f'Batch imported by {user.username}',
+        'fa-shopping-cart',
+    )
+
+def notify_orders_status_changed(user, count, status):
+    """Record one feed entry for a bulk status change"""
+    record_notification(
+        'order',
+        f'{count} Orders Marked {status.title()}',
+        f'Status changed by {user.username}',
+        'fa-clipboard-check',
     )
 
 def notify_shipment_dispatched(request, shipment):
     """Send notification for shipment dispatch"""
-    send_toast_notification(
+    notify(
         request,
         'shipment', 
         f'Shipment Dispatched',
         f'Order #{shipment.order.id} - Tracking: {shipment.tracking_number}',
-        'fa-shipping-fast'
+        'fa-shipping-fast',
+        order=shipment.order
     )
 
 def notify_product_added(request, product):
     """Send notification for new product"""
-    send_toast_notification(
+    notify(
         request,
         'product',
         f'New Product Added',
@@ -64,29 +127,45 @@ def notify_product_added(request, product):
         'fa-box'
     )
 
+def _low_inventory_text(inventory_item):
+    return f'{inventory_item.product.name} - Only {inventory_item.quantity} left in stock'
+
 def notify_low_inventory(request, inventory_item):
     """Send notification for low inventory"""
-    send_toast_notification(
+    notify(
         request,
         'inventory',
         f'Low Inventory Alert',
-        f'{inventory_item.product.name} - Only {inventory_item.quantity} left in stock',
+        _low_inventory_text(inventory_item),
         'fa-exclamation-triangle'
     )
 
+def record_low_inventory(inventory_items):
+    """Record one feed entry per inventory item that just ran low, with one INSERT"""
+    from .models import Notification
+    notifications = [
+        Notification(type='inventory', title='Low Inventory Alert', text=_low_inventory_text(item)[:255],
+                     icon='fa-exclamation-triangle')
+        for item in inventory_items
+    ]
+    if notifications:
+        Notification.objects.bulk_create(notifications)
+        bump_feed_version()
+
 def notify_invoice_paid(request, invoice):
     """Send notification for paid invoice"""
-    send_toast_notification(
+    notify(
         request,
         'invoice',
         f'Invoice Paid',
         f'Invoice #{invoice.invoice_number} for Order #{invoice.order.id}',
-        'fa-file-invoice-dollar'
+        'fa-file-invoice-dollar',
+        order=invoice.order
     )
 
 def notify_supplier_registered(request, supplier):
     """Send notification for new supplier"""
-    send_toast_notification(
+    notify(
         request,
         'supplier',
         f'New Supplier Registered',
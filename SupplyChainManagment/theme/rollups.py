@@ -0,0 +1,159 @@
+"""
+Maintenance of the DailySalesRollup table (read by theme.metrics).
+
+Writes to Order/OrderItem/LedgerEntry only mark the affected order days as
+dirty; the dirty days are recomputed from the source tables once the current
+transaction commits. Recomputing a whole day keeps the rollup correct for
+edits, deletes and date changes while the cost stays bounded by the size of
+that day rather than the whole order history.
+"""
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum, DecimalField
+
+from .dashboard_cache import bump_version_on_commit
+from .models import DailySalesRollup
+
+_pending = threading.local()
+
+ZERO = Decimal('0.00')
+
+
+def mark_day_dirty(day):
+    """Schedule a rollup refresh for ``day`` once the current transaction commits."""
+    if day is None:
+        return
+    if hasattr(day, 'date'):
+        day = day.date()
+    days = getattr(_pending, 'days', None)
+    if days is None:
+        days = _pending.days = set()
+    days.add(day)
+    # Every call registers a flush; the first one to run drains the whole set,
+    # so rolled back transactions just leave days for the next flush.
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    from products import ledger
+
+    days = getattr(_pending, 'days', None)
+    if not days:
+        return
+    # Profit is read from the ledger: post the entries of this transaction first
+    ledger.flush_pending()
+    _pending.days = set()
+    refresh_days(days)
+
+
+def refresh_days(days):
+    """Recompute the rollup rows for the given days from the source tables."""
+    from orders.models import Order, OrderItem
+    from products.models import LedgerEntry
+
+    days = sorted(set(days))
+    if not days:
+        return 0
+
+    money = DecimalField(max_digits=14, decimal_places=2)
+    buckets = defaultdict(lambda: {'order_count': 0, 'units_sold': 0, 'revenue': ZERO, 'cost': ZERO, 'profit': ZERO})
+
+    # Line items (the normal multi-product orders)
+    item_rows = (
+        OrderItem.objects.filter(order__order_date__in=days)
+        .values('order__order_date', 'product')
+        .annotate(
+            orders=Count('order', distinct=True),
+            units=Sum('quantity'),
+            revenue=Sum('total_price'),
+            cost=Sum(F('quantity') * F('unit_cost_price'), output_field=money),
+        )
+    )
+    for row in item_rows:
+        bucket = buckets[(row['order__order_date'], row['product'])]
+        bucket['order_count'] += row['orders']
+        bucket['units_sold'] += row['units'] or 0
+        bucket['revenue'] += row['revenue'] or ZERO
+        bucket['cost'] += row['cost'] or ZERO
+
+    # Profit comes from the ledger, like the dashboards always did
+    ledger_rows = (
+        LedgerEntry.objects.filter(order_item__order__order_date__in=days)
+        .values('order_item__order__order_date', 'product')
+        .annotate(profit=Sum('profit'))
+    )
+    for row in ledger_rows:
+        buckets[(row['order_item__order__order_date'], row['product'])]['profit'] += row['profit'] or ZERO
+
+    # Legacy single-product orders without line items
+    legacy_rows = (
+        Order.objects.filter(order_date__in=days, items__isnull=True)
+        .values('order_date', 'product')
+        .annotate(
+            orders=Count('id'),
+            units=Sum('quantity'),
+            revenue=Sum(F('quantity') * F('product__selling_price'), output_field=money),
+            cost=Sum(F('quantity') * F('product__cost_price'), output_field=money),
+        )
+    )
+    for row in legacy_rows:
+        bucket = buckets[(row['order_date'], row['product'])]
+        bucket['order_count'] += row['orders']
+        bucket['units_sold'] += row['units'] or 0
+        bucket['revenue'] += row['revenue'] or ZERO
+        bucket['cost'] += row['cost'] or ZERO
+        bucket['profit'] += (row['revenue'] or ZERO) - (row['cost'] or ZERO)
+
+    order_counts = dict(
+        Order.objects.filter(order_date__in=days)
+        .values('order_date')
+        .annotate(total=Count('id'))
+        .values_list('order_date', 'total')
+    )
+
+    rows = []
+    totals = {}
+    for (day, product_id), values in buckets.items():
+        rows.append(DailySalesRollup(day=day, product_id=product_id, **values))
+        total = totals.setdefault(day, {'units_sold': 0, 'revenue': ZERO, 'cost': ZERO, 'profit': ZERO})
+        total['units_sold'] += values['units_sold']
+        total['revenue'] += values['revenue']
+        total['cost'] += values['cost']
+        total['profit'] += values['profit']
+    for day, count in order_counts.items():
+        total = totals.setdefault(day, {'units_sold': 0, 'revenue': ZERO, 'cost': ZERO, 'profit': ZERO})
+        rows.append(DailySalesRollup(day=day, product=None, order_count=count, **total))
+
+    with transaction.atomic():
+        DailySalesRollup.objects.filter(day__in=days).delete()
+        DailySalesRollup.objects.bulk_create(rows, batch_size=500)
+    # bulk_create sends no signals, so invalidate the dashboard sections here
+    bump_version_on_commit(DailySalesRollup)
+    return len(rows)
+
+
+def rebuild(start=None, end=None, chunk_days=31):
+    """Rebuild the rollup for every order day (optionally limited to a range)."""
+    from orders.models import Order
+
+    orders = Order.objects.exclude(order_date__isnull=True)
+    stale = DailySalesRollup.objects.all()
+    if start:
+        orders = orders.filter(order_date__gte=start)
+        stale = stale.filter(day__gte=start)
+    if end:
+        orders = orders.filter(order_date__lte=end)
+        stale = stale.filter(day__lte=end)
+
+    days = list(orders.values_list('order_date', flat=True).distinct().order_by('order_date'))
+    # Drop rows for days that no longer have any orders
+    stale.exclude(day__in=days).delete()
+
+    written = 0
+    for i in range(0, len(days), chunk_days):
+        written += refresh_days(days[i:i + chunk_days])
+    return len(days), written
+
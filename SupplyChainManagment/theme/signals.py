@@ -0,0 +1,89 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from invoices.models import Invoice
+from orders.models import Customer, Order, OrderItem
+from products.models import LedgerEntry, Product
+from purchases.models import PurchaseOrderItem
+from shipments.models import Shipment
+from .dashboard_cache import bump_version_on_commit
+from .rollups import mark_day_dirty
+
+
+def _order_day(order_id):
+    """Resolve the order date for an order id (None if the order is gone)."""
+    return Order.objects.filter(pk=order_id).values_list('order_date', flat=True).first()
+
+
+def _deleted_with_order(origin):
+    """Whether a delete cascades from an Order (or a queryset of orders)."""
+    return isinstance(origin, Order) or getattr(origin, 'model', None) is Order
+
+
+@receiver(post_init, sender=Order)
+def remember_order_day(sender, instance, **kwargs):
+    # Keep the loaded date so a date change refreshes both days
+    instance._rollup_day = instance.__dict__.get('order_date')
+
+
+@receiver(post_save, sender=Order)
+def order_changed(sender, instance, **kwargs):
+    mark_day_dirty(instance.order_date)
+    previous = getattr(instance, '_rollup_day', None)
+    if previous != instance.order_date:
+        mark_day_dirty(previous)
+    instance._rollup_day = instance.order_date
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleting(sender, instance, **kwargs):
+    # Marked before the cascade, so its items and ledger entries need no lookup of their own
+    mark_day_dirty(instance.order_date)
+    mark_day_dirty(getattr(instance, '_rollup_day', None))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_changed(sender, instance, origin=None, **kwargs):
+    if _deleted_with_order(origin):
+        return
+    order = instance._state.fields_cache.get('order')
+    mark_day_dirty(order.order_date if order is not None else _order_day(instance.order_id))
+
+
+@receiver(post_save, sender=LedgerEntry)
+@receiver(post_delete, sender=LedgerEntry)
+def ledger_entry_changed(sender, instance, origin=None, **kwargs):
+    if _deleted_with_order(origin):
+        return
+    item = instance._state.fields_cache.get('order_item')
+    order = item._state.fields_cache.get('order') if item is not None else None
+    if order is not None:
+        mark_day_dirty(order.order_date)
+        return
+    order_date = (
+        OrderItem.objects.filter(pk=instance.order_item_id)
+        .values_list('order__order_date', flat=True)
+        .first()
+    )
+    mark_day_dirty(order_date)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_save, sender=Shipment)
+@receiver(post_delete, sender=Shipment)
+@receiver(post_save, sender=LedgerEntry)
+@receiver(post_delete, sender=LedgerEntry)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=PurchaseOrderItem)
+@receiver(post_delete, sender=PurchaseOrderItem)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_dashboard_sections(sender, **kwargs):
+    bump_version_on_commit(sender)
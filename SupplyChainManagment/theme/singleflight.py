@@ -0,0 +1,93 @@
+"""
+Request coalescing for expensive cached values.
+
+When a cache entry is missing, only the caller that wins a short lock
+(``cache.add``) recomputes it. The others serve the last known value kept
+under ``stale_key`` or, when there is none yet, wait for the winner to store
+the result. The lock lives in the default cache, so callers are coalesced
+across worker processes only when that cache is shared (REDIS_URL, see
+settings.CACHES); with the in-memory fallback each process coalesces just
+its own threads.
+
+Outcomes are counted per name: ``computed`` (this caller recomputed),
+``stale_served`` and ``waited`` (recomputations suppressed) and ``fallback``
+(the winner did not finish in time and the caller computed anyway).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_KEY = 'singleflight:lock:{}'
+STATS_KEY = 'singleflight:stats:{}:{}'
+OUTCOMES = ['computed', 'stale_served', 'waited', 'fallback']
+POLL_INTERVAL = 0.05
+
+
+def _count(name, outcome):
+    key = STATS_KEY.format(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _store(key, value, timeout, stale_key):
+    cache.set(key, value, timeout)
+    if stale_key:
+        cache.set(stale_key, value, settings.SINGLEFLIGHT_STALE_TIMEOUT)
+
+
+def get_or_compute(key, compute, timeout, stale_key=None, name='default'):
+    """Return ``cache[key]``, letting a single caller run ``compute()`` on a miss."""
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = LOCK_KEY.format(key)
+    lock_timeout = settings.SINGLEFLIGHT_LOCK_TIMEOUT
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = compute()
+            _store(key, value, timeout, stale_key)
+        finally:
+            cache.delete(lock_key)
+        _count(name, 'computed')
+        return value
+
+    if stale_key:
+        value = cache.get(stale_key)
+        if value is not None:
+            _count(name, 'stale_served')
+            return value
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            _count(name, 'waited')
+            return value
+        if cache.get(lock_key) is None:
+            break
+
+    value = compute()
+    _store(key, value, timeout, stale_key)
+    _count(name, 'fallback')
+    return value
+
+
+def stats(names):
+    """Outcome counters per name, plus how many recomputations were suppressed."""
+    keys = [STATS_KEY.format(name, outcome) for name in names for outcome in OUTCOMES]
+    values = cache.get_many(keys)
+    result = {}
+    for name in names:
+        counts = {outcome: values.get(STATS_KEY.format(name, outcome), 0) for outcome in OUTCOMES}
+        counts['suppressed'] = counts['stale_served'] + counts['waited']
+        result[name] = counts
+    return result
+
+
+def reset_stats(names):
+    cache.delete_many([STATS_KEY.format(name, outcome) for name in names for outcome in OUTCOMES])
@@ -0,0 +1,61 @@
+// Live notifications: listens to the server-sent events stream and shows
+// every new entry as a toast instead of waiting for the next page reload.
+// When the stream is not available (no EventSource, or a WSGI server that
+// answers with JSON instead of an event stream) the feed is polled.
+const notificationTypeColors = {
+    order: 'success',
+    shipment: 'info',
+    invoice: 'success',
+    inventory: 'warning',
+    product: 'info',
+    supplier: 'info'
+};
+
+function showNotification(notification) {
+    showToast(notification.title + ': ' + notification.text, notificationTypeColors[notification.type] || 'info');
+
+    const counter = document.getElementById('notification-count');
+    if (counter) {
+        counter.textContent = (parseInt(counter.textContent, 10) || 0) + 1;
+    }
+}
+
+function pollNotifications(url) {
+    let after = null;
+    function poll() {
+        const query = after === null ? '' : '?after=' + encodeURIComponent(after);
+        fetch(url + query, {credentials: 'same-origin', headers: {'X-Requested-With': 'XMLHttpRequest'}})
+            .then(function(response) {
+                return response.ok ? response.json() : Promise.reject(response.status);
+            })
+            .then(function(data) {
+                data.notifications.forEach(showNotification);
+                after = data.last_id;
+                setTimeout(poll, data.poll_interval * 1000);
+            })
+            .catch(function() {
+                // Not allowed (or the server is gone): stop until the next page load
+            });
+    }
+    poll();
+}
+
+function connectNotificationStream(url, pollUrl) {
+    if (!window.EventSource) {
+        pollNotifications(pollUrl);
+        return null;
+    }
+    const source = new EventSource(url);
+
+    source.addEventListener('notification', function(event) {
+        showNotification(JSON.parse(event.data));
+    });
+    source.addEventListener('error', function() {
+        // EventSource only gives up (instead of reconnecting) when the answer
+        // is not an event stream, which is how a WSGI deployment answers
+        if (source.readyState === EventSource.CLOSED) {
+            pollNotifications(pollUrl);
+        }
+    });
+    return source;
+}
@@ -126,8 +126,9 @@ var btn     = document.getElementById('sliderBtn'),
 // end with sidebar
 
 // --- SALES OVERVIEW BAR CHART WITH REAL DATA ---
-(function() {
-    // Get product names and sales counts from the template
+// The data arrives with the sales_overview dashboard widget
+document.addEventListener('widget:loaded', function(event) {
+    if (event.detail.widget !== 'sales_overview') return;
     var namesScript = document.getElementById('product-names-data');
     var salesScript = document.getElementById('product-sales-data');
     if (!namesScript || !salesScript) return;
@@ -161,7 +162,7 @@ var btn     = document.getElementById('sliderBtn'),
     } catch (e) {
         console.error('Error parsing product sales data:', e);
     }
-})();
+});
 // --- END SALES OVERVIEW BAR CHART ---
 
 // --- ANALYTICS_1 CHARTS WITH RANDOM BUT VALID DATA (following scripts copy.js) ---
@@ -0,0 +1,32 @@
+// Dashboard widgets: the page shell renders right away and every element with
+// a data-widget-url attribute is filled from its JSON endpoint in parallel.
+// A "widget:loaded" event (detail.widget is the widget name) is dispatched on
+// the filled element, so scripts can draw charts from the data it brought.
+function loadWidgets(root) {
+    (root || document).querySelectorAll('[data-widget-url]').forEach(function(container) {
+        fetch(container.dataset.widgetUrl, {
+            credentials: 'same-origin',
+            headers: {'X-Requested-With': 'XMLHttpRequest', 'Accept': 'application/json'}
+        })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.json();
+            })
+            .then(function(payload) {
+                container.innerHTML = payload.html;
+                container.dispatchEvent(new CustomEvent('widget:loaded', {
+                    bubbles: true,
+                    detail: {widget: payload.widget}
+                }));
+            })
+            .catch(function() {
+                container.innerHTML = '<p class="text-sm text-red-500 text-center py-4">Could not load this section.</p>';
+            });
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    loadWidgets();
+});
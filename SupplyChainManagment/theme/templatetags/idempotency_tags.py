@@ -0,0 +1,16 @@
+import uuid
+
+from django import template
+from django.utils.html import format_html
+
+from theme.idempotency import FIELD
+
+register = template.Library()
+
+@register.simple_tag
+def idempotency_field():
+    """
+    Hidden idempotency key for a form, new on every render so a re-rendered
+    form (after errors) can be submitted again
+    """
+    return format_html('<input type="hidden" name="{}" value="{}">', FIELD, uuid.uuid4().hex)
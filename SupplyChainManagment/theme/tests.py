@@ -0,0 +1,588 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from inventory.models import InventoryItem, StockMovement
+from orders.models import Order, OrderItem
+from suppliers.models import Supplier
+from products.models import Category, LedgerEntry, Product
+from .models import DailySalesRollup, IdempotencyKey, Notification
+from . import imports, metrics, rollups
+
+User = get_user_model()
+
+
+class DailySalesRollupTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='staff', password='testpass123', role='staff')
+        self.category = Category.objects.create(name='Test Category')
+        self.product = Product.objects.create(
+            name='Widget',
+            category=self.category,
+            sku='W-001',
+            cost_price=Decimal('6.00'),
+            selling_price=Decimal('10.00'),
+            created_by=self.user,
+        )
+        self.inventory = InventoryItem.objects.create(product=self.product, quantity=100)
+        self.today = now().date()
+
+    def place_order(self, quantity, order_date):
+        order = Order.objects.create(
+            product=self.product,
+            quantity=quantity,
+            order_date=order_date,
+            ordered_by=self.user,
+        )
+        OrderItem.objects.create(
+            order=order,
+            product=self.product,
+            inventory_item=self.inventory,
+            quantity=quantity,
+            unit_selling_price=Decimal('10.00'),
+            unit_cost_price=Decimal('6.00'),
+        )
+        return order
+
+    def test_rollup_updates_on_commit(self):
+        """Order writes refresh the day totals and per-product rows"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place_order(3, self.today)
+            self.place_order(2, self.today)
+
+        total = DailySalesRollup.objects.get(day=self.today, product__isnull=True)
+        self.assertEqual(total.order_count, 2)
+        self.assertEqual(total.units_sold, 5)
+        self.assertEqual(total.revenue, Decimal('50.00'))
+        self.assertEqual(total.profit, Decimal('20.00'))
+        per_product = DailySalesRollup.objects.get(day=self.today, product=self.product)
+        self.assertEqual(per_product.units_sold, 5)
+
+    def test_date_change_and_delete_move_totals(self):
+        """Changing an order date or deleting it refreshes every affected day"""
+        yesterday = self.today - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.place_order(4, self.today)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.order_date = yesterday
+            order.save()
+
+        self.assertFalse(DailySalesRollup.objects.filter(day=self.today).exists())
+        totals = metrics.window_totals(self.today)
+        self.assertEqual((totals['sales_yesterday'], totals['orders_yesterday']), (40.0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertFalse(DailySalesRollup.objects.exists())
+
+    def test_order_delete_marks_day_once(self):
+        """Deleting orders costs the same queries however many lines cascade with them"""
+        def delete_order(lines):
+            with self.captureOnCommitCallbacks(execute=True):
+                order = self.place_order(1, self.today)
+                for _ in range(lines - 1):
+                    OrderItem.objects.create(
+                        order=order, product=self.product, inventory_item=self.inventory, quantity=1,
+                        unit_selling_price=Decimal('10.00'), unit_cost_price=Decimal('6.00'),
+                    )
+            self.assertEqual(LedgerEntry.objects.filter(order_item__order=order).count(), lines)
+            with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+                Order.objects.filter(pk=order.pk).delete()
+            self.assertFalse(DailySalesRollup.objects.exists())
+            return len(ctx.captured_queries)
+
+        self.assertEqual(delete_order(1), delete_order(6))
+
+    def test_rebuild_matches_incremental(self):
+        """The rebuild command produces the same rows as incremental maintenance"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place_order(3, self.today)
+            self.place_order(1, self.today - timedelta(days=40))
+        expected = set(DailySalesRollup.objects.values_list('day', 'product', 'units_sold', 'revenue', 'profit'))
+
+        DailySalesRollup.objects.all().delete()
+        rollups.rebuild(chunk_days=7)
+        rebuilt = set(DailySalesRollup.objects.values_list('day', 'product', 'units_sold', 'revenue', 'profit'))
+        self.assertEqual(rebuilt, expected)
+
+
+class SeededOrdersMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='manager', password='testpass123', role='staff')
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name='Test Category')
+        self.today = now().date()
+        self.orders_created = 0
+
+    def seed(self, products, orders_per_day, days):
+        """Create products with stock and a few days of multi-line orders"""
+        created = []
+        for i in range(products):
+            product = Product.objects.create(
+                name=f'Product {self.orders_created}-{i}',
+                category=self.category,
+                sku=f'SKU-{self.orders_created}-{i}',
+                cost_price=Decimal('4.00'),
+                selling_price=Decimal('9.00'),
+                created_by=self.user,
+            )
+            created.append((product, InventoryItem.objects.create(product=product, quantity=1000)))
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in range(days):
+                for n in range(orders_per_day):
+                    order = Order.objects.create(
+                        product=created[0][0],
+                        quantity=len(created),
+                        order_date=self.today - timedelta(days=day),
+                        status='delivered',
+                        customer_name=f'Customer {n}',
+                        ordered_by=self.user,
+                    )
+                    for product, inventory in created:
+                        OrderItem.objects.create(order=order, product=product, inventory_item=inventory, quantity=1)
+        self.orders_created += 1
+
+
+class DashboardQueryCountTestCase(SeededOrdersMixin, TestCase):
+    # Queries of a dashboard shell or card rendered from a cold cache, whatever the data volume;
+    # every request pays 2 for the session and user and the shells 1 for the notification feed
+    QUERY_COUNTS = {
+        '/dashboard/': 3,
+        '/sales/': 3,
+        '/sales-details/': 3,
+        '/dashboard/widgets/sales_summary/': 4,
+        '/dashboard/widgets/profit_analysis/': 4,
+        '/dashboard/widgets/daily_sales/': 3,
+        '/dashboard/widgets/product_sales/': 4,
+        '/dashboard/widgets/best_sellers/': 4,
+        '/dashboard/widgets/top_customers/': 3,
+        '/dashboard/widgets/report_cards/': 7,
+        '/dashboard/widgets/tasks_this_week/': 4,
+        '/dashboard/widgets/sales_overview/': 6,
+        '/dashboard/widgets/sales_numbers/': 8,
+        '/dashboard/widgets/profit_overview/': 6,
+        '/dashboard/widgets/recent_sales/': 3,
+        '/dashboard/widgets/month_summary/': 4,
+        '/dashboard/widgets/order_summary/': 3,
+        '/dashboard/widgets/sales_windows/': 4,
+        '/dashboard/widgets/best_seller_table/': 4,
+        '/dashboard/widgets/recent_orders/': 5,
+    }
+
+    def assert_query_count(self, url):
+        from django.core.cache import cache
+        cache.clear()
+        with self.assertNumQueries(self.QUERY_COUNTS[url]):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_query_count_is_constant(self):
+        """The dashboards and their cards issue the same small number of queries whatever the data volume"""
+        from .widgets import WIDGETS
+
+        self.assertCountEqual([url for url in self.QUERY_COUNTS if '/widgets/' in url],
+                              [f'/dashboard/widgets/{name}/' for name in WIDGETS])
+        self.seed(products=2, orders_per_day=1, days=2)
+        for url in self.QUERY_COUNTS:
+            with self.subTest(url=url):
+                self.assert_query_count(url)
+        self.seed(products=6, orders_per_day=5, days=10)
+        for url in self.QUERY_COUNTS:
+            with self.subTest(url=url):
+                self.assert_query_count(url)
+
+    def test_metrics_window_totals_single_query(self):
+        """All period windows come from one conditional aggregation"""
+        self.seed(products=3, orders_per_day=2, days=3)
+        with self.assertNumQueries(1):
+            totals = metrics.window_totals(self.today)
+        self.assertEqual(totals['orders_today'], 2)
+        self.assertEqual(totals['orders_90_days'], 6)
+        self.assertEqual(totals['sales_today'], 2 * 3 * 9.0)
+
+
+class DashboardCacheTestCase(SeededOrdersMixin, TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        super().setUp()
+        cache.clear()
+
+    def test_sections_cached_until_dependent_write(self):
+        """A second card request reuses the sections; an order write invalidates them"""
+        from . import dashboard_cache
+
+        self.seed(products=2, orders_per_day=1, days=2)
+        self.client.get('/dashboard/widgets/report_cards/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/dashboard/widgets/report_cards/')
+        self.assertFalse(any('theme_dailysalesrollup' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(dashboard_cache.stats()['sales_summary']['hits'], 1)
+        self.assertEqual(dashboard_cache.stats()['sales_summary']['misses'], 1)
+
+        self.seed(products=1, orders_per_day=1, days=1)
+        response = self.client.get('/dashboard/widgets/report_cards/')
+        self.assertEqual(dashboard_cache.stats()['sales_summary']['misses'], 2)
+        self.assertEqual(response.context['total_orders'], 3)
+
+    def test_widgets_render_cards_as_json(self):
+        """Every card has its own JSON endpoint and is cached on its own"""
+        from . import dashboard_cache
+        from .widgets import WIDGETS
+
+        self.seed(products=2, orders_per_day=1, days=2)
+        for name in WIDGETS:
+            response = self.client.get(f'/dashboard/widgets/{name}/')
+            self.assertEqual(response.status_code, 200, name)
+            self.assertEqual(response.json()['widget'], name)
+        self.assertIn('Product 0-0', self.client.get('/dashboard/widgets/best_sellers/').json()['html'])
+        self.assertGreaterEqual(dashboard_cache.stats()['product_breakdown']['hits'], 2)
+        self.assertEqual(self.client.get('/dashboard/widgets/unknown/').status_code, 404)
+
+
+    def test_dashboards_render_a_shell_of_widgets(self):
+        """The dashboard pages compute no figures; every card points at its widget endpoint"""
+        self.seed(products=2, orders_per_day=1, days=2)
+        for url, names in [('/dashboard/', ['report_cards', 'tasks_this_week', 'sales_overview', 'sales_numbers',
+                                            'profit_overview', 'recent_sales']),
+                           ('/sales/', ['month_summary', 'order_summary', 'sales_windows', 'best_seller_table',
+                                        'recent_orders'])]:
+            response = self.client.get(url)
+            self.assertNotIn('total_orders', response.context)
+            for name in names:
+                self.assertContains(response, f'data-widget-url="/dashboard/widgets/{name}/"')
+
+
+class NotificationFeedTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='clerk', password='testpass123', role='staff')
+        self.other = User.objects.create_user(username='clerk2', password='testpass123', role='staff')
+        self.client.force_login(self.user)
+
+    def test_hooks_write_feed_and_track_read_state(self):
+        """notify_* hooks persist entries; reading the feed page marks them read per user"""
+        from django.test import RequestFactory
+        from django.contrib.messages.storage.fallback import FallbackStorage
+        from .notification_utils import notify_supplier_registered
+        from suppliers.models import Supplier
+        from .views import get_notifications
+
+        request = RequestFactory().post('/')
+        request.user = self.user
+        request.session = self.client.session
+        request._messages = FallbackStorage(request)
+        notify_supplier_registered(request, Supplier.objects.create(name='Acme', contact_person='Jo'))
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(1):
+            feed = get_notifications(request)
+        self.assertEqual([n.title for n in feed], ['New Supplier Registered'])
+        self.assertFalse(feed[0].is_read)
+
+        self.client.get('/notifications/')
+        self.assertTrue(get_notifications(request)[0].is_read)
+        request.user = self.other
+        self.assertFalse(get_notifications(request)[0].is_read)
+
+    def test_context_feed_is_lazy_and_shared(self):
+        """The header feed is loaded once, reused by the next request and skipped for AJAX"""
+        from .notification_utils import record_notification
+
+        record_notification('supplier', 'Supplier added', 'Acme', 'fa-user')
+
+        def feed_queries(**headers):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/products/', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            return sum('theme_notification' in q['sql'] for q in ctx.captured_queries)
+
+        self.assertEqual(feed_queries(), 1)
+        self.assertEqual(feed_queries(), 0)
+        self.assertEqual(feed_queries(x_requested_with='XMLHttpRequest'), 0)
+
+        # A new entry invalidates the shared copy
+        record_notification('supplier', 'Supplier removed', 'Acme', 'fa-user')
+        self.assertEqual(feed_queries(), 1)
+
+    @override_settings(NOTIFICATIONS_STREAM_POLL_INTERVAL=0.01, NOTIFICATIONS_STREAM_TIMEOUT=0.02)
+    async def test_stream_pushes_new_entries_to_staff(self):
+        """The SSE endpoint sends entries newer than Last-Event-ID, and only to staff"""
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncClient
+        from .notification_utils import record_notification
+
+        first = await sync_to_async(record_notification)('order', 'New Order', 'Order #1', 'fa-shopping-cart')
+        second = await sync_to_async(record_notification)('order', 'New Order', 'Order #2', 'fa-shopping-cart')
+
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get('/notifications/stream/', headers={'last-event-id': str(first.pk)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn(f'id: {second.pk}', body)
+        self.assertNotIn(f'id: {first.pk}\n', body)
+        self.assertIn('Order #2', body)
+
+        supplier = await sync_to_async(User.objects.create_user)(username='vendor', password='testpass123', role='supplier')
+        await client.aforce_login(supplier)
+        response = await client.get('/notifications/stream/')
+        self.assertEqual(response.status_code, 403)
+
+
+    def test_stream_falls_back_to_polling_under_wsgi(self):
+        """Without ASGI the stream answers with the polling JSON instead of holding a worker"""
+        from .notification_utils import record_notification
+
+        first = record_notification('order', 'New Order', 'Order #1', 'fa-shopping-cart')
+        response = self.client.get('/notifications/stream/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['notifications'], [])
+        self.assertEqual(response.json()['last_id'], first.pk)
+
+        second = record_notification('order', 'New Order', 'Order #2', 'fa-shopping-cart')
+        data = self.client.get('/notifications/poll/', {'after': first.pk}).json()
+        self.assertEqual([entry['id'] for entry in data['notifications']], [second.pk])
+        self.assertEqual(data['last_id'], second.pk)
+
+        self.client.logout()
+        self.assertEqual(self.client.get('/notifications/poll/').status_code, 403)
+
+class SingleFlightTestCase(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        """Concurrent callers of an expired entry share one recomputation"""
+        import threading
+        import time
+        from . import singleflight
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'fresh'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(singleflight.get_or_compute('k', compute, 60, name='test')))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['fresh'] * 5)
+        self.assertEqual(singleflight.stats(['test'])['test']['suppressed'], 4)
+
+    def test_stale_value_served_while_recomputing(self):
+        from django.core.cache import cache
+        from . import singleflight
+
+        cache.set('k:stale', 'old')
+        cache.add(singleflight.LOCK_KEY.format('k'), 1)
+        value = singleflight.get_or_compute('k', lambda: 'new', 60, stale_key='k:stale', name='test')
+        self.assertEqual(value, 'old')
+        self.assertEqual(singleflight.stats(['test'])['test']['stale_served'], 1)
+
+    def test_stats_command_needs_a_shared_cache(self):
+        """The counters of a per-process cache are not readable from a command"""
+        from django.core.management.base import CommandError
+
+        with self.assertRaisesMessage(CommandError, 'REDIS_URL'):
+            call_command('dashboard_cache_stats', stdout=StringIO())
+
+
+class IdempotencyTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='clerk', password='testpass123', role='staff')
+        self.product = Product.objects.create(
+            name='Widget', category=Category.objects.create(name='Test Category'), sku='I-1',
+            cost_price=Decimal('4.00'), selling_price=Decimal('10.00'), created_by=self.user,
+        )
+        self.inventory = InventoryItem.objects.create(product=self.product, quantity=10)
+        self.client.force_login(self.user)
+
+    def order_form(self, quantity, key='retry-me'):
+        return {
+            f'quantity_{self.product.pk}_{self.inventory.pk}': str(quantity),
+            'order_date': now().date().isoformat(),
+            'idempotency_key': key,
+        }
+
+    def test_retried_order_form_is_replayed(self):
+        first = self.client.post('/orders/add/', self.order_form(3))
+        second = self.client.post('/orders/add/', self.order_form(3))
+
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.quantity, 7)
+
+        self.client.post('/orders/add/', self.order_form(3, key='another'))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_rejected_form_releases_its_key(self):
+        response = self.client.post('/orders/add/', self.order_form(50))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.client.post('/orders/add/', self.order_form(5))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_retried_api_batch_returns_the_original_body(self):
+        body = json.dumps({'orders': [{'lines': [{'inventory_item': self.inventory.pk, 'quantity': 2}]}]})
+        first = self.client.post('/orders/api/bulk/', body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='batch-1')
+        second = self.client.post('/orders/api/bulk/', body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='batch-1')
+
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_retried_purchase_order_is_replayed(self):
+        from purchases.models import PurchaseOrder
+        from suppliers.models import Supplier
+
+        supplier = Supplier.objects.create(name='Acme Supply')
+        form = {
+            'supplier': supplier.pk,
+            f'quantity_{self.product.pk}': '4',
+            f'unit_price_{self.product.pk}': '3.50',
+            'idempotency_key': 'po-1',
+        }
+        first = self.client.post('/purchases/orders/create/', form)
+        second = self.client.post('/purchases/orders/create/', form)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+    def test_expired_keys_are_ignored_and_purged(self):
+        self.client.post('/orders/add/', self.order_form(1))
+        IdempotencyKey.objects.update(created_at=now() - timedelta(days=2))
+
+        self.client.post('/orders/add/', self.order_form(1))
+        self.assertEqual(Order.objects.count(), 2)
+
+        IdempotencyKey.objects.update(created_at=now() - timedelta(days=2))
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Removed 1', out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class BulkImportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='staff', password='testpass123', role='staff')
+        Product.objects.create(
+            name='Old name', category=Category.objects.create(name='Tools'), sku='P-1',
+            cost_price=Decimal('1.00'), selling_price=Decimal('2.00'), created_by=self.user,
+        )
+
+    def test_products_are_upserted_per_chunk(self):
+        rows = ['sku,name,category,cost_price,selling_price', 'P-1,Hammer,Tools,4.00,9.50']
+        rows += [f'N-{n},Nail {n},Fasteners,0.10,0.25' for n in range(5)]
+        rows += ['N-9,,Fasteners,0.10,1', 'N-0,Nail zero,Fasteners,0.10,0.30', 'N-8,Tack,,abc,1']
+        result = imports.run('products', StringIO('\n'.join(rows)), 'csv', user=self.user, chunk_size=3)
+
+        self.assertEqual((result.created, result.updated, result.rejected), (5, 2, 2))
+        self.assertCountEqual(result.errors, [
+            {'line': 8, 'errors': ['name: This field is required.']},
+            {'line': 10, 'errors': ['cost_price: Enter a number.']},
+        ])
+        hammer = Product.objects.get(sku='P-1')
+        self.assertEqual((hammer.name, hammer.selling_price, hammer.category.name), ('Hammer', Decimal('9.50'), 'Tools'))
+        self.assertEqual(Product.objects.get(sku='N-0').selling_price, Decimal('0.30'))
+        self.assertEqual(Category.objects.filter(name='Fasteners').count(), 1)
+
+    def test_rows_created_concurrently_keep_the_columns_left_out(self):
+        """A new row that meets an existing key on insert only overwrites the columns the file filled in"""
+        row = Product(sku='P-1', name='Renamed', cost_price=Decimal('0'), selling_price=Decimal('0'), created_by=self.user)
+        imports._create_new(Product, [(row, ['name'])], ['sku'])
+        imports._create_new(Product, [(Product(sku='P-1', name='Ignored', cost_price=0, selling_price=0,
+                                               created_by=self.user), [])], ['sku'])
+        product = Product.objects.get(sku='P-1')
+        self.assertEqual(
+            (product.name, product.cost_price, product.selling_price, product.category.name),
+            ('Renamed', Decimal('1.00'), Decimal('2.00'), 'Tools'),
+        )
+
+    def test_existing_rows_keep_the_columns_left_out(self):
+        result = imports.run('products', StringIO('sku,name\nP-1,Renamed\nN-1,New'), 'csv', user=self.user)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        renamed = Product.objects.get(sku='P-1')
+        self.assertEqual(
+            (renamed.name, renamed.cost_price, renamed.selling_price, renamed.category.name),
+            ('Renamed', Decimal('1.00'), Decimal('2.00'), 'Tools'),
+        )
+        new = Product.objects.get(sku='N-1')
+        self.assertEqual((new.cost_price, new.category), (Decimal('0'), None))
+
+        item = InventoryItem.objects.create(product=renamed, quantity=10, location='A1', unit_cost_price=Decimal('3'))
+        imports.run('inventory', StringIO('{"sku": "P-1", "description": "Top shelf"}\n'), 'jsonl')
+        item.refresh_from_db()
+        self.assertEqual((item.quantity, item.location, item.unit_cost_price, item.description),
+                         (10, 'A1', Decimal('3.00'), 'Top shelf'))
+        self.assertFalse(StockMovement.objects.filter(reference='Imported').exists())
+        result = imports.run('inventory', StringIO('{"sku": "P-1", "unit": "box"}\n'), 'jsonl')
+        self.assertEqual(result.errors, [{'line': 1, 'errors': ['quantity: This field is required.']}])
+
+    def test_inventory_quantities_are_journaled(self):
+        item = InventoryItem.objects.create(product=Product.objects.get(sku='P-1'), quantity=10)
+        rows = [
+            {'sku': 'P-1', 'unit': 'piece', 'quantity': 4, 'location': 'A1'},
+            {'sku': 'P-1', 'unit': 'box', 'quantity': 2},
+            {'sku': 'NOPE', 'unit': 'piece', 'quantity': 1},
+        ]
+        stream = StringIO('\n'.join(json.dumps(row) for row in rows) + '\n[1]\n')
+        # Savepoint, products, locked rows, INSERT, UPDATE, ids of the new rows, journal,
+        # valuation (the new row's cost, layer and value; the reduced row's open layers and cost),
+        # the rows that ran low and their notification, release
+        with self.assertNumQueries(15):
+            result = imports.run('inventory', stream, 'jsonl')
+
+        self.assertEqual((result.created, result.updated, result.rejected), (1, 1, 2))
+        item.refresh_from_db()
+        self.assertEqual((item.quantity, item.location), (4, 'A1'))
+        box = InventoryItem.objects.get(product=item.product, unit='box')
+        self.assertEqual(box.base_quantity, 2 * box.unit_factor)
+        self.assertEqual(
+            dict(StockMovement.objects.filter(kind='adjustment', reference='Imported')
+                 .values_list('inventory_item_id', 'quantity')),
+            {item.pk: -6, box.pk: 2},
+        )
+        self.assertEqual(list(Notification.objects.values_list('type', 'text')),
+                         [('inventory', f'{item.product.name} - Only 4 left in stock')])
+
+    def test_upload_endpoint_and_command(self):
+        upload = SimpleUploadedFile('suppliers.csv', b'name,email\nAcme,sales@acme.test\nBad,not-an-email\n')
+        self.assertEqual(self.client.post('/import/suppliers/', {'file': upload}).status_code, 403)
+        self.client.force_login(self.user)
+        upload.seek(0)
+        response = self.client.post('/import/suppliers/', {'file': upload})
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'], [{'line': 3, 'errors': ['email: Enter a valid email address.']}])
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as source:
+            source.write('{"name": "Acme", "phone": "555-0100"}\n')
+        self.addCleanup(os.remove, source.name)
+        out = StringIO()
+        call_command('import_data', 'suppliers', source.name, stdout=out)
+        self.assertIn('0 created, 1 updated, 0 rejected.', out.getvalue())
+        self.assertEqual(Supplier.objects.get(name='Acme').phone, '555-0100')
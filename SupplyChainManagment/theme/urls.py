@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import dashboard, dashboard_1, notifications, sales_details, test_notifications, clear_messages, role_based_dashboard
+from .import_views import import_data
+from .views import dashboard, dashboard_1, notifications, mark_notifications_read, notification_stream, notification_poll, sales_details, dashboard_widget, test_notifications, clear_messages, role_based_dashboard
 
 urlpatterns = [
     # path('', home, name='home'),
@@ -8,7 +9,12 @@ urlpatterns = [
     path('', role_based_dashboard, name='role_dashboard'),
     path('dashboard/', dashboard, name='dashboard'),
     path('sales/', dashboard_1, name='dashboard_1'),
+    path('dashboard/widgets/<str:name>/', dashboard_widget, name='dashboard_widget'),
     path('notifications/', notifications, name='notifications'),
+    path('notifications/read/', mark_notifications_read, name='mark_notifications_read'),
+    path('notifications/stream/', notification_stream, name='notification_stream'),
+    path('notifications/poll/', notification_poll, name='notification_poll'),
+    path('import/<str:dataset>/', import_data, name='import_data'),
     path('sales-details/', sales_details, name='sales_details'),
     path('test-notifications/', test_notifications, name='test_notifications'),
     path('clear-messages/', clear_messages, name='clear_messages'),
@@ -0,0 +1,85 @@
+"""
+Dashboard cards served through JSON endpoints, so the page shell renders right
+away and static/js/widgets.js fills the cards in parallel. Each card renders
+its own template from data cached per theme.dashboard_cache section; cards
+that show per-user or live figures add them uncached.
+"""
+from django.db.models import Count, Q
+
+from . import metrics
+from .dashboard_cache import cached_section
+
+# Example static data shown next to the real figures, replace when available
+PLACEHOLDER_COUNTERS = {
+    'dashboard_posts': 0,
+    'dashboard_posts_active': 0,
+}
+
+
+def _top_customers(today):
+    return {'top_customers': list(metrics.top_customers())}
+
+
+def _recent_sales(today):
+    return {'recent_sales': metrics.recent_sales()}
+
+
+def _recent_orders(today):
+    return {'recent_orders': list(metrics.recent_orders(today))}
+
+
+def _tasks(user, today):
+    return {'tasks_this_week': metrics.tasks_this_week(user, today)}
+
+
+def _members(user, today):
+    from users.models import CustomUser
+    members = CustomUser.objects.aggregate(total=Count('id'), online=Count('id', filter=Q(is_active=True)))
+    return {'total_members': members['total'], 'online_members': members['online'], **PLACEHOLDER_COUNTERS}
+
+
+# cache section -> data function taking today
+SECTION_DATA = {
+    'sales_summary': metrics.sales_summary,
+    'daily_sales': metrics.daily_sales,
+    'product_breakdown': metrics.product_breakdown,
+    'operations': metrics.operations_metrics,
+    'top_customers': _top_customers,
+    'recent_sales': _recent_sales,
+    'recent_orders': _recent_orders,
+}
+
+# widget name -> (template, cache sections, uncached data function taking user and today)
+WIDGETS = {
+    # sales_details.html
+    'sales_summary': ('widgets/sales_summary.html', ['sales_summary'], None),
+    'profit_analysis': ('widgets/profit_analysis.html', ['product_breakdown'], None),
+    'daily_sales': ('widgets/daily_sales.html', ['daily_sales'], None),
+    'product_sales': ('widgets/product_sales.html', ['product_breakdown'], None),
+    'best_sellers': ('widgets/best_sellers.html', ['product_breakdown'], None),
+    'top_customers': ('widgets/top_customers.html', ['top_customers'], None),
+    # dashboard.html
+    'report_cards': ('widgets/report_cards.html', ['sales_summary', 'operations'], None),
+    'tasks_this_week': ('widgets/tasks_this_week.html', [], _tasks),
+    'sales_overview': ('widgets/sales_overview.html', ['sales_summary', 'product_breakdown'], None),
+    'sales_numbers': ('widgets/sales_numbers.html', ['sales_summary', 'operations'], _members),
+    'profit_overview': ('widgets/profit_overview.html', ['sales_summary', 'product_breakdown'], None),
+    'recent_sales': ('widgets/recent_sales.html', ['recent_sales'], None),
+    # dashboard-1.html
+    'month_summary': ('widgets/month_summary.html', ['sales_summary'], None),
+    'order_summary': ('widgets/order_summary.html', ['daily_sales'], None),
+    'sales_windows': ('widgets/sales_windows.html', ['sales_summary'], None),
+    'best_seller_table': ('widgets/best_seller_table.html', ['product_breakdown'], None),
+    'recent_orders': ('widgets/recent_orders.html', ['recent_orders'], None),
+}
+
+
+def widget_context(name, today, user=None):
+    """Return (template, context) for a widget; raises KeyError for unknown names."""
+    template, sections, live = WIDGETS[name]
+    context = {}
+    for section in sections:
+        context.update(cached_section(section, lambda compute=SECTION_DATA[section]: compute(today), today))
+    if live:
+        context.update(live(user, today))
+    return template, context